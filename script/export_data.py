@@ -0,0 +1,65 @@
+"""Streams videos, comments or replies to CSV or Parquet with flat memory use.
+
+    python script/export_data.py comments                                  CSV into exports/
+    python script/export_data.py comments --format parquet --compression zstd
+    python script/export_data.py replies --channel UC... --from 2024-01-01 --to 2024-03-31
+    python script/export_data.py videos --output - | head                  CSV to stdout
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import Exporter
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stored data to CSV or Parquet.")
+    parser.add_argument("dataset", choices=list(Exporter.DATASETS))
+    parser.add_argument("--format", choices=Exporter.FORMATS, default="csv")
+    parser.add_argument("--compression", choices=["none", "gzip", "snappy", "zstd"],
+                        help="CSV: none or gzip (default none); Parquet: none, snappy, zstd or gzip (default snappy)")
+    parser.add_argument("--channel", help="only this channel_id")
+    parser.add_argument("--video", help="only this video_id")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="published on or after (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="published on or before (YYYY-MM-DD)")
+    parser.add_argument("--output", help="file to write, - for stdout (CSV only); default exports/<dataset>_<time>.<ext>")
+    args = parser.parse_args()
+
+    if args.output == "-" and args.format != "csv":
+        parser.error("only CSV can be written to stdout")
+    compression = args.compression or ("snappy" if args.format == "parquet" else "none")
+    compression = None if compression == "none" else compression
+    path = args.output or Exporter.default_path(args.dataset, args.format, compression)
+
+    started = time.monotonic()
+    try:
+        rows = Exporter.export(
+            DB_CONFIG,
+            args.dataset,
+            path,
+            fmt=args.format,
+            compression=compression,
+            channel_id=args.channel,
+            video_id=args.video,
+            date_from=args.date_from,
+            date_to=args.date_to
+        )
+    except Exporter.ExporterError as e:
+        sys.exit(f"Export failed: {e}")
+    if path != "-":
+        print(f"Wrote {rows:,} {args.dataset} to {path} in {time.monotonic() - started:.1f}s")
@@ -108,6 +108,14 @@ CREATE TABLE IF NOT EXISTS video_stats (
     PRIMARY KEY (video_id)
 );
 
+-- Per-channel cursor for incremental uploads-playlist syncs
+CREATE TABLE IF NOT EXISTS channel_sync_state (
+    channel_id VARCHAR PRIMARY KEY REFERENCES channels(channel_id) ON DELETE CASCADE,
+    uploads_playlist_id VARCHAR,
+    newest_video_id VARCHAR,
+    last_synced_at TIMESTAMP
+);
+
 -- ==============================
 -- COMMENTS
 -- ==============================
@@ -134,6 +142,13 @@ CREATE TABLE IF NOT EXISTS comment_replies (
     scraped_at TIMESTAMP
 );
 
+-- Per-video high-water mark for incremental comment syncs
+CREATE TABLE IF NOT EXISTS comment_sync_state (
+    video_id VARCHAR PRIMARY KEY REFERENCES videos(video_id) ON DELETE CASCADE,
+    newest_comment_published_at TIMESTAMPTZ,
+    last_synced_at TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS comment_likes (
     comment_id VARCHAR PRIMARY KEY REFERENCES comments(comment_id) ON DELETE CASCADE,
     video_id VARCHAR REFERENCES videos(video_id) ON DELETE CASCADE,
@@ -157,6 +172,169 @@ CREATE TABLE IF NOT EXISTS tracking (
     description TEXT
 );
 
+-- ==============================
+-- PUBLICATION ROLLUPS
+-- ==============================
+
+-- Videos published per channel per day / hour, kept in step with videos by trigger
+CREATE TABLE IF NOT EXISTS channel_publication_daily (
+    channel_id VARCHAR REFERENCES channels(channel_id) ON DELETE CASCADE,
+    pub_date DATE,
+    video_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, pub_date)
+);
+CREATE INDEX IF NOT EXISTS idx_channel_publication_daily_date ON channel_publication_daily(pub_date);
+
+CREATE TABLE IF NOT EXISTS channel_publication_hourly (
+    channel_id VARCHAR REFERENCES channels(channel_id) ON DELETE CASCADE,
+    bucket TIMESTAMP,
+    video_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_channel_publication_hourly_bucket ON channel_publication_hourly(bucket);
+
+-- One-time backfill from existing videos (skipped once the rollups hold data)
+INSERT INTO channel_publication_daily (channel_id, pub_date, video_count)
+SELECT channel_id, published_at::date, COUNT(*)
+FROM videos
+WHERE channel_id IS NOT NULL AND published_at IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM channel_publication_daily)
+GROUP BY 1, 2;
+
+INSERT INTO channel_publication_hourly (channel_id, bucket, video_count)
+SELECT channel_id, date_trunc('hour', published_at), COUNT(*)
+FROM videos
+WHERE channel_id IS NOT NULL AND published_at IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM channel_publication_hourly)
+GROUP BY 1, 2;
+
+CREATE OR REPLACE FUNCTION maintain_channel_publication() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.channel_id IS NOT NULL AND OLD.published_at IS NOT NULL THEN
+        UPDATE channel_publication_daily SET video_count = video_count - 1
+        WHERE channel_id = OLD.channel_id AND pub_date = OLD.published_at::date;
+        UPDATE channel_publication_hourly SET video_count = video_count - 1
+        WHERE channel_id = OLD.channel_id AND bucket = date_trunc('hour', OLD.published_at);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.channel_id IS NOT NULL AND NEW.published_at IS NOT NULL THEN
+        INSERT INTO channel_publication_daily (channel_id, pub_date, video_count)
+        VALUES (NEW.channel_id, NEW.published_at::date, 1)
+        ON CONFLICT (channel_id, pub_date)
+        DO UPDATE SET video_count = channel_publication_daily.video_count + 1;
+        INSERT INTO channel_publication_hourly (channel_id, bucket, video_count)
+        VALUES (NEW.channel_id, date_trunc('hour', NEW.published_at), 1)
+        ON CONFLICT (channel_id, bucket)
+        DO UPDATE SET video_count = channel_publication_hourly.video_count + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Upserts that leave channel_id/published_at alone only fire for genuinely new videos
+DROP TRIGGER IF EXISTS videos_publication_rollup ON videos;
+CREATE TRIGGER videos_publication_rollup
+AFTER INSERT OR DELETE OR UPDATE OF channel_id, published_at ON videos
+FOR EACH ROW EXECUTE FUNCTION maintain_channel_publication();
+
+-- ==============================
+-- STATS HISTORY
+-- ==============================
+
+-- Append-only snapshots, one monthly partition each (created on demand by
+-- functions/StatsSnapshots.py, dropped whole for retention)
+CREATE TABLE IF NOT EXISTS video_stats_snapshots (
+    video_id VARCHAR NOT NULL,
+    captured_at TIMESTAMPTZ NOT NULL,
+    view_count BIGINT,
+    like_count BIGINT,
+    comment_count BIGINT
+) PARTITION BY RANGE (captured_at);
+CREATE INDEX IF NOT EXISTS idx_video_stats_snapshots_video ON video_stats_snapshots(video_id, captured_at);
+
+CREATE TABLE IF NOT EXISTS channel_stats_snapshots (
+    channel_id VARCHAR NOT NULL,
+    captured_at TIMESTAMPTZ NOT NULL,
+    subscribers_count BIGINT,
+    total_video_count BIGINT,
+    total_view_count BIGINT
+) PARTITION BY RANGE (captured_at);
+CREATE INDEX IF NOT EXISTS idx_channel_stats_snapshots_channel ON channel_stats_snapshots(channel_id, captured_at);
+
+-- Rollups: latest reading per UTC hour/day, maintained on every snapshot write
+CREATE TABLE IF NOT EXISTS video_stats_hourly (
+    video_id VARCHAR,
+    bucket TIMESTAMPTZ,
+    view_count BIGINT,
+    like_count BIGINT,
+    comment_count BIGINT,
+    samples INT DEFAULT 0,
+    last_captured_at TIMESTAMPTZ,
+    PRIMARY KEY (video_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS video_stats_daily (
+    LIKE video_stats_hourly INCLUDING DEFAULTS,
+    PRIMARY KEY (video_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS channel_stats_hourly (
+    channel_id VARCHAR,
+    bucket TIMESTAMPTZ,
+    subscribers_count BIGINT,
+    total_video_count BIGINT,
+    total_view_count BIGINT,
+    samples INT DEFAULT 0,
+    last_captured_at TIMESTAMPTZ,
+    PRIMARY KEY (channel_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS channel_stats_daily (
+    LIKE channel_stats_hourly INCLUDING DEFAULTS,
+    PRIMARY KEY (channel_id, bucket)
+);
+
+-- ==============================
+-- API QUOTA USAGE
+-- ==============================
+
+-- Units spent per API key (sha256 prefix, never the key) per Pacific-time quota day
+CREATE TABLE IF NOT EXISTS api_quota_usage (
+    key_id VARCHAR,
+    usage_date DATE,
+    units BIGINT DEFAULT 0,
+    PRIMARY KEY (key_id, usage_date)
+);
+
+-- ==============================
+-- QUERY CACHE INVALIDATION
+-- ==============================
+
+-- App processes LISTEN on yt_data_changed and drop cached reads of the named table
+CREATE OR REPLACE FUNCTION notify_data_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('yt_data_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['channels', 'channel_stats', 'videos', 'video_stats', 'comments', 'comment_replies']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I_data_changed ON %I', t, t);
+        EXECUTE format(
+            'CREATE TRIGGER %I_data_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION notify_data_changed()',
+            t, t
+        );
+    END LOOP;
+END;
+$$;
+
 -- ==============================
 -- INDEXES (Performance Boost)
 -- ==============================
@@ -166,6 +344,14 @@ CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);
 CREATE INDEX IF NOT EXISTS idx_comment_replies_main_comment_id ON comment_replies(main_comment_id);
 CREATE INDEX IF NOT EXISTS idx_tracking_target_id ON tracking(target_id);
 
+-- Keyset pagination / streaming in (published_at, id) order, newest first
+CREATE INDEX IF NOT EXISTS idx_videos_published_keyset ON videos(published_at DESC NULLS LAST, video_id DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_channel_published_keyset ON videos(channel_id, published_at DESC NULLS LAST, video_id DESC);
+CREATE INDEX IF NOT EXISTS idx_comments_published_keyset ON comments(comment_published_at DESC NULLS LAST, comment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_comments_video_published_keyset ON comments(video_id, comment_published_at DESC NULLS LAST, comment_id DESC);
+CREATE INDEX IF NOT EXISTS idx_comment_replies_published_keyset ON comment_replies(reply_published_at DESC NULLS LAST, reply_id DESC);
+CREATE INDEX IF NOT EXISTS idx_comment_replies_parent_published_keyset ON comment_replies(main_comment_id, reply_published_at DESC NULLS LAST, reply_id DESC);
+
 EOF
 
 echo "🎉 Database schema initialized successfully!"
\ No newline at end of file
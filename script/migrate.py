@@ -0,0 +1,357 @@
+"""Versioned schema migrations for the YT Analytics database.
+
+    python script/migrate.py            apply pending migrations
+    python script/migrate.py --status   list applied and pending migrations
+    python script/migrate.py --check    EXPLAIN every getter and fail on full-table scans
+
+Migrations are script/migrations/NNNN_name.sql files applied in order and
+recorded in schema_migrations. A file starting with "-- migrate: no-transaction"
+runs statement by statement outside a transaction (CREATE INDEX CONCURRENTLY).
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import Database
+from functions import ChannelScraper
+from functions import VideoScraper
+from functions import CommentScraper
+from functions import StatsSnapshots
+from functions import RefreshScheduler
+from functions import SentimentAnalyzer
+from functions import PollTally
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+# Advisory lock key so two runners never migrate at the same time
+LOCK_KEY = 0x59544D47
+
+class MigrationError(Exception):
+    pass
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"^(\d{4})_(\w+)\.sql$", filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            sql = f.read()
+        migrations.append({
+            "version": match.group(1),
+            "name": match.group(2),
+            "sql": sql,
+            "checksum": hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            "transactional": not sql.lstrip().startswith(NO_TRANSACTION),
+        })
+    return migrations
+
+def _split_statements(sql: str):
+    # No-transaction migrations hold plain DDL only, so ";" at a line end ends a statement
+    statements = []
+    for chunk in re.split(r";\s*$", sql, flags=re.M):
+        lines = [line for line in chunk.splitlines() if line.strip() and not line.strip().startswith("--")]
+        if lines:
+            statements.append("\n".join(lines))
+    return statements
+
+def _ensure_history(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum VARCHAR NOT NULL,
+            applied_at TIMESTAMPTZ DEFAULT NOW(),
+            duration_ms INT
+        )
+    """)
+
+def _applied(cursor):
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row[0]: row for row in cursor.fetchall()}
+
+def _drop_invalid_indexes(cursor, sql: str):
+    """Drops indexes a failed CONCURRENTLY build left INVALID, so IF NOT EXISTS retries them."""
+    names = re.findall(r"CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", sql, flags=re.I)
+    if not names:
+        return
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+        """,
+        (names,)
+    )
+    for (name,) in cursor.fetchall():
+        print(f"  dropping invalid index {name}")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+@contextmanager
+def _locked_connection(db_config: dict):
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        _ensure_history(cursor)
+        yield conn, cursor
+    finally:
+        try:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        finally:
+            cursor.close()
+            conn.close()
+
+def migrate(db_config: dict):
+    """Applies every pending migration in version order; returns the versions applied."""
+    migrations = load_migrations()
+    applied_now = []
+
+    with _locked_connection(db_config) as (conn, cursor):
+        applied = _applied(cursor)
+
+        for m in migrations:
+            label = f"{m['version']}_{m['name']}"
+            if m["version"] in applied:
+                if applied[m["version"]][2] != m["checksum"]:
+                    raise MigrationError(f"{label} was edited after it was applied; add a new migration instead")
+                continue
+
+            print(f"Applying {label}...")
+            start = time.monotonic()
+            try:
+                if m["transactional"]:
+                    conn.autocommit = False
+                    cursor.execute(m["sql"])
+                else:
+                    _drop_invalid_indexes(cursor, m["sql"])
+                    for statement in _split_statements(m["sql"]):
+                        cursor.execute(statement)
+                    conn.autocommit = False
+
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+                    (m["version"], m["name"], m["checksum"], int((time.monotonic() - start) * 1000))
+                )
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                raise MigrationError(f"{label} failed: {str(e).strip()}") from e
+            finally:
+                conn.autocommit = True
+
+            applied_now.append(m["version"])
+            print(f"  done in {time.monotonic() - start:.1f}s")
+
+    return applied_now
+
+def status(db_config: dict):
+    migrations = load_migrations()
+    with _locked_connection(db_config) as (conn, cursor):
+        applied = _applied(cursor)
+
+    for m in migrations:
+        row = applied.get(m["version"])
+        if row is None:
+            state = "pending"
+        elif row[2] != m["checksum"]:
+            state = f"applied {row[3]:%Y-%m-%d %H:%M} (EDITED SINCE)"
+        else:
+            state = f"applied {row[3]:%Y-%m-%d %H:%M}"
+        print(f"{m['version']}_{m['name']:<40} {state}")
+
+# ==============================
+# CHECK MODE
+# ==============================
+
+class _ExplainCursor:
+    """Runs EXPLAIN instead of each SELECT and records the plan; the caller sees an empty result."""
+
+    def __init__(self, cursor, plans: list):
+        self._cursor = cursor
+        self._plans = plans
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, query, vars=None):
+        # "(" opens a parenthesised UNION ALL, as the keyset getters send after a dated cursor
+        if not query.lstrip().upper().startswith(("SELECT", "WITH", "(")):
+            return self._cursor.execute(query, vars)
+        self._cursor.execute("EXPLAIN (FORMAT JSON) " + query, vars)
+        self._plans.append((query, self._cursor.fetchone()[0][0]["Plan"]))
+        self._cursor.execute("SELECT 1 WHERE FALSE")
+
+class _ExplainConnection:
+    def __init__(self, conn, plans: list):
+        self._conn = conn
+        self._plans = plans
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return _ExplainCursor(self._conn.cursor(), self._plans)
+
+def _full_scans(plan: dict):
+    """Plan nodes that read a whole user table to filter it: seq scans, or index scans with no index condition."""
+    found = []
+    relation = plan.get("Relation Name", "")
+    node = plan.get("Node Type", "")
+    if relation and not relation.startswith("pg_"):
+        if node == "Seq Scan":
+            found.append(f"Seq Scan on {relation}")
+        elif node in ("Index Scan", "Index Only Scan") and "Filter" in plan and "Index Cond" not in plan:
+            found.append(f"{node} on {relation} without index condition (Filter: {plan['Filter']})")
+    for child in plan.get("Plans", []):
+        found += _full_scans(child)
+    return found
+
+def _samples(db_config: dict):
+    queries = {
+        "channel_id": "SELECT channel_id FROM channels LIMIT 1",
+        "category": "SELECT category::text FROM channels WHERE category IS NOT NULL LIMIT 1",
+        "video_id": "SELECT video_id FROM videos LIMIT 1",
+        "comment_id": "SELECT comment_id FROM comments LIMIT 1",
+    }
+    samples = {}
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        for key, query in queries.items():
+            cursor.execute(query)
+            row = cursor.fetchone()
+            samples[key] = row[0] if row else "none"
+        cursor.close()
+    return samples
+
+# Cursors for the keyset getters: past the first page, where the row comparison must drive the index
+DATED_CURSOR = (datetime(2000, 1, 1), "~")
+UNDATED_CURSOR = (None, "~")
+
+def _getter_calls(db: dict, s: dict):
+    """Every read path the UI uses, with representative arguments."""
+    return [
+        ("ChannelScraper.get_channels", lambda: ChannelScraper.get_channels(db, s["category"])),
+        ("ChannelScraper.count_channels", lambda: ChannelScraper.count_channels(db, s["category"])),
+        ("ChannelScraper.get_channels_page", lambda: ChannelScraper.get_channels_page(db, s["category"])),
+        ("ChannelScraper.get_channel_details", lambda: ChannelScraper.get_channel_details(s["channel_id"], db)),
+        ("VideoScraper.select_video_category", lambda: VideoScraper.select_video_category(s["channel_id"], db)),
+        ("VideoScraper.get_videos", lambda: VideoScraper.get_videos(db, s["channel_id"])),
+        ("VideoScraper.count_videos", lambda: VideoScraper.count_videos(db, s["channel_id"])),
+        ("VideoScraper.get_videos_page", lambda: VideoScraper.get_videos_page(db, s["channel_id"])),
+        ("VideoScraper.get_videos_page (all)", lambda: VideoScraper.get_videos_page(db)),
+        ("VideoScraper.get_videos_after", lambda: VideoScraper.get_videos_after(db, s["channel_id"], DATED_CURSOR)),
+        ("VideoScraper.get_videos_after (all)", lambda: VideoScraper.get_videos_after(db, None, DATED_CURSOR)),
+        ("VideoScraper.get_videos_after (undated)", lambda: VideoScraper.get_videos_after(db, None, UNDATED_CURSOR)),
+        ("VideoScraper.get_video_details", lambda: VideoScraper.get_video_details(s["video_id"], db)),
+        ("VideoScraper.get_publication_stats", lambda: VideoScraper.get_publication_stats(db, s["channel_id"], 30)),
+        ("VideoScraper.get_publication_time_data", lambda: VideoScraper.get_publication_time_data(db, s["channel_id"], 30)),
+        ("CommentScraper.get_comments", lambda: CommentScraper.get_comments(db, s["video_id"])),
+        ("CommentScraper.count_comments", lambda: CommentScraper.count_comments(db, s["video_id"])),
+        ("CommentScraper.get_comments_page", lambda: CommentScraper.get_comments_page(db, s["video_id"])),
+        ("CommentScraper.get_comments_page (all)", lambda: CommentScraper.get_comments_page(db)),
+        ("CommentScraper.get_comments_after", lambda: CommentScraper.get_comments_after(db, s["video_id"], DATED_CURSOR)),
+        ("CommentScraper.get_comments_after (all)", lambda: CommentScraper.get_comments_after(db, None, DATED_CURSOR)),
+        ("CommentScraper.get_comments_after (undated)", lambda: CommentScraper.get_comments_after(db, None, UNDATED_CURSOR)),
+        ("CommentScraper.get_replies", lambda: CommentScraper.get_replies(db, s["comment_id"])),
+        ("CommentScraper.count_replies", lambda: CommentScraper.count_replies(db, s["comment_id"])),
+        ("CommentScraper.get_replies_page", lambda: CommentScraper.get_replies_page(db, s["comment_id"])),
+        ("CommentScraper.get_replies_page (all)", lambda: CommentScraper.get_replies_page(db)),
+        ("CommentScraper.get_replies_after", lambda: CommentScraper.get_replies_after(db, s["comment_id"], DATED_CURSOR)),
+        ("CommentScraper.get_replies_after (all)", lambda: CommentScraper.get_replies_after(db, None, DATED_CURSOR)),
+        ("CommentScraper.get_replies_after (undated)", lambda: CommentScraper.get_replies_after(db, None, UNDATED_CURSOR)),
+        ("CommentScraper.search_comments", lambda: CommentScraper.search_comments(db, "good", video_id=s["video_id"])),
+        ("CommentScraper.search_comments (all)", lambda: CommentScraper.search_comments(db, "good")),
+        ("CommentScraper.search_replies", lambda: CommentScraper.search_replies(db, "good")),
+        ("StatsSnapshots.get_growth", lambda: StatsSnapshots.get_growth(db, "video", s["video_id"])),
+        ("SentimentAnalyzer.get_sentiment_summary", lambda: SentimentAnalyzer.get_sentiment_summary(db, s["video_id"])),
+        ("PollTally.get_poll_results", lambda: PollTally.get_poll_results(db, s["comment_id"])),
+        ("RefreshScheduler.due_items", lambda: RefreshScheduler.due_items(db, "video", 50)),
+    ]
+
+def check(db_config: dict):
+    """EXPLAINs every getter with seq scans disabled; returns False if any still needs a full scan.
+
+    With enable_seqscan off the planner only falls back to a full scan when no
+    index can serve the query, so the result does not depend on table sizes.
+    """
+    samples = _samples(db_config)
+    real_get_connection = Database.get_connection
+    plans = []
+
+    @contextmanager
+    def explain_connection(db_config: dict):
+        with real_get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.close()
+            yield _ExplainConnection(conn, plans)
+
+    ok = True
+    Database.get_connection = explain_connection
+    try:
+        for label, call in _getter_calls(db_config, samples):
+            plans.clear()
+            try:
+                # Results are the empty stand-ins, getters that unpack them may fail afterwards
+                call()
+            except Exception:
+                pass
+            if not plans:
+                print(f"SKIP  {label} (no query captured)")
+                continue
+            problems = [p for _, plan in plans for p in _full_scans(plan)]
+            if problems:
+                ok = False
+                print(f"FAIL  {label}")
+                for problem in problems:
+                    print(f"        {problem}")
+            else:
+                print(f"OK    {label}")
+    finally:
+        Database.get_connection = real_get_connection
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    mode.add_argument("--check", action="store_true", help="EXPLAIN every getter and fail on full-table scans")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            status(DB_CONFIG)
+        elif args.check:
+            sys.exit(0 if check(DB_CONFIG) else 1)
+        else:
+            applied = migrate(DB_CONFIG)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
+    except MigrationError as e:
+        print(f"Migration error: {e}")
+        sys.exit(1)
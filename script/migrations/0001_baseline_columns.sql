@@ -0,0 +1,9 @@
+-- Columns the scrapers write that older databases never got
+-- (replaces script/update_comments_schema.py)
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS user_name TEXT;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS like_count BIGINT;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS reply_count BIGINT;
+
+ALTER TABLE comment_replies ADD COLUMN IF NOT EXISTS user_name TEXT;
+
+ALTER TABLE channel_stats ADD COLUMN IF NOT EXISTS keywords TEXT[];
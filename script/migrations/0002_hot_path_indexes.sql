@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- Indexes behind the getters the UI runs on every page, built without blocking writes
+
+-- Channels page category filter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_channels_category ON channels(category);
+
+-- Videos per channel newest first; also serves videos(channel_id) lookups
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_videos_channel_published_keyset ON videos(channel_id, published_at DESC NULLS LAST, video_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_videos_published_keyset ON videos(published_at DESC NULLS LAST, video_id DESC);
+
+-- Comments per video newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_video_published_keyset ON comments(video_id, comment_published_at DESC NULLS LAST, comment_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_published_keyset ON comments(comment_published_at DESC NULLS LAST, comment_id DESC);
+
+-- Replies per parent comment newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_main_comment_id ON comment_replies(main_comment_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_parent_published_keyset ON comment_replies(main_comment_id, reply_published_at DESC NULLS LAST, reply_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_published_keyset ON comment_replies(reply_published_at DESC NULLS LAST, reply_id DESC);
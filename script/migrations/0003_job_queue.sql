@@ -0,0 +1,21 @@
+-- Turn tracking into a job queue: rows with a job_kind are claimed by workers
+-- (SELECT ... FOR UPDATE SKIP LOCKED); plain tracking rows are left alone
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS job_kind VARCHAR;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS params JSONB NOT NULL DEFAULT '{}';
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS result JSONB;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS progress_done INT NOT NULL DEFAULT 0;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS progress_total INT;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS max_attempts INT NOT NULL DEFAULT 3;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS run_after TIMESTAMP NOT NULL DEFAULT NOW();
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS last_error TEXT;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS cancel_requested BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE tracking ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW();
+
+-- Claim order for idle workers, and the stale-heartbeat sweep
+CREATE INDEX IF NOT EXISTS idx_tracking_jobs_todo ON tracking(run_after, track_id)
+    WHERE status = 'todo' AND job_kind IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_tracking_jobs_process ON tracking(heartbeat_at)
+    WHERE status = 'process' AND job_kind IS NOT NULL;
@@ -0,0 +1,17 @@
+-- Per-item refresh cadence derived from recent growth (see RefreshScheduler)
+CREATE TABLE IF NOT EXISTS refresh_schedule (
+    entity VARCHAR NOT NULL CHECK (entity IN ('video', 'channel')),
+    item_id VARCHAR NOT NULL,
+    next_refresh_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    interval_seconds INT,
+    growth_per_hour DOUBLE PRECISION,
+    last_refreshed_at TIMESTAMPTZ,
+    PRIMARY KEY (entity, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_refresh_schedule_due ON refresh_schedule(entity, next_refresh_at);
+
+-- API units the scheduler spent per quota day, checked against its daily budget
+CREATE TABLE IF NOT EXISTS refresh_budget (
+    usage_date DATE PRIMARY KEY,
+    units INT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,36 @@
+-- Lexicon sentiment scores (see SentimentAnalyzer); NULL sentiment_scored_at = not scored yet
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS sentiment_score REAL;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS sentiment_label VARCHAR(8);
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS sentiment_scored_at TIMESTAMPTZ;
+
+ALTER TABLE comment_replies ADD COLUMN IF NOT EXISTS sentiment_score REAL;
+ALTER TABLE comment_replies ADD COLUMN IF NOT EXISTS sentiment_label VARCHAR(8);
+ALTER TABLE comment_replies ADD COLUMN IF NOT EXISTS sentiment_scored_at TIMESTAMPTZ;
+
+-- Edited text is scored again on the next run
+CREATE OR REPLACE FUNCTION reset_comment_sentiment() RETURNS trigger AS $$
+BEGIN
+    -- Separate branches: each record only has its own table's text column
+    IF TG_TABLE_NAME = 'comments' THEN
+        IF NEW.comment_text IS NOT DISTINCT FROM OLD.comment_text THEN
+            RETURN NEW;
+        END IF;
+    ELSIF NEW.reply_text IS NOT DISTINCT FROM OLD.reply_text THEN
+        RETURN NEW;
+    END IF;
+    NEW.sentiment_score := NULL;
+    NEW.sentiment_label := NULL;
+    NEW.sentiment_scored_at := NULL;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS comments_reset_sentiment ON comments;
+CREATE TRIGGER comments_reset_sentiment
+BEFORE UPDATE OF comment_text ON comments
+FOR EACH ROW EXECUTE FUNCTION reset_comment_sentiment();
+
+DROP TRIGGER IF EXISTS comment_replies_reset_sentiment ON comment_replies;
+CREATE TRIGGER comment_replies_reset_sentiment
+BEFORE UPDATE OF reply_text ON comment_replies
+FOR EACH ROW EXECUTE FUNCTION reset_comment_sentiment();
@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- Incremental sentiment runs find unscored rows without scanning the scored ones
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_sentiment_unscored ON comments(comment_id) WHERE sentiment_scored_at IS NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_sentiment_unscored ON comment_replies(reply_id) WHERE sentiment_scored_at IS NULL;
@@ -0,0 +1,52 @@
+-- "One user, one vote" poll tallies over the replies to a poll comment (see PollTally)
+
+-- Reply text -> vote option: markup, entities, leading @mentions and punctuation dropped, lowercased
+CREATE OR REPLACE FUNCTION poll_option(reply TEXT) RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        regexp_replace(
+            regexp_replace(
+                regexp_replace(lower(reply), '<[^>]*>|&[a-z0-9#]+;', ' ', 'g'),
+                '^\s*(@\S+\s*)+', ''),
+            '[^[:alnum:][:space:]]+', ' ', 'g'),
+        '\s+', ' ', 'g'))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE TABLE IF NOT EXISTS polls (
+    main_comment_id VARCHAR PRIMARY KEY REFERENCES comments(comment_id) ON DELETE CASCADE,
+    -- 'first': a user's earliest reply counts, 'last': their latest one
+    vote_rule VARCHAR(5) NOT NULL DEFAULT 'first' CHECK (vote_rule IN ('first', 'last')),
+    -- Replies scraped after this are re-tallied on the next refresh
+    tallied_through TIMESTAMP,
+    refreshed_at TIMESTAMPTZ
+);
+
+-- Spellings merged into one option, per poll ("ind" -> "india")
+CREATE TABLE IF NOT EXISTS poll_option_aliases (
+    main_comment_id VARCHAR REFERENCES polls(main_comment_id) ON DELETE CASCADE,
+    alias TEXT,
+    option TEXT NOT NULL,
+    PRIMARY KEY (main_comment_id, alias)
+);
+
+-- The one counted reply per user
+CREATE TABLE IF NOT EXISTS poll_votes (
+    main_comment_id VARCHAR REFERENCES polls(main_comment_id) ON DELETE CASCADE,
+    user_id VARCHAR,
+    reply_id VARCHAR NOT NULL,
+    option TEXT NOT NULL,
+    voted_at TIMESTAMP,
+    PRIMARY KEY (main_comment_id, user_id)
+);
+
+-- Running totals, adjusted by the vote changes of each refresh
+CREATE TABLE IF NOT EXISTS poll_results (
+    main_comment_id VARCHAR REFERENCES polls(main_comment_id) ON DELETE CASCADE,
+    option TEXT,
+    votes INT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (main_comment_id, option)
+);
+
+DROP TRIGGER IF EXISTS poll_results_data_changed ON poll_results;
+CREATE TRIGGER poll_results_data_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON poll_results
+FOR EACH STATEMENT EXECUTE FUNCTION notify_data_changed();
@@ -0,0 +1,3 @@
+-- migrate: no-transaction
+-- Per-user reply order within a poll, read by the tally's window function
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_poll_user ON comment_replies(main_comment_id, user_id, reply_published_at);
@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- Full-text search over comment and reply text (CommentScraper.search_comments / search_replies).
+-- 'simple' keeps words as written: no stemming or stop words, comments mix languages.
+-- Adding a stored generated column rewrites the table once; run it in a quiet period.
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS comment_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, COALESCE(comment_text, ''))) STORED;
+ALTER TABLE comment_replies ADD COLUMN IF NOT EXISTS reply_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple'::regconfig, COALESCE(reply_text, ''))) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_tsv ON comments USING GIN (comment_tsv);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comment_replies_tsv ON comment_replies USING GIN (reply_tsv);
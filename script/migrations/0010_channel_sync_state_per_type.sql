@@ -0,0 +1,9 @@
+-- One uploads-playlist cursor per channel and video type ('' for unfiltered syncs):
+-- a "shorts" sync must not move the cursor past the long videos it fetched but did not store
+ALTER TABLE channel_sync_state ADD COLUMN IF NOT EXISTS video_type VARCHAR NOT NULL DEFAULT '';
+ALTER TABLE channel_sync_state DROP CONSTRAINT IF EXISTS channel_sync_state_pkey;
+ALTER TABLE channel_sync_state ADD PRIMARY KEY (channel_id, video_type);
+
+-- Cursors written so far may have been moved by filtered syncs; the next sync falls back to
+-- stopping at the first page of stored videos
+UPDATE channel_sync_state SET newest_video_id = NULL;
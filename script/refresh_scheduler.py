@@ -0,0 +1,48 @@
+"""Refreshes channels and videos whose growth-based refresh time has come.
+
+    python script/refresh_scheduler.py                 one pass over everything due
+    python script/refresh_scheduler.py --loop          repeat every 15 minutes
+    python script/refresh_scheduler.py --budget 500    cap today's spend at 500 units
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import RefreshScheduler
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+YT_API_KEY = os.getenv("YT_API_KEY")
+
+def run_once(budget: int):
+    result = RefreshScheduler.run_due(YT_API_KEY, DB_CONFIG, daily_budget=budget)
+    print(
+        f"Refreshed {result['channels']} channels and {result['videos']} videos "
+        f"({result['units']} units, {result['failed']} failed, {result['budget_left']} left today)"
+    )
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run due growth-based refreshes.")
+    parser.add_argument("--loop", action="store_true", help="keep running")
+    parser.add_argument("--interval", type=float, default=900, help="seconds between passes with --loop")
+    parser.add_argument("--budget", type=int, default=RefreshScheduler.DAILY_BUDGET, help="daily API unit budget")
+    args = parser.parse_args()
+
+    run_once(args.budget)
+    while args.loop:
+        time.sleep(args.interval)
+        run_once(args.budget)
@@ -0,0 +1,64 @@
+"""Rebuilds rows from the raw API response archive without spending any quota.
+
+    python script/replay_archive.py                                  replay everything
+    python script/replay_archive.py --resource commentThreads comments
+    python script/replay_archive.py --from 2024-06-01 --workers 8
+
+Useful after adding a column the parsers fill: the archived pages are parsed
+again and upserted, instead of scraping (and paying for) them a second time.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import ArchiveReplay
+from functions import ResponseArchive
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+def report(resource, stats):
+    print(f"  {resource}: {stats['pages']:,} pages, {stats['rows']:,} rows", end="\r")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay archived YouTube API responses into the database.")
+    parser.add_argument("--resource", nargs="+", choices=ArchiveReplay.REPLAY_ORDER, help="resources to replay (default all)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="first partition date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="last partition date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=ArchiveReplay.REPLAY_WORKERS, help="decompression processes (0 = every core)")
+    parser.add_argument("--archive", default=ResponseArchive.ARCHIVE_DIR, help="archive directory")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    try:
+        summary = ArchiveReplay.replay(
+            DB_CONFIG,
+            resources=args.resource,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            workers=args.workers,
+            archive_dir=args.archive,
+            progress=report
+        )
+    except ArchiveReplay.ArchiveReplayError as e:
+        sys.exit(str(e))
+
+    for resource, stats in summary.items():
+        print(
+            f"{resource}: {stats['files']} files, {stats['pages']:,} pages, {stats['rows']:,} rows written, "
+            f"{stats['dropped']:,} without a stored parent, {stats['unparsable']:,} unparsable"
+        )
+    print(f"Done in {time.monotonic() - started:.1f}s, 0 API units spent")
@@ -0,0 +1,46 @@
+"""Scores the sentiment of stored comments and replies with the lexicon in SentimentAnalyzer.
+
+    python script/score_sentiment.py                  score rows not scored yet, on every core
+    python script/score_sentiment.py --workers 4      limit to four processes
+    python script/score_sentiment.py --rescore        score everything again (e.g. after a lexicon change)
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import SentimentAnalyzer
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score comment and reply sentiment.")
+    parser.add_argument("--workers", type=int, default=SentimentAnalyzer.WORKERS, help="scoring processes (0 = every core)")
+    parser.add_argument("--batch-size", type=int, default=SentimentAnalyzer.BATCH_SIZE, help="rows per batch")
+    parser.add_argument("--rescore", action="store_true", help="score rows that already have a score too")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    for table in SentimentAnalyzer.TABLES:
+        count = SentimentAnalyzer.score_table(
+            DB_CONFIG,
+            table,
+            rescore=args.rescore,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            progress=lambda done, _: print(f"  {table}: {done:,} scored", end="\r")
+        )
+        print(f"{table}: {count:,} rows scored")
+    print(f"Done in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,59 @@
+"""Background worker for scrape jobs queued in the tracking table.
+
+    python script/worker.py                 one worker process
+    python script/worker.py --processes 4   four worker processes
+    python script/worker.py --once          run at most one job, then exit
+
+SIGINT/SIGTERM let the current job finish before the worker exits.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from functions import JobQueue
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "port": os.getenv("DB_PORT")
+}
+
+YT_API_KEY = os.getenv("YT_API_KEY")
+
+def run_worker(once: bool = False):
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    print(f"Worker {os.getpid()} started")
+    JobQueue.work(YT_API_KEY, DB_CONFIG, stop=stop, once=once)
+    print(f"Worker {os.getpid()} stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scrape job workers.")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--once", action="store_true", help="run at most one job and exit")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.once)
+    else:
+        workers = [multiprocessing.Process(target=run_worker, args=(args.once,)) for _ in range(args.processes)]
+        for worker in workers:
+            worker.start()
+        # Children get the same SIGINT from the terminal; SIGTERM is forwarded
+        signal.signal(signal.SIGTERM, lambda *_: [w.terminate() for w in workers if w.is_alive()])
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for worker in workers:
+            worker.join()
@@ -1,11 +1,16 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import pandas as pd
 from dotenv import load_dotenv
 from functions import ChannelScraper
 from functions import VideoScraper
 from functions import CommentScraper
+from functions import YouTubeClient
+from functions import StatsSnapshots
+from functions import JobQueue
+from functions import RefreshScheduler
+from functions import SentimentAnalyzer
+from functions import PollTally
+from functions import Exporter
 import os
 load_dotenv()
 
@@ -30,12 +35,63 @@ DB_CONFIG = {
 
 YT_API_KEY = os.getenv("YT_API_KEY")
 
+# ==============================
+# PAGINATED TABLES
+# ==============================
+PAGE_SIZES = [25, 50, 100, 200]
+
+def table_controls(key: str, total: int, sort_options: dict):
+    """Sort and page controls of a server-side paginated table; returns (sort_by, descending, limit, offset)."""
+    c1, c2, c3, c4 = st.columns([3, 1, 1, 1])
+    sort_label = c1.selectbox("Sort by", list(sort_options.keys()), key=f"{key}_sort")
+    descending = c2.toggle("Descending", value=True, key=f"{key}_desc")
+    page_size = c3.selectbox("Rows / page", PAGE_SIZES, index=1, key=f"{key}_size")
+
+    pages = max(1, -(-total // page_size))
+    # Clamp before the widget is drawn, a narrower filter can shrink the page count
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = c4.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    return sort_options[sort_label], descending, page_size, (page - 1) * page_size
+
+def search_controls(key: str, label: str):
+    """Full-text search box with channel and date filters; returns (search, channel_id, date_from, date_to)."""
+    search = st.text_input(label, placeholder='words, "exact phrase", this or that, -without', key=f"{key}_search").strip()
+    if not search:
+        return None, None, None, None
+    channel_dict = VideoScraper.select_channel_name(db_config=DB_CONFIG)
+    c1, c2, c3 = st.columns([2, 1, 1])
+    channel_name = c1.selectbox("Channel", ["All Channels"] + list(channel_dict.keys()), key=f"{key}_channel")
+    date_from = c2.date_input("Published from", value=None, key=f"{key}_from")
+    date_to = c3.date_input("Published to", value=None, key=f"{key}_to")
+    return search, channel_dict.get(channel_name), date_from, date_to
+
+def search_total_label(total: int, noun: str):
+    capped = "+" if total >= CommentScraper.SEARCH_COUNT_LIMIT else ""
+    return f"**{total:,}{capped}** {noun} match"
+
+def selectable_table(key: str, df, column_config: dict):
+    """Draws one page as a single-row-selectable table; returns the selected row or None."""
+    event = st.dataframe(
+        df,
+        key=f"{key}_table",
+        hide_index=True,
+        use_container_width=True,
+        column_order=list(column_config.keys()),
+        column_config=column_config,
+        on_select="rerun",
+        selection_mode="single-row"
+    )
+    rows = event.selection.rows
+    return df.iloc[rows[0]] if rows and rows[0] < len(df) else None
+
 
 # ==============================
 # SIDEBAR
 # ==============================
 st.sidebar.title("📊 YT Analytics")
-menu = st.sidebar.radio("Menu", ["Dashboard", "Channels","Videos", "Comments", "Replays", "Analysis"])
+menu = st.sidebar.radio("Menu", ["Dashboard", "Channels","Videos", "Comments", "Replays", "Analysis", "Jobs", "Export"])
 
 # ==============================
 # DASHBOARD PAGE
@@ -44,6 +100,30 @@ if menu == "Dashboard":
     st.title("Dashboard")
     st.info("Welcome to YouTube Analytics Platform , Lets Explore the YT 🚀")
 
+    cache_stats = YouTubeClient.cache_stats()
+    if cache_stats:
+        st.subheader("API Response Cache")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        c2.metric("Hits / Misses", f"{cache_stats['hits']:,} / {cache_stats['misses']:,}")
+        c3.metric("Cached Responses", f"{cache_stats['entries']:,}")
+        c4.metric("Bandwidth Saved", f"{cache_stats['bytes_saved'] / 1024 / 1024:,.1f} MB")
+
+    st.subheader("Refresh Schedule")
+    schedule = RefreshScheduler.get_schedule_summary(DB_CONFIG)
+    if not schedule.empty:
+        st.dataframe(schedule, use_container_width=True, hide_index=True)
+    st.caption(f"Budget left today: {RefreshScheduler.remaining_budget(DB_CONFIG):,} of {RefreshScheduler.DAILY_BUDGET:,} units")
+    if st.button("⏱️ Run Due Refreshes"):
+        with st.spinner("Refreshing due channels and videos..."):
+            try:
+                result = RefreshScheduler.run_due(YT_API_KEY, DB_CONFIG)
+                st.success(f"Refreshed {result['channels']} channels and {result['videos']} videos using {result['units']} units.")
+                if result["quota_exhausted"]:
+                    st.warning("API quota exhausted; the remaining items stay due.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
 # ==============================
 # CHANNEL PAGE
 # ==============================
@@ -83,6 +163,13 @@ if menu == "Channels":
             
             st.divider()
             
+            # Growth history
+            growth = StatsSnapshots.get_growth(DB_CONFIG, "channel", channel_id, granularity="daily")
+            if not growth.empty:
+                st.subheader("Growth")
+                st.line_chart(growth.set_index("bucket")[["subscribers_count", "total_view_count"]])
+                st.divider()
+            
             # Keywords/Tags
             if details["keywords"]:
                 st.subheader("Keywords")
@@ -92,7 +179,7 @@ if menu == "Channels":
             
             st.stop() # Skip list view
 
-    col1, col2 = st.columns([8, 1])
+    col1, col2, col3 = st.columns([7, 1, 1])
 
     with col1:
         st.title("Channels")
@@ -101,6 +188,20 @@ if menu == "Channels":
         if st.button("➕ Add"):
             st.session_state.show_add_channel = True
 
+    with col3:
+        refresh_all = st.button("🔄 Refresh all")
+
+    if refresh_all:
+        with st.spinner("Refreshing all channels..."):
+            try:
+                result = ChannelScraper.refresh_channels(api_key=YT_API_KEY, db_config=DB_CONFIG)
+                st.success(f"Refreshed {len(result['refreshed'])} channels")
+                if result["failed"]:
+                    st.warning(f"{len(result['failed'])} channels failed")
+                    st.json(result["failed"], expanded=False)
+            except Exception as e:
+                st.error(f"Error: {e}")
+
     st.divider()
     categories = ChannelScraper.get_channel_categories(db_config=DB_CONFIG)
     # Category Filter
@@ -109,85 +210,54 @@ if menu == "Channels":
         ["All"] + categories
     )
 
-    df = ChannelScraper.get_channels(category_filter=category_filter, db_config=DB_CONFIG)
-
-    st.write(f"Total Channels: {len(df)}")
-
-    # Sort by subscribers (optional but recommended)
-    if not df.empty:
-        df = df.sort_values("subscribers_count", ascending=False)
-
-    st.divider()
-
-    # ==============================
-    # TABLE HEADER
-    # ==============================
-    header_cols = st.columns([1, 3, 2, 2, 2, 2, 2, 1, 1])
-
-    headers = [
-        "Profile",
-        "Channel Name",
-        "Category",
-        "Subscribers",
-        "Videos",
-        "Views",
-        "Published",
-        "View",
-        "Delete"
-    ]
-
-    for col, header in zip(header_cols, headers):
-        col.markdown(f"**{header}**")
+    total = ChannelScraper.count_channels(DB_CONFIG, category_filter=category_filter)
+
+    st.write(f"Total Channels: {total}")
+
+    sort_by, descending, limit, offset = table_controls("channels", total, {
+        "Subscribers": "subscribers_count",
+        "Videos": "total_video_count",
+        "Views": "total_view_count",
+        "Channel Name": "channel_name",
+        "Category": "category",
+        "Published": "published_at",
+    })
+    df = ChannelScraper.get_channels_page(
+        DB_CONFIG,
+        category_filter=category_filter,
+        sort_by=sort_by,
+        descending=descending,
+        limit=limit,
+        offset=offset
+    )
 
     st.divider()
 
     # ==============================
-    # TABLE ROWS
+    # TABLE
     # ==============================
-    for _, row in df.iterrows():
-
-        cols = st.columns([1, 3, 2, 2, 2, 2, 2, 1, 1])
-
-        # Profile Picture
-        if row["profile_picture"]:
-            cols[0].image(row["profile_picture"], width=50)
-        else:
-            cols[0].write("-")
-
-        # Channel Name
-        cols[1].write(row["channel_name"])
-
-        # Category
-        cols[2].write(row["category"])
-
-        # Subscribers
-        subs = row["subscribers_count"] or 0
-        cols[3].write(f"{subs:,}")
-
-        # Videos
-        vids = row["total_video_count"] or 0
-        cols[4].write(f"{vids:,}")
-
-        # Views
-        views = row["total_view_count"] or 0
-        cols[5].write(f"{views:,}")
-
-        # Published Date
-        cols[6].write(row["published_at"])
-
-        # View Button
-        if cols[7].button("👁️", key=f"view_{row['channel_id']}"):
-            st.session_state.selected_channel_id = row['channel_id']
-            st.rerun()
-
-        # Delete Button
-        if cols[8].button("🗑", key=f"delete_{row['channel_id']}"):
-            ChannelScraper.delete_channel(row["channel_id"], db_config=DB_CONFIG)
-            st.success("Channel deleted successfully")
-            st.rerun()
-
-        st.divider()
-
+    selected = selectable_table("channels", df, {
+        "profile_picture": st.column_config.ImageColumn("Profile"),
+        "channel_name": "Channel Name",
+        "category": "Category",
+        "subscribers_count": st.column_config.NumberColumn("Subscribers"),
+        "total_video_count": st.column_config.NumberColumn("Videos"),
+        "total_view_count": st.column_config.NumberColumn("Views"),
+        "published_at": st.column_config.DatetimeColumn("Published"),
+    })
+
+    col_view, col_delete, _ = st.columns([1, 1, 6])
+
+    # View Button
+    if col_view.button("👁️ View", key="view_channel", disabled=selected is None):
+        st.session_state.selected_channel_id = selected["channel_id"]
+        st.rerun()
+
+    # Delete Button
+    if col_delete.button("🗑 Delete", key="delete_channel", disabled=selected is None):
+        ChannelScraper.delete_channel(selected["channel_id"], db_config=DB_CONFIG)
+        st.success("Channel deleted successfully")
+        st.rerun()
 
     # ==============================
     # ADD CHANNEL FORM
@@ -214,14 +284,14 @@ if menu == "Channels":
                 if not channel_input:
                     st.error("Channel ID or Username required")
                 else:
-                    # Here later we call scraper function
-                    channel = ChannelScraper.scrape_channel(
-                        api_key=YT_API_KEY,
-                        db_config=DB_CONFIG,
-                        channel_id=channel_input,
-                        category=category
+                    # Scraped by a background worker (script/worker.py)
+                    track_id = JobQueue.enqueue(
+                        DB_CONFIG,
+                        "scrape_channel",
+                        {"channel_id": channel_input, "category": category},
+                        name=f"Channel {channel_input}"
                     )
-                    st.success("Scraping will be implemented next 🚀")
+                    st.success(f"Queued as job #{track_id}, follow it on the Jobs page")
                     st.session_state.show_add_channel = False
 
 
@@ -234,19 +304,7 @@ if menu == "Videos":
     if "selected_video_id" in st.session_state and st.session_state.selected_video_id:
         video_id = st.session_state.selected_video_id
         
-        # We need a function to get video details
-        conn = psycopg2.connect(**DB_CONFIG)
-        curr = conn.cursor(cursor_factory=RealDictCursor)
-        curr.execute("""
-            SELECT v.*, vs.*, c.channel_name 
-            FROM videos v 
-            JOIN video_stats vs ON v.video_id = vs.video_id 
-            JOIN channels c ON v.channel_id = c.channel_id
-            WHERE v.video_id = %s
-        """, (video_id,))
-        v_details = curr.fetchone()
-        curr.close()
-        conn.close()
+        v_details = VideoScraper.get_video_details(video_id, db_config=DB_CONFIG)
         
         if v_details:
             if st.button("⬅️ Back to Videos"):
@@ -263,6 +321,13 @@ if menu == "Videos":
             
             st.divider()
             
+            # Growth history
+            growth = StatsSnapshots.get_growth(DB_CONFIG, "video", video_id, granularity="hourly", days=30)
+            if not growth.empty:
+                st.subheader("Growth")
+                st.line_chart(growth.set_index("bucket")[["view_count", "like_count", "comment_count"]])
+                st.divider()
+            
             # Tags and Hashtags
             col_tags, col_hash = st.columns(2)
             with col_tags:
@@ -309,84 +374,67 @@ if menu == "Videos":
     else:
         selected_channel_id = None
     st.divider()
-    df = VideoScraper.get_videos(channel_id=selected_channel_id, db_config=DB_CONFIG)
-
-    st.write(f"Total Videos: {len(df)}")
-
-
-    # ==============================
-    # TABLE HEADER
-    # ==============================
-    header_cols = st.columns([4, 1, 2, 1, 1, 1, 1, 1, 2, 1, 1])
-
-    headers = [
-        "Video Title",
-        "Category",
-        "Channel Name",
-        "Type",
-        "Duration",
-        "Views",
-        "Likes",
-        "Comments",
-        "Published",
-        "View",
-        "Action"
-    ]
-
-    for col, header in zip(header_cols, headers):
-        col.markdown(f"**{header}**")
+    total = VideoScraper.count_videos(DB_CONFIG, channel_id=selected_channel_id)
+
+    st.write(f"Total Videos: {total}")
+
+    sort_by, descending, limit, offset = table_controls("videos", total, {
+        "Published": "published_at",
+        "Views": "view_count",
+        "Likes": "like_count",
+        "Comments": "comment_count",
+        "Duration": "duration",
+        "Video Title": "video_title",
+        "Channel Name": "channel_name",
+    })
+    df = VideoScraper.get_videos_page(
+        DB_CONFIG,
+        channel_id=selected_channel_id,
+        sort_by=sort_by,
+        descending=descending,
+        limit=limit,
+        offset=offset
+    )
 
-    st.divider()
+    # Duration format
+    dur = df["duration"].fillna(0).astype(int)
+    df["duration_label"] = (dur // 60).map("{:02d}".format) + ":" + (dur % 60).map("{:02d}".format)
 
     # ==============================
-    # TABLE ROWS
+    # TABLE
     # ==============================
-    for _, row in df.iterrows():
-        cols = st.columns([4, 1, 2, 1, 1, 1, 1, 1, 2, 1, 1])
-        
-        cols[0].write(row["video_title"])
-        cols[1].write(row["video_category"])
-        cols[2].write(row["channel_name"])
-        cols[3].write(row["format_type"])
-        
-        # Duration format
-        dur = row["duration"] or 0
-        minutes = dur // 60
-        secs = dur % 60
-        cols[4].write(f"{minutes:02d}:{secs:02d}")
-        
-        cols[5].write(f"{int(row['view_count'] or 0):,}")
-        cols[6].write(f"{int(row['like_count'] or 0):,}")
-        cols[7].write(f"{int(row['comment_count'] or 0):,}")
-        cols[8].write(row["published_at"].strftime("%Y-%m-%d %H:%M:%S") if row["published_at"] else "-")
-        
-        # View Button
-        if cols[9].button("👁️", key=f"v_view_{row['video_id']}"):
-            st.session_state.selected_video_id = row['video_id']
+    selected = selectable_table("videos", df, {
+        "video_title": st.column_config.TextColumn("Video Title", width="large"),
+        "video_category": "Category",
+        "channel_name": "Channel Name",
+        "format_type": "Type",
+        "duration_label": "Duration",
+        "view_count": st.column_config.NumberColumn("Views"),
+        "like_count": st.column_config.NumberColumn("Likes"),
+        "comment_count": st.column_config.NumberColumn("Comments"),
+        "published_at": st.column_config.DatetimeColumn("Published", format="YYYY-MM-DD HH:mm:ss"),
+    })
+
+    col_view, col_delete, _ = st.columns([1, 1, 6])
+
+    # View Button
+    if col_view.button("👁️ View", key="view_video", disabled=selected is None):
+        st.session_state.selected_video_id = selected["video_id"]
+        st.rerun()
+
+    if col_delete.button("🗑 Delete", key="delete_video", disabled=selected is None):
+        try:
+            VideoScraper.delete_video(selected["video_id"], db_config=DB_CONFIG)
+            st.success("Video deleted")
             st.rerun()
-
-        if cols[10].button("🗑", key=f"del_vid_{row['video_id']}"):
-            # Add a delete function in VideoScraper if needed, or just run query
-            msg = st.empty()
-            try:
-                conn = psycopg2.connect(**DB_CONFIG)
-                curr = conn.cursor()
-                curr.execute("DELETE FROM videos WHERE video_id = %s", (row["video_id"],))
-                conn.commit()
-                curr.close()
-                conn.close()
-                st.success("Video deleted")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error: {e}")
-
-        st.divider()
+        except Exception as e:
+            st.error(f"Error: {e}")
 
     # ==============================
     # ADD VIDEO FORM
     # ==============================
-    categories = ChannelScraper.get_channel_categories(db_config=DB_CONFIG)
     if st.session_state.get("show_add_video"):
+        categories = ChannelScraper.get_channel_categories(db_config=DB_CONFIG)
         scrape_type = st.radio("Video Scrape Type", ["Single Video", "Entire Channel"], key="video_scrape_type")
         
         if scrape_type == "Single Video":
@@ -415,7 +463,6 @@ if menu == "Videos":
                             st.error(f"Error: {str(e)}")
         
         elif scrape_type == "Entire Channel":
-            st.info("Channel scraping to be implemented...")
             with st.form("add_video_form"):
                 col1, col2 = st.columns(2)
 
@@ -428,6 +475,7 @@ if menu == "Videos":
                 col3, col4 = st.columns(2)
                 max_pages = col3.number_input("Max Pages", min_value=1, value=1)
                 max_videos_per_page = col4.number_input("Max Videos Per Page", min_value=1, value=10)
+                incremental = st.checkbox("Only new uploads since the last sync", value=False)
 
                 submitted = st.form_submit_button("Scrape Channel")
 
@@ -435,20 +483,37 @@ if menu == "Videos":
                     if not channel_id:
                         st.error("Channel ID required")
                     else:
-                        try:
-                            result = VideoScraper.scrape_channel_videos(
-                                api_key=YT_API_KEY,
-                                db_config=DB_CONFIG,
-                                channel_id=channel_id,
-                                video_type=video_type,
-                                max_pages=max_pages,
-                                max_videos_per_page=max_videos_per_page
-                            )
-                            st.success(f"Successfully scraped: {result['title']}")
-                            st.session_state.show_add_video = False
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
+                        track_id = JobQueue.enqueue(
+                            DB_CONFIG,
+                            "scrape_channel_videos",
+                            {
+                                "channel_id": channel_id,
+                                "video_type": video_type,
+                                "max_pages": int(max_pages),
+                                "max_videos_per_page": int(max_videos_per_page),
+                                "incremental": incremental
+                            },
+                            name=f"Videos of {channel_id}"
+                        )
+                        st.success(f"Queued as job #{track_id}, follow it on the Jobs page")
+            if st.button("🔄 Sync New Uploads For All Channels"):
+                with st.spinner("Syncing new uploads..."):
+                    result = VideoScraper.sync_channels_videos(api_key=YT_API_KEY, db_config=DB_CONFIG)
+                st.success(f"Added {sum(result['scraped'].values())} new videos from {len(result['scraped'])} channels")
+                if result["failed"]:
+                    st.warning(f"{len(result['failed'])} channels failed")
+                    st.json(result["failed"], expanded=False)
+            if st.button("📊 Refresh Stats For All Videos"):
+                with st.spinner("Refreshing video statistics..."):
+                    result = VideoScraper.refresh_video_stats(api_key=YT_API_KEY, db_config=DB_CONFIG)
+                st.success(f"Refreshed {result['updated']} of {result['requested']} videos")
+                if result["quota_exhausted"]:
+                    st.warning("Stopped early: daily API quota exhausted")
+                if result["missing"]:
+                    st.info(f"{len(result['missing'])} videos are no longer available")
+                if result["failed"]:
+                    st.warning(f"{len(result['failed'])} videos failed")
+                    st.json(result["failed"], expanded=False)
             if st.button("Close"):
                 st.session_state.show_add_video = False
                 st.rerun()
@@ -461,76 +526,169 @@ if menu == "Comments":
     
     # 1. Scraping Section
     with st.expander("➕ Scrape Comments", expanded=not st.session_state.get("show_comments_list", True)):
-        with st.form("scrape_comments_form"):
-            col1, col2, col3 = st.columns([2, 1, 1])
-            video_id_input = col1.text_input("Enter Video ID")
-            max_pages = col2.number_input("Max Pages", min_value=1, value=1)
-            max_results_per_page = col3.number_input("Max Results / Page", min_value=1, value=20)
+        scrape_scope = st.radio("Scrape Scope", ["Single Video", "Entire Channel"], horizontal=True, key="comment_scrape_scope")
+
+        if scrape_scope == "Single Video":
+            with st.form("scrape_comments_form"):
+                col1, col2, col3 = st.columns([2, 1, 1])
+                video_id_input = col1.text_input("Enter Video ID")
+                max_pages = col2.number_input("Max Pages", min_value=1, value=1)
+                max_results_per_page = col3.number_input("Max Results / Page", min_value=1, value=20)
+                incremental = st.checkbox("Only new comments since the last sync", value=False)
+                include_replies = st.checkbox("Include all replies", value=False)
             
-            submit_scrape = st.form_submit_button("Start Scraping")
+                submit_scrape = st.form_submit_button("Start Scraping")
             
-            if submit_scrape:
-                if not video_id_input:
-                    st.error("Video ID is required")
-                else:
-                    with st.spinner("Scraping comments..."):
-                        try:
-                            scraped_count = CommentScraper.scrape_comments(
-                                api_key=YT_API_KEY,
-                                db_config=DB_CONFIG,
-                                video_id=video_id_input,
-                                max_pages=max_pages,
-                                max_results_per_page=max_results_per_page
-                            )
-                            st.success(f"Successfully scraped {scraped_count} comments!")
-                            st.session_state.show_comments_list = True
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error scraping comments: {str(e)}")
+                if submit_scrape:
+                    if not video_id_input:
+                        st.error("Video ID is required")
+                    else:
+                        track_id = JobQueue.enqueue(
+                            DB_CONFIG,
+                            "scrape_comments",
+                            {
+                                "video_id": video_id_input,
+                                "max_pages": int(max_pages),
+                                "max_results_per_page": int(max_results_per_page),
+                                "incremental": incremental,
+                                "include_replies": include_replies
+                            },
+                            name=f"Comments of {video_id_input}"
+                        )
+                        st.success(f"Queued as job #{track_id}, follow it on the Jobs page")
+                        st.session_state.show_comments_list = True
+
+        else:
+            channel_dict = VideoScraper.select_channel_name(db_config=DB_CONFIG)
+            with st.form("scrape_channel_comments_form"):
+                selected_channel = st.selectbox("Channel", list(channel_dict.keys()))
+
+                col1, col2, col3, col4 = st.columns(4)
+                max_pages_per_video = col1.number_input("Max Pages / Video", min_value=1, value=1)
+                max_results_per_page = col2.number_input("Max Results / Page", min_value=1, max_value=100, value=100)
+                worker_limit = CommentScraper.max_harvest_workers(DB_CONFIG)
+                max_workers = col3.number_input(
+                    "Parallel Videos", min_value=1, max_value=worker_limit, value=min(8, worker_limit),
+                    help="Capped by the database connection pool size (DB_POOL_MAX_SIZE)"
+                )
+                deadline_minutes = col4.number_input("Deadline (minutes)", min_value=1, value=10)
+                incremental = st.checkbox("Only new comments since the last sync", value=True)
+                include_replies = st.checkbox("Include all replies", value=False, key="channel_include_replies")
+
+                submit_channel = st.form_submit_button("Start Channel Scraping")
+
+                if submit_channel:
+                    if not selected_channel:
+                        st.error("Add the channel and its videos first")
+                    else:
+                        with st.spinner("Scraping channel comments..."):
+                            try:
+                                result = CommentScraper.scrape_channel_comments(
+                                    api_key=YT_API_KEY,
+                                    db_config=DB_CONFIG,
+                                    channel_id=channel_dict[selected_channel],
+                                    max_pages_per_video=max_pages_per_video,
+                                    max_results_per_page=max_results_per_page,
+                                    max_workers=max_workers,
+                                    deadline_seconds=deadline_minutes * 60,
+                                    incremental=incremental,
+                                    include_replies=include_replies
+                                )
+                                total = sum(result["scraped"].values())
+                                total_replies = sum(result["replies"].values())
+                                st.success(f"Scraped {total} comments and {total_replies} replies from {len(result['scraped'])} videos")
+                                if result["skipped"]:
+                                    st.warning(f"Deadline reached, {len(result['skipped'])} videos not started")
+                                if result["failed"]:
+                                    st.warning(f"{len(result['failed'])} videos failed")
+                                    st.json(result["failed"], expanded=False)
+                                st.session_state.show_comments_list = True
+                            except Exception as e:
+                                st.error(f"Error scraping comments: {str(e)}")
 
     # 2. Filter Section
     st.divider()
     
     # Selection for filtering by video
     # We can get a list of videos that have comments in our DB
-    conn = psycopg2.connect(**DB_CONFIG)
-    curr = conn.cursor()
-    curr.execute("SELECT DISTINCT v.video_id, v.video_title FROM comments c JOIN videos v ON c.video_id = v.video_id")
-    videos_with_comments = curr.fetchall()
-    curr.close()
-    conn.close()
-    
     video_options = {"All Videos": None}
-    for vid_id, vid_title in videos_with_comments:
-        video_options[vid_title] = vid_id
+    video_options.update(CommentScraper.get_videos_with_comments(DB_CONFIG))
         
     selected_video_title = st.selectbox("View Comments for Video:", list(video_options.keys()))
     selected_video_id = video_options[selected_video_title]
     
-    # 3. List Comments
-    comments_df = CommentScraper.get_comments(DB_CONFIG, video_id=selected_video_id)
+    # Sentiment of the scored comments and replies
+    sentiment_df = SentimentAnalyzer.get_sentiment_summary(DB_CONFIG, video_id=selected_video_id)
+    col1, col2 = st.columns([4, 1])
+    if not sentiment_df.empty:
+        col1.bar_chart(sentiment_df, x="sentiment_label", y="count", color="source", stack=False)
+    if col2.button("🧠 Score New Comments"):
+        with st.spinner("Scoring sentiment..."):
+            try:
+                scored = SentimentAnalyzer.score_all(DB_CONFIG)
+                st.success(f"Scored {scored['comments']} comments and {scored['comment_replies']} replies")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error scoring sentiment: {e}")
+    
+    # Full-text search (GIN-indexed), narrowed by the video selected above
+    search, search_channel_id, date_from, date_to = search_controls("comments", "🔎 Search comments")
     
-    st.write(f"Showing **{len(comments_df)}** comments")
+    # 3. List Comments (one page at a time)
+    sort_options = {
+        "Published At": "comment_published_at",
+        "Likes": "like_count",
+        "Replies": "reply_count",
+        "Username": "user_name",
+        "Sentiment": "sentiment_score",
+    }
+    if search:
+        filters = dict(channel_id=search_channel_id, video_id=selected_video_id, published_from=date_from, published_to=date_to)
+        total = CommentScraper.count_search_comments(DB_CONFIG, search, **filters)
+        st.write(search_total_label(total, "comments"))
+        sort_options = {"Relevance": "rank", **sort_options}
+    else:
+        total = CommentScraper.count_comments(DB_CONFIG, video_id=selected_video_id)
+        st.write(f"Showing **{total}** comments")
     
-    if not comments_df.empty:
-        # Table Header
-        header_cols = st.columns([1, 2, 2, 4, 1, 1, 2])
-        headers = ["Username", "Comment ID", "Video", "Comment", "Likes", "Replies", "Published At"]
-        for col, h in zip(header_cols, headers):
-            col.markdown(f"**{h}**")
-        st.divider()
+    if total:
+        sort_by, descending, limit, offset = table_controls("comments", total, sort_options)
+        if search:
+            comments_df = CommentScraper.search_comments(
+                DB_CONFIG, search, **filters, sort_by=sort_by, descending=descending, limit=limit, offset=offset
+            )
+        else:
+            comments_df = CommentScraper.get_comments_page(
+                DB_CONFIG,
+                video_id=selected_video_id,
+                sort_by=sort_by,
+                descending=descending,
+                limit=limit,
+                offset=offset
+            )
         
-        # Table Rows
-        for _, row in comments_df.iterrows():
-            cols = st.columns([1, 2, 2, 4, 1, 1, 2])
-            cols[0].write(row["user_name"])
-            cols[1].code(row["comment_id"])
-            cols[2].write(row["video_title"])
-            cols[3].write(row["comment_text"])
-            cols[4].write(f"{row['like_count']:,}")
-            cols[5].write(f"{row['reply_count']:,}")
-            cols[6].write(row["comment_published_at"].strftime("%Y-%m-%d %H:%M") if row["comment_published_at"] else "-")
-            st.divider()
+        columns = {
+            "user_name": "Username",
+            "comment_id": "Comment ID",
+            "video_title": "Video",
+            "comment_text": st.column_config.TextColumn("Comment", width="large"),
+            "like_count": st.column_config.NumberColumn("Likes"),
+            "reply_count": st.column_config.NumberColumn("Replies"),
+            "sentiment_score": st.column_config.NumberColumn("Sentiment", format="%.2f"),
+            "comment_published_at": st.column_config.DatetimeColumn("Published At", format="YYYY-MM-DD HH:mm"),
+        }
+        if search:
+            columns["rank"] = st.column_config.NumberColumn("Relevance", format="%.3f")
+        selected = selectable_table("comments", comments_df, columns)
+        
+        if selected is not None:
+            with st.container(border=True):
+                st.caption(f"{selected['user_name']} · {selected['video_title']} · {selected['comment_id']}")
+                st.write(selected["comment_text"])
+            if st.button("🗑 Delete Comment", key="delete_comment"):
+                CommentScraper.delete_comment(selected["comment_id"], db_config=DB_CONFIG)
+                st.success("Comment deleted")
+                st.rerun()
     else:
         st.info("No comments found for the selected filter.")
 
@@ -554,34 +712,23 @@ if menu == "Replays":
                 if not main_comment_id_input:
                     st.error("Main Comment ID is required")
                 else:
-                    with st.spinner("Scraping replies..."):
-                        try:
-                            scraped_count = CommentScraper.scrape_replies(
-                                api_key=YT_API_KEY,
-                                db_config=DB_CONFIG,
-                                main_comment_id=main_comment_id_input,
-                                max_pages=max_pages,
-                                max_results_per_page=max_results_per_page
-                            )
-                            st.success(f"Successfully scraped {scraped_count} replies!")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error scraping replies: {str(e)}")
+                    track_id = JobQueue.enqueue(
+                        DB_CONFIG,
+                        "scrape_replies",
+                        {
+                            "main_comment_id": main_comment_id_input,
+                            "max_pages": int(max_pages),
+                            "max_results_per_page": int(max_results_per_page)
+                        },
+                        name=f"Replies of {main_comment_id_input}"
+                    )
+                    st.success(f"Queued as job #{track_id}, follow it on the Jobs page")
 
     # 2. Filter Section
     st.divider()
     
     # Selection for filtering by parent comment
-    conn = psycopg2.connect(**DB_CONFIG)
-    curr = conn.cursor()
-    curr.execute("""
-        SELECT DISTINCT c.comment_id, LEFT(c.comment_text, 50) || '...' 
-        FROM comment_replies r 
-        JOIN comments c ON r.main_comment_id = c.comment_id
-    """)
-    comments_with_replies = curr.fetchall()
-    curr.close()
-    conn.close()
+    comments_with_replies = CommentScraper.get_comments_with_replies(DB_CONFIG)
     
     parent_options = {"All Replies": None}
     for c_id, c_text in comments_with_replies:
@@ -590,28 +737,101 @@ if menu == "Replays":
     selected_parent_label = st.selectbox("View Replies for Comment:", list(parent_options.keys()))
     selected_parent_id = parent_options[selected_parent_label]
     
-    # 3. List Replies
-    replies_df = CommentScraper.get_replies(DB_CONFIG, main_comment_id=selected_parent_id)
+    # Poll tally: one vote per user, counted in Postgres
+    if selected_parent_id:
+        with st.expander("🗳️ Poll Results", expanded=True):
+            poll = PollTally.get_poll(DB_CONFIG, selected_parent_id)
+            col1, col2, col3 = st.columns([2, 2, 1])
+            rules = {"First reply counts": "first", "Last reply counts": "last"}
+            current_rule = poll["vote_rule"] if poll else "first"
+            rule_label = col1.radio("One user, one vote", list(rules.keys()), index=list(rules.values()).index(current_rule), horizontal=True)
+            if rules[rule_label] != current_rule:
+                PollTally.set_vote_rule(DB_CONFIG, selected_parent_id, rules[rule_label])
+                st.rerun()
+            if poll:
+                col2.metric("Voters / Replies", f"{poll['voters']:,} / {poll['replies']:,}")
+            if col3.button("🔁 Recount", key="poll_recount"):
+                PollTally.refresh_poll(DB_CONFIG, selected_parent_id, full=True)
+                st.rerun()
+
+            results_df = PollTally.get_poll_results(DB_CONFIG, selected_parent_id)
+            if results_df.empty:
+                st.info("No votes tallied yet.")
+            else:
+                st.bar_chart(results_df.head(20), x="option", y="votes", horizontal=True)
+                st.dataframe(
+                    results_df,
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "option": "Option",
+                        "votes": st.column_config.NumberColumn("Votes"),
+                        "share": st.column_config.ProgressColumn("Share", format="%.1f%%", min_value=0, max_value=100),
+                        "updated_at": st.column_config.DatetimeColumn("Updated", format="YYYY-MM-DD HH:mm"),
+                    }
+                )
+                with st.form("merge_poll_option"):
+                    col1, col2 = st.columns(2)
+                    alias = col1.selectbox("Merge option", results_df["option"].tolist())
+                    target = col2.text_input("Into option")
+                    if st.form_submit_button("Merge") and target:
+                        PollTally.merge_option(DB_CONFIG, selected_parent_id, alias, target)
+                        st.rerun()
+    
+    # Full-text search over all replies
+    search, search_channel_id, date_from, date_to = search_controls("replies", "🔎 Search replies")
     
-    st.write(f"Showing **{len(replies_df)}** replies")
+    # 3. List Replies (one page at a time)
+    sort_options = {
+        "Published At": "reply_published_at",
+        "Username": "user_name",
+        "Sentiment": "sentiment_score",
+    }
+    if search:
+        filters = dict(channel_id=search_channel_id, published_from=date_from, published_to=date_to)
+        total = CommentScraper.count_search_replies(DB_CONFIG, search, **filters)
+        st.write(search_total_label(total, "replies"))
+        sort_options = {"Relevance": "rank", **sort_options}
+    else:
+        total = CommentScraper.count_replies(DB_CONFIG, main_comment_id=selected_parent_id)
+        st.write(f"Showing **{total}** replies")
     
-    if not replies_df.empty:
-        # Table Header
-        header_cols = st.columns([1, 2, 4, 4, 2])
-        headers = ["Username", "Video", "Parent Comment", "Reply text", "Published At"]
-        for col, h in zip(header_cols, headers):
-            col.markdown(f"**{h}**")
-        st.divider()
+    if total:
+        sort_by, descending, limit, offset = table_controls("replies", total, sort_options)
+        if search:
+            replies_df = CommentScraper.search_replies(
+                DB_CONFIG, search, **filters, sort_by=sort_by, descending=descending, limit=limit, offset=offset
+            )
+        else:
+            replies_df = CommentScraper.get_replies_page(
+                DB_CONFIG,
+                main_comment_id=selected_parent_id,
+                sort_by=sort_by,
+                descending=descending,
+                limit=limit,
+                offset=offset
+            )
         
-        # Table Rows
-        for _, row in replies_df.iterrows():
-            cols = st.columns([1, 2, 4, 4, 2])
-            cols[0].write(row["user_name"])
-            cols[1].write(row["video_title"])
-            cols[2].write(row["parent_comment"])
-            cols[3].write(row["reply_text"])
-            cols[4].write(row["reply_published_at"].strftime("%Y-%m-%d %H:%M") if row["reply_published_at"] else "-")
-            st.divider()
+        columns = {
+            "user_name": "Username",
+            "video_title": "Video",
+            "parent_comment": st.column_config.TextColumn("Parent Comment", width="medium"),
+            "reply_text": st.column_config.TextColumn("Reply text", width="large"),
+            "sentiment_score": st.column_config.NumberColumn("Sentiment", format="%.2f"),
+            "reply_published_at": st.column_config.DatetimeColumn("Published At", format="YYYY-MM-DD HH:mm"),
+        }
+        if search:
+            columns["rank"] = st.column_config.NumberColumn("Relevance", format="%.3f")
+        selected = selectable_table("replies", replies_df, columns)
+        
+        if selected is not None:
+            with st.container(border=True):
+                st.caption(f"{selected['user_name']} · {selected['video_title']} · {selected['reply_id']}")
+                st.write(selected["reply_text"])
+            if st.button("🗑 Delete Reply", key="delete_reply"):
+                CommentScraper.delete_reply(selected["reply_id"], db_config=DB_CONFIG)
+                st.success("Reply deleted")
+                st.rerun()
     else:
         st.info("No replies found for the selected filter.")
 
@@ -632,53 +852,171 @@ if menu == "Analysis":
         
         selected_channel_name = col1.selectbox(
             "Select Channel",
-            list(channel_dict.keys())
+            ["All Channels"] + list(channel_dict.keys())
         )
         
         time_filter = col2.selectbox(
             "Time Filter",
-            ["Last 7 Days", "One Month"]
+            ["Last 7 Days", "One Month", "One Year", "All Time"]
         )
         
-        # Map time filter to days
+        # Map time filter to days (None = all time)
         days_map = {
             "Last 7 Days": 7,
-            "One Month": 30
+            "One Month": 30,
+            "One Year": 365,
+            "All Time": None
         }
         days = days_map[time_filter]
         
-        channel_id = channel_dict[selected_channel_name]
+        channel_id = channel_dict.get(selected_channel_name)
         
-        # Fetch data
+        # Fetch data (served from the publication rollups)
         time_data_df = VideoScraper.get_publication_time_data(DB_CONFIG, channel_id, days)
         
         if not time_data_df.empty:
             # Metrics
-            total_videos = len(time_data_df)
+            total_videos = int(time_data_df['video_count'].sum())
             unique_days = time_data_df['pub_date'].nunique()
             
             m1, m2 = st.columns(2)
             m1.metric("Total Videos (Period)", total_videos)
             m2.metric("Active Upload Days", unique_days)
             
+            # Daily uploads
+            st.divider()
+            daily_df = VideoScraper.get_publication_stats(DB_CONFIG, channel_id, days)
+            st.write(f"Videos published per day for **{selected_channel_name}**")
+            st.bar_chart(daily_df, x='pub_date', y='video_count', color="#FF0000")
+            
             # Scatter Chart
             st.divider()
             st.write(f"Publication Time distribution for **{selected_channel_name}**")
             
-            # We want X = pub_date, Y = pub_time
-            # Streamlit's st.scatter_chart is great for this
+            # We want X = pub_date, Y = pub_time, point size = videos in that hour
             st.scatter_chart(
                 time_data_df,
                 x='pub_date',
                 y='pub_time',
-                size=100,
+                size='video_count',
                 color="#FF0000" # YouTube Red
             )
             
-            st.caption("Y-axis represents the hour of the day (0-24).")
+            st.caption("Y-axis represents the hour of the day (0-23, UTC); larger points mean more videos in that hour.")
             
             # Breakdown Table
             with st.expander("Show Raw Data"):
                 st.dataframe(time_data_df, use_container_width=True)
         else:
             st.info("No data available for the selected period.")
+
+# ==============================
+# JOBS PAGE
+# ==============================
+if menu == "Jobs":
+    st.title("⚙️ Scrape Jobs")
+    st.caption("Jobs run in background workers: `python script/worker.py --processes 2`")
+
+    status_filter = st.multiselect(
+        "Status",
+        ["todo", "process", "done", "cancel"],
+        default=["todo", "process", "done", "cancel"]
+    )
+
+    # Only this block reruns while polling, the rest of the page stays put
+    @st.fragment(run_every=3)
+    def jobs_board():
+        jobs_df = JobQueue.get_jobs(DB_CONFIG, statuses=status_filter)
+        if jobs_df.empty:
+            st.info("No jobs yet. Scrapes started from the other pages show up here.")
+            return
+
+        c1, c2, c3, c4 = st.columns(4)
+        counts = jobs_df["status"].value_counts()
+        c1.metric("Queued", int(counts.get("todo", 0)))
+        c2.metric("Running", int(counts.get("process", 0)))
+        c3.metric("Done", int(counts.get("done", 0)))
+        c4.metric("Cancelled / Failed", int(counts.get("cancel", 0)))
+
+        total = jobs_df["progress_total"].fillna(0)
+        jobs_df["progress"] = (jobs_df["progress_done"] / total.where(total > 0)).fillna(
+            (jobs_df["status"] == "done").astype(float)
+        ).clip(0, 1)
+
+        selected = selectable_table("jobs", jobs_df, {
+            "track_id": "Job",
+            "name": "Name",
+            "job_kind": "Kind",
+            "status": "Status",
+            "progress": st.column_config.ProgressColumn("Progress", min_value=0, max_value=1),
+            "attempts": "Attempts",
+            "last_error": st.column_config.TextColumn("Last Error", width="medium"),
+            "created_at": st.column_config.DatetimeColumn("Queued", format="YYYY-MM-DD HH:mm:ss"),
+            "actual_end_date": st.column_config.DatetimeColumn("Finished", format="YYYY-MM-DD HH:mm:ss"),
+        })
+
+        if selected is not None:
+            col_cancel, col_retry, _ = st.columns([1, 1, 6])
+            if col_cancel.button("⏹ Cancel", disabled=selected["status"] not in ("todo", "process")):
+                JobQueue.cancel(DB_CONFIG, int(selected["track_id"]))
+                st.rerun(scope="fragment")
+            if col_retry.button("🔁 Retry", disabled=selected["status"] != "cancel"):
+                JobQueue.retry(DB_CONFIG, int(selected["track_id"]))
+                st.rerun(scope="fragment")
+            if selected["result"] is not None:
+                st.json(selected["result"], expanded=False)
+
+    jobs_board()
+
+# ==============================
+# EXPORT PAGE
+# ==============================
+if menu == "Export":
+    st.title("📦 Export Data")
+    st.caption(f"Exports stream from Postgres to a file under `{Exporter.EXPORT_DIR}/`; "
+               "large ones are better run with `python script/export_data.py`.")
+
+    channel_dict = VideoScraper.select_channel_name(db_config=DB_CONFIG)
+    with st.form("export_form"):
+        col1, col2, col3 = st.columns(3)
+        dataset = col1.selectbox("Data", list(Exporter.DATASETS.keys()), index=1)
+        fmt = col2.selectbox("Format", Exporter.FORMATS)
+        compression = col3.selectbox("Compression", ["none", "gzip", "snappy", "zstd"],
+                                     help="CSV supports gzip; Parquet supports snappy, zstd and gzip")
+
+        col1, col2, col3, col4 = st.columns(4)
+        channel_name = col1.selectbox("Channel", ["All Channels"] + list(channel_dict.keys()))
+        video_id = col2.text_input("Video ID (optional)")
+        date_from = col3.date_input("Published from", value=None)
+        date_to = col4.date_input("Published to", value=None)
+
+        if st.form_submit_button("Prepare Export"):
+            compression = None if compression == "none" else compression
+            path = Exporter.default_path(dataset, fmt, compression)
+            with st.spinner("Exporting..."):
+                try:
+                    rows = Exporter.export(
+                        DB_CONFIG,
+                        dataset,
+                        path,
+                        fmt=fmt,
+                        compression=compression,
+                        channel_id=channel_dict.get(channel_name),
+                        video_id=video_id or None,
+                        date_from=date_from,
+                        date_to=date_to
+                    )
+                    st.session_state.export_file = (path, rows)
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+
+    if st.session_state.get("export_file") and os.path.exists(st.session_state.export_file[0]):
+        path, rows = st.session_state.export_file
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        st.success(f"{rows:,} rows written to `{path}` ({size_mb:,.1f} MB)")
+        # The download button serves the file from memory, so very large exports stay on disk
+        if size_mb <= Exporter.DOWNLOAD_MAX_MB:
+            with open(path, "rb") as f:
+                st.download_button("⬇️ Download", f, file_name=os.path.basename(path))
+        else:
+            st.info(f"Larger than {Exporter.DOWNLOAD_MAX_MB} MB, copy it from the server instead.")
@@ -0,0 +1,215 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from functions import Database
+from functions import QueryCache
+from functions import ResponseArchive
+from functions import ChannelScraper
+from functions import VideoScraper
+from functions import CommentScraper
+from functions import CommentWriter
+
+load_dotenv()
+
+# Replay order follows the foreign keys: channels before their videos before their comments.
+# playlistItems pages only located video ids (their videos pages are archived too), search is unused.
+REPLAY_ORDER = ("channels", "videos", "commentThreads", "comments")
+REPLAY_WORKERS = int(os.getenv("ARCHIVE_REPLAY_WORKERS", "0"))
+
+class ArchiveReplayError(Exception):
+    pass
+
+def _parse_page(resource: str, record: dict):
+    """Runs a page through the scrapers' own parsers; returns [(kind, rows)] and the unparsable item count."""
+    params = record.get("params", {})
+    items = record.get("response", {}).get("items", [])
+    batches = {}
+    skipped = 0
+
+    for item in items:
+        try:
+            if resource == "channels":
+                batches.setdefault("channels", []).append(ChannelScraper._parse_channel(item))
+            elif resource == "videos":
+                if "snippet" in item:
+                    batches.setdefault("videos", []).append(VideoScraper._parse_video(item, None))
+                else:
+                    # part=statistics pages come from refresh_video_stats
+                    stats = item.get("statistics", {})
+                    batches.setdefault("video_stats", []).append({
+                        "video_id": item["id"],
+                        "view_count": int(stats.get("viewCount", 0)),
+                        "like_count": int(stats.get("likeCount", 0)),
+                        "comment_count": int(stats.get("commentCount", 0)),
+                    })
+            elif resource == "commentThreads":
+                video_id = params.get("videoId") or item["snippet"].get("videoId")
+                comment = CommentScraper._parse_comment(item, video_id)
+                batches.setdefault("comments", []).append(comment)
+                for reply in item.get("replies", {}).get("comments", []):
+                    batches.setdefault("replies", []).append(CommentScraper._parse_reply(reply, comment["comment_id"], video_id))
+            elif resource == "comments":
+                # The parent's video is looked up when the rows are written
+                batches.setdefault("thread_replies", []).append(CommentScraper._parse_reply(item, params.get("parentId"), None))
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+    return list(batches.items()), skipped
+
+def _parse_file(resource: str, path: str):
+    # Runs in a worker process: decompression and JSON parsing are the expensive part
+    pages = []
+    skipped = 0
+    for record in ResponseArchive.read_file(path):
+        batches, bad = _parse_page(resource, record)
+        pages.append((datetime.fromisoformat(record["fetched_at"]), batches))
+        skipped += bad
+    return pages, skipped
+
+def _existing(cursor, query: str, ids: set):
+    if not ids:
+        return {}
+    cursor.execute(query, (list(ids),))
+    return dict(cursor.fetchall())
+
+def _rows(pages: list, wanted: str):
+    return [row for _, batches in pages for kind, rows in batches if kind == wanted for row in rows]
+
+def _apply_channels(db_config: dict, pages: list):
+    written = 0
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        for captured_at, batches in pages:
+            for _, rows in batches:
+                execute_values(
+                    cursor,
+                    "INSERT INTO channels (channel_id, channel_name, published_at) VALUES %s ON CONFLICT (channel_id) DO NOTHING",
+                    list({r["channel_id"]: (r["channel_id"], r["channel_name"], r["published_at"]) for r in rows}.values())
+                )
+                ChannelScraper._upsert_channel_stats(cursor, rows, captured_at)
+                written += len(rows)
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("channels", "channel_stats")
+    return written, 0
+
+def _apply_videos(db_config: dict, pages: list):
+    written = dropped = 0
+    videos = _rows(pages, "videos")
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        # Categories are set in the app, not by the API: keep the stored one, else the channel's
+        stored = _existing(cursor, "SELECT video_id, video_category::text FROM videos WHERE video_id = ANY(%s)",
+                           {r["video_id"] for r in videos})
+        channels = _existing(cursor, "SELECT channel_id, category::text FROM channels WHERE channel_id = ANY(%s)",
+                             {r["channel_id"] for r in videos})
+
+        for captured_at, batches in pages:
+            for kind, rows in batches:
+                if kind == "video_stats":
+                    continue
+                kept = [r for r in rows if r["channel_id"] in channels]
+                for r in kept:
+                    r["video_category"] = stored.get(r["video_id"]) or channels[r["channel_id"]]
+                VideoScraper._upsert_videos(cursor, kept, captured_at)
+                written += len(kept)
+                dropped += len(rows) - len(kept)
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("videos", "video_stats")
+
+    # Statistics-only pages update existing rows like the refresh that fetched them,
+    # unless a later scrape already moved them on; their snapshots are kept either way
+    for captured_at, batches in pages:
+        for kind, rows in batches:
+            if kind == "video_stats":
+                VideoScraper._save_video_stats(db_config, rows, captured_at)
+                written += len(rows)
+    return written, dropped
+
+def _apply_comments(db_config: dict, pages: list):
+    comments, replies, thread_replies = _rows(pages, "comments"), _rows(pages, "replies"), _rows(pages, "thread_replies")
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        known_videos = _existing(cursor, "SELECT video_id, TRUE FROM videos WHERE video_id = ANY(%s)",
+                                 {r["video_id"] for r in comments})
+        parents = _existing(cursor, "SELECT comment_id, video_id FROM comments WHERE comment_id = ANY(%s)",
+                            {r["main_comment_id"] for r in thread_replies})
+        cursor.close()
+
+    with CommentWriter.CommentBulkWriter(db_config) as writer:
+        kept_comments = set()
+        for row in comments:
+            if row["video_id"] in known_videos:
+                writer.add_comment(row)
+                kept_comments.add(row["comment_id"])
+        for row in replies:
+            if row["main_comment_id"] in kept_comments:
+                writer.add_reply(row)
+        for row in thread_replies:
+            if row["main_comment_id"] in parents:
+                row["video_id"] = parents[row["main_comment_id"]]
+                writer.add_reply(row)
+    written = sum(writer.rows_written.values())
+    dropped = len(comments) + len(replies) + len(thread_replies) - written
+    return written, dropped
+
+APPLIERS = {
+    "channels": _apply_channels,
+    "videos": _apply_videos,
+    "commentThreads": _apply_comments,
+    "comments": _apply_comments,
+}
+
+def replay(
+    db_config: dict,
+    resources: list = None,
+    date_from=None,
+    date_to=None,
+    workers: int = REPLAY_WORKERS,
+    archive_dir: str = ResponseArchive.ARCHIVE_DIR,
+    progress=None
+):
+    """Re-applies archived API pages through the scrapers' parse and upsert code, without any API call.
+
+    Files are decompressed and parsed in a process pool and written in partition
+    order, resource by resource. Rows whose parent (channel, video, comment) is
+    not stored are dropped. Stats snapshots are recorded at the original fetch
+    time, while current channel and video stats (and their last_scraped_at) only
+    change where the archived page is newer than the last scrape.
+    Returns {resource: {"files", "pages", "rows", "dropped", "unparsable"}}.
+    """
+    if not os.path.isdir(archive_dir):
+        raise ArchiveReplayError(f"No response archive at {archive_dir}")
+    resources = [r for r in REPLAY_ORDER if not resources or r in resources]
+    workers = workers or os.cpu_count() or 1
+    summary = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for resource in resources:
+            files = ResponseArchive.list_files([resource], date_from, date_to, archive_dir)
+            stats = summary[resource] = {"files": len(files), "pages": 0, "rows": 0, "dropped": 0, "unparsable": 0}
+
+            def apply(future):
+                pages, unparsable = future.result()
+                written, dropped = APPLIERS[resource](db_config, pages)
+                stats["pages"] += len(pages)
+                stats["rows"] += written
+                stats["dropped"] += dropped
+                stats["unparsable"] += unparsable
+                if progress:
+                    progress(resource, stats)
+
+            # Bounded look-ahead: workers decompress ahead while results are written in file order
+            pending = []
+            for _, _, path in files:
+                pending.append(pool.submit(_parse_file, resource, path))
+                if len(pending) >= workers * 2:
+                    apply(pending.pop(0))
+            for future in pending:
+                apply(future)
+
+    return summary
@@ -1,15 +1,31 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from googleapiclient.discovery import build
+from psycopg2.extras import RealDictCursor, execute_values
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import pandas as pd
 import os
+import re
+from functions import Database
+from functions import QuotaScheduler
+from functions import StatsSnapshots
+from functions import QueryCache
+
+# Max IDs accepted by one channels.list call
+API_BATCH_SIZE = 50
+# Sort keys of the paginated Channels table
+CHANNEL_SORT_COLUMNS = {
+    "channel_name": "c.channel_name",
+    "category": "c.category",
+    "subscribers_count": "cs.subscribers_count",
+    "total_video_count": "cs.total_video_count",
+    "total_view_count": "cs.total_view_count",
+    "published_at": "c.published_at",
+}
+
 class ChannelScraperError(Exception):
     pass
 
+@QueryCache.cached("channels", "channel_stats")
 def get_channels(db_config: dict, category_filter=None):
-    conn = psycopg2.connect(**db_config)
     query = """
         SELECT c.channel_id,
                c.channel_name,
@@ -29,14 +45,62 @@ def get_channels(db_config: dict, category_filter=None):
     if category_filter and category_filter != "All":
         query += f" WHERE c.category = '{category_filter}'"
 
-    df = pd.read_sql(query, conn)
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn)
+    return df
+
+@QueryCache.cached("channels")
+def count_channels(db_config: dict, category_filter=None):
+    query = "SELECT COUNT(*) FROM channels c"
+    params = []
+    if category_filter and category_filter != "All":
+        query += " WHERE c.category = %s"
+        params.append(category_filter)
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+@QueryCache.cached("channels", "channel_stats")
+def get_channels_page(
+    db_config: dict,
+    category_filter=None,
+    sort_by: str = "subscribers_count",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Fetches one sorted page of channels; only the visible rows leave the database."""
+    query = """
+        SELECT c.channel_id,
+               c.channel_name,
+               c.category,
+               c.published_at,
+               cs.subscribers_count,
+               cs.total_video_count,
+               cs.total_view_count,
+               cs.profile_picture
+        FROM channels c
+        LEFT JOIN channel_stats cs
+        ON c.channel_id = cs.channel_id
+    """
+    params = []
+    if category_filter and category_filter != "All":
+        query += " WHERE c.category = %s"
+        params.append(category_filter)
+
+    query += Database.page_clause(CHANNEL_SORT_COLUMNS, sort_by, descending, "c.channel_id")
+    params += [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
     return df
 
+@QueryCache.cached("channels", "channel_stats")
 def get_channel_details(channel_id: str, db_config: dict):
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
     query = """
         SELECT c.channel_id,
                c.channel_name,
@@ -56,42 +120,126 @@ def get_channel_details(channel_id: str, db_config: dict):
         WHERE c.channel_id = %s
     """
     
-    cursor.execute(query, (channel_id,))
-    details = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(query, (channel_id,))
+        details = cursor.fetchone()
+        cursor.close()
     return details
 
+@QueryCache.cached()
 def get_channel_categories(db_config: dict):
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor()
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT enumlabel
-        FROM pg_enum
-        JOIN pg_type ON pg_enum.enumtypid = pg_type.oid
-        WHERE pg_type.typname = 'video_category_enum'
-        ORDER BY enumsortorder;
-    """)
+        cursor.execute("""
+            SELECT enumlabel
+            FROM pg_enum
+            JOIN pg_type ON pg_enum.enumtypid = pg_type.oid
+            WHERE pg_type.typname = 'video_category_enum'
+            ORDER BY enumsortorder;
+        """)
 
-    categories = [row[0] for row in cursor.fetchall()]
+        categories = [row[0] for row in cursor.fetchall()]
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
     return categories
 
 def delete_channel(channel_id: str, db_config: dict):
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor()
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("DELETE FROM channels WHERE channel_id = %s", (channel_id,))
-    cursor.execute("DELETE FROM channel_stats WHERE channel_id = %s", (channel_id,))
+        cursor.execute("DELETE FROM channels WHERE channel_id = %s", (channel_id,))
+        cursor.execute("DELETE FROM channel_stats WHERE channel_id = %s", (channel_id,))
 
-    conn.commit()
-    cursor.close()
-    conn.close()
+        conn.commit()
+        cursor.close()
+    # Cascades reach videos, comments and replies
+    QueryCache.invalidate()
+
+def _parse_channel(data: dict):
+    """Flattens a channels.list item into a channel_stats row."""
+    snippet = data["snippet"]
+    stats = data["statistics"]
+    branding = data.get("brandingSettings", {})
+
+    published_at = snippet.get("publishedAt")
+    # Convert published_at to datetime
+    if published_at:
+        published_at = datetime.fromisoformat(
+            published_at.replace("Z", "+00:00")
+        )
+
+    # Extract keywords/tags from branding settings
+    keywords_raw = branding.get("channel", {}).get("keywords", "")
+    # Keywords are often space-separated strings, possibly in quotes
+    keywords = re.findall(r'"[^"]*"|\S+', keywords_raw)
+    keywords = [k.strip('"') for k in keywords]
+
+    return {
+        "channel_id": data["id"],
+        "channel_name": snippet["title"],
+        "published_at": published_at,
+        "description": snippet.get("description"),
+        "profile_picture": snippet["thumbnails"]["high"]["url"],
+        "banner_image": branding.get("image", {}).get("bannerExternalUrl"),
+        "keywords": keywords,
+        "subscribers_count": int(stats.get("subscriberCount", 0)),
+        "total_video_count": int(stats.get("videoCount", 0)),
+        "total_view_count": int(stats.get("viewCount", 0)),
+    }
+
+def _upsert_channel_stats(cursor, rows: list, captured_at: datetime = None):
+    """Upserts a batch of parsed channels into channel_stats with one statement.
+
+    captured_at (replays) stamps last_scraped_at with the original fetch time,
+    and channels scraped more recently than that keep their current stats.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement
+    rows = list({row["channel_id"]: row for row in rows}.values())
+    if not rows:
+        return
+    scraped_at = cursor.mogrify("%s::timestamptz", (captured_at,)).decode() if captured_at else "NOW()"
+
+    execute_values(
+        cursor,
+        """
+        INSERT INTO channel_stats (
+            channel_id,
+            subscribers_count,
+            total_video_count,
+            total_view_count,
+            description,
+            profile_picture,
+            banner_image,
+            keywords,
+            last_scraped_at
+        )
+        VALUES %s
+        ON CONFLICT (channel_id)
+        DO UPDATE SET
+            subscribers_count = EXCLUDED.subscribers_count,
+            total_video_count = EXCLUDED.total_video_count,
+            total_view_count = EXCLUDED.total_view_count,
+            description = EXCLUDED.description,
+            profile_picture = EXCLUDED.profile_picture,
+            banner_image = EXCLUDED.banner_image,
+            keywords = EXCLUDED.keywords,
+            last_scraped_at = EXCLUDED.last_scraped_at
+        WHERE channel_stats.last_scraped_at IS NULL
+           OR channel_stats.last_scraped_at <= EXCLUDED.last_scraped_at
+        """,
+        [
+            (r["channel_id"], r["subscribers_count"], r["total_video_count"], r["total_view_count"],
+             r["description"], r["profile_picture"], r["banner_image"], r["keywords"])
+            for r in rows
+        ],
+        template=f"(%s, %s, %s, %s, %s, %s, %s, %s, {scraped_at})"
+    )
+
+    # Keep the history that the channel_stats upsert overwrites (or, replaying, skips)
+    StatsSnapshots.record_channel_snapshots(cursor, rows, captured_at)
 
 def scrape_channel(
     api_key: str,
@@ -109,26 +257,28 @@ def scrape_channel(
     if not channel_id and not username:
         raise ValueError("Provide either channel_id or username")
 
-    # Initialize YouTube API
+    # Initialize YouTube API (every call goes through the quota scheduler)
     try:
-        youtube = build("youtube", "v3", developerKey=api_key)
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
     except Exception as e:
         raise ChannelScraperError("Invalid API key or API initialization failed") from e
 
     try:
         if channel_id:
-            request = youtube.channels().list(
-                part="snippet,statistics,brandingSettings",
-                id=channel_id
-            )
+            lookup = {"id": channel_id}
         else:
-            request = youtube.channels().list(
+            lookup = {"forUsername": username}
+
+        response = scheduler.execute(
+            "channels.list",
+            lambda youtube: youtube.channels().list(
                 part="snippet,statistics,brandingSettings",
-                forUsername=username
+                **lookup
             )
+        )
 
-        response = request.execute()
-
+    except QuotaScheduler.QuotaExceededError:
+        raise ChannelScraperError("API quota exceeded")
     except HttpError as e:
         if e.resp.status == 403:
             if "quotaExceeded" in str(e):
@@ -144,116 +294,132 @@ def scrape_channel(
     if not response.get("items"):
         raise ChannelScraperError("Channel not found (wrong ID or username)")
 
-    data = response["items"][0]
+    row = _parse_channel(response["items"][0])
+    channel_id = row["channel_id"]
 
-    # Extract fields
-    channel_id = data["id"]
-    snippet = data["snippet"]
-    stats = data["statistics"]
-    branding = data.get("brandingSettings", {})
+    # Borrow a pooled PostgreSQL connection
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    channel_name = snippet["title"]
-    published_at = snippet.get("publishedAt")
-    description = snippet.get("description")
-    profile_picture = snippet["thumbnails"]["high"]["url"]
+        try:
+            # Check if channel exists
+            cursor.execute(
+                "SELECT channel_id FROM channels WHERE channel_id = %s",
+                (channel_id,)
+            )
+            exists = cursor.fetchone()
 
-    banner_image = (
-        branding.get("image", {}).get("bannerExternalUrl")
-    )
-    
-    # Extract keywords/tags from branding settings
-    keywords_raw = branding.get("channel", {}).get("keywords", "")
-    # Keywords are often space-separated strings, possibly in quotes
-    import re
-    keywords = re.findall(r'"[^"]*"|\S+', keywords_raw)
-    keywords = [k.strip('"') for k in keywords]
+            # Insert if not exists
+            if not exists:
+                cursor.execute(
+                    """
+                    INSERT INTO channels (channel_id, channel_name, published_at, category)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (channel_id, row["channel_name"], row["published_at"], category)
+                )
 
-    subscribers_count = int(stats.get("subscriberCount", 0))
-    total_video_count = int(stats.get("videoCount", 0))
-    total_view_count = int(stats.get("viewCount", 0))
+            # Upsert channel_stats
+            _upsert_channel_stats(cursor, [row])
 
-    # Convert published_at to datetime
-    if published_at:
-        published_at = datetime.fromisoformat(
-            published_at.replace("Z", "+00:00")
-        )
+            conn.commit()
 
-    # Connect to PostgreSQL
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+        except Exception as db_error:
+            conn.rollback()
+            raise ChannelScraperError(f"Database error: {str(db_error)}")
 
-    try:
-        # Check if channel exists
-        cursor.execute(
-            "SELECT channel_id FROM channels WHERE channel_id = %s",
-            (channel_id,)
-        )
-        exists = cursor.fetchone()
+        finally:
+            cursor.close()
 
-        # Insert if not exists
-        if not exists:
-            cursor.execute(
-                """
-                INSERT INTO channels (channel_id, channel_name, published_at, category)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (channel_id, channel_name, published_at, category)
-            )
+    QueryCache.invalidate("channels", "channel_stats")
 
-        # Upsert channel_stats
-        cursor.execute(
-            """
-            INSERT INTO channel_stats (
-                channel_id,
-                subscribers_count,
-                total_video_count,
-                total_view_count,
-                description,
-                profile_picture,
-                banner_image,
-                keywords,
-                last_scraped_at
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (channel_id)
-            DO UPDATE SET
-                subscribers_count = EXCLUDED.subscribers_count,
-                total_video_count = EXCLUDED.total_video_count,
-                total_view_count = EXCLUDED.total_view_count,
-                description = EXCLUDED.description,
-                profile_picture = EXCLUDED.profile_picture,
-                banner_image = EXCLUDED.banner_image,
-                keywords = EXCLUDED.keywords,
-                last_scraped_at = EXCLUDED.last_scraped_at
-            """,
-            (
-                channel_id,
-                subscribers_count,
-                total_video_count,
-                total_view_count,
-                description,
-                profile_picture,
-                banner_image,
-                keywords,
-                datetime.utcnow()
-            )
-        )
+    return {
+        "channel_id": channel_id,
+        "channel_name": row["channel_name"],
+        "subscribers": row["subscribers_count"],
+        "videos": row["total_video_count"],
+        "views": row["total_view_count"],
+        "status": "success"
+    }
 
-        conn.commit()
+def refresh_channels(
+    api_key: str,
+    db_config: dict,
+    channel_ids: list = None,
+    priority: str = "normal"
+):
+    """
+    Refresh channel_stats for many stored channels (all by default),
+    50 channels per channels.list call and one upsert per batch.
+    A failing channel or batch is reported without stopping the rest.
+    """
+    if channel_ids is None:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT channel_id FROM channels ORDER BY channel_id")
+            channel_ids = [r[0] for r in cursor.fetchall()]
+            cursor.close()
+
+    try:
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
+    except Exception as e:
+        raise ChannelScraperError("Invalid API key or API initialization failed") from e
 
-    except Exception as db_error:
-        conn.rollback()
-        raise ChannelScraperError(f"Database error: {str(db_error)}")
+    result = {"refreshed": [], "failed": {}}
 
-    finally:
-        cursor.close()
-        conn.close()
+    for i in range(0, len(channel_ids), API_BATCH_SIZE):
+        batch = channel_ids[i:i + API_BATCH_SIZE]
 
-    return {
-        "channel_id": channel_id,
-        "channel_name": channel_name,
-        "subscribers": subscribers_count,
-        "videos": total_video_count,
-        "views": total_view_count,
-        "status": "success"
-    }
\ No newline at end of file
+        # 1. One API call for the whole batch
+        try:
+            response = scheduler.execute(
+                "channels.list",
+                lambda youtube: youtube.channels().list(
+                    part="snippet,statistics,brandingSettings",
+                    id=",".join(batch)
+                ),
+                priority=priority
+            )
+        except QuotaScheduler.QuotaExceededError:
+            # Nothing further can be fetched today
+            for cid in channel_ids[i:]:
+                result["failed"][cid] = "API quota exceeded"
+            break
+        except HttpError as e:
+            for cid in batch:
+                result["failed"][cid] = f"YouTube API error: {str(e)}"
+            continue
+
+        # 2. Parse per channel so one malformed item does not sink the batch
+        rows = []
+        for item in response.get("items", []):
+            try:
+                rows.append(_parse_channel(item))
+            except (KeyError, ValueError) as e:
+                result["failed"][item.get("id")] = f"Unexpected API payload: {str(e)}"
+        returned = {item.get("id") for item in response.get("items", [])}
+        for cid in batch:
+            if cid not in returned:
+                result["failed"][cid] = "Channel not found (deleted or terminated)"
+
+        # 3. One upsert per batch
+        try:
+            with Database.get_connection(db_config) as conn:
+                cursor = conn.cursor()
+                try:
+                    _upsert_channel_stats(cursor, rows)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except Exception as db_error:
+            for r in rows:
+                result["failed"][r["channel_id"]] = f"Database error: {str(db_error)}"
+            continue
+
+        result["refreshed"].extend(r["channel_id"] for r in rows)
+        QueryCache.invalidate("channel_stats")
+
+    return result
@@ -1,103 +1,479 @@
-import psycopg2
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functions import Database
+from functions import QuotaScheduler
+from functions import CommentWriter
+from functions import PollTally
+from functions import QueryCache
+
+# Sort keys of the paginated Comments and Replays tables
+COMMENT_SORT_COLUMNS = {
+    "comment_published_at": "c.comment_published_at",
+    "like_count": "c.like_count",
+    "reply_count": "c.reply_count",
+    "user_name": "c.user_name",
+    "sentiment_score": "c.sentiment_score",
+}
+REPLY_SORT_COLUMNS = {
+    "reply_published_at": "r.reply_published_at",
+    "user_name": "r.user_name",
+    "sentiment_score": "r.sentiment_score",
+}
+# Full-text search results sort by relevance by default
+SEARCH_COMMENT_SORT_COLUMNS = dict(COMMENT_SORT_COLUMNS, rank="rank")
+SEARCH_REPLY_SORT_COLUMNS = dict(REPLY_SORT_COLUMNS, rank="rank")
+# Text search configuration of the generated tsvector columns (no stemming, comments mix languages)
+SEARCH_CONFIG = "simple"
+# Search hit counts stop here; counting every match of a common word costs more than the page
+SEARCH_COUNT_LIMIT = 10000
+# Pooled connections a channel harvest leaves free for quota bookkeeping and the UI
+POOL_HEADROOM = 2
 
 class CommentScraperError(Exception):
     pass
 
+def _parse_published_at(snippet: dict):
+    published_at_str = snippet.get("publishedAt")
+    return datetime.fromisoformat(published_at_str.replace("Z", "+00:00"))
+
+def _parse_comment(item: dict, video_id: str):
+    """Turns a commentThreads().list item into a comments row."""
+    snippet = item["snippet"]["topLevelComment"]["snippet"]
+    return {
+        "comment_id": item["id"],
+        "video_id": video_id,
+        "user_id": snippet.get("authorChannelId", {}).get("value", ""),
+        "user_name": snippet.get("authorDisplayName", "Unknown"),
+        "comment_text": snippet.get("textDisplay", ""),
+        "like_count": int(snippet.get("likeCount", 0)),
+        "reply_count": int(item["snippet"].get("totalReplyCount", 0)),
+        "comment_published_at": _parse_published_at(snippet),
+    }
+
+def _parse_reply(item: dict, main_comment_id: str, video_id: str):
+    """Turns a comments().list item into a comment_replies row."""
+    snippet = item["snippet"]
+    return {
+        "reply_id": item["id"],
+        "main_comment_id": main_comment_id,
+        "video_id": video_id,
+        "user_id": snippet.get("authorChannelId", {}).get("value", ""),
+        "user_name": snippet.get("authorDisplayName", "Unknown"),
+        "reply_text": snippet.get("textDisplay", ""),
+        "reply_published_at": _parse_published_at(snippet),
+    }
+
+def _harvest_comments(
+    scheduler,
+    writer,
+    video_id: str,
+    max_pages: int,
+    max_results_per_page: int,
+    deadline: float = None,
+    priority: str = "normal",
+    since: datetime = None,
+    include_replies: bool = False,
+    progress=None
+):
+    """Pages through commentThreads newest-first for one video into the writer.
+
+    With since, stops at comments published at or before it. With
+    include_replies, the replies returned inline with each thread are written
+    too, and threads with more replies than came back inline are listed in
+    "pending". Also reports the newest publish time seen and whether the walk
+    finished (reached since or the last page) rather than hitting max_pages or
+    the deadline. progress, if given, is called with (pages done, max_pages).
+    """
+    next_page_token = None
+    pages_processed = 0
+    total_scraped = 0
+    total_replies = 0
+    pending_threads = []
+    newest_seen = None
+    complete = False
+    
+    while pages_processed < max_pages:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        
+        response = scheduler.execute(
+            "commentThreads.list",
+            lambda youtube: youtube.commentThreads().list(
+                part="snippet,replies" if include_replies else "snippet", 
+                videoId=video_id,
+                maxResults=min(max_results_per_page, 100),
+                pageToken=next_page_token,
+                order="time",
+                textFormat="plainText"
+            ),
+            priority=priority
+        )
+        
+        items = response.get("items", [])
+        if not items:
+            complete = True
+            break
+        
+        reached_known = False
+        for position, item in enumerate(items):
+            row = _parse_comment(item, video_id)
+            published_at = row["comment_published_at"]
+            
+            if since is not None and published_at <= since:
+                # A pinned comment can head the first page however old it is
+                if pages_processed > 0 or position > 0:
+                    reached_known = True
+                continue
+            
+            writer.add_comment(row)
+            total_scraped += 1
+            if newest_seen is None or published_at > newest_seen:
+                newest_seen = published_at
+            
+            if include_replies:
+                # commentThreads returns only a handful of replies inline
+                inline_replies = item.get("replies", {}).get("comments", [])
+                for reply in inline_replies:
+                    writer.add_reply(_parse_reply(reply, row["comment_id"], video_id))
+                total_replies += len(inline_replies)
+                if row["reply_count"] > len(inline_replies):
+                    pending_threads.append(row["comment_id"])
+        
+        next_page_token = response.get("nextPageToken")
+        pages_processed += 1
+        if progress:
+            progress(pages_processed, max_pages)
+        
+        if reached_known or not next_page_token:
+            complete = True
+            break
+    
+    return {
+        "comments": total_scraped,
+        "replies": total_replies,
+        "pending": pending_threads,
+        "newest": newest_seen,
+        "complete": complete,
+    }
+
+def _harvest_replies(
+    scheduler,
+    writer,
+    main_comment_id: str,
+    video_id: str,
+    max_pages: int,
+    max_results_per_page: int,
+    priority: str = "normal",
+    progress=None
+):
+    """Pages through comments.list replies of one thread into the writer."""
+    next_page_token = None
+    pages_processed = 0
+    total_scraped = 0
+    
+    while pages_processed < max_pages:
+        response = scheduler.execute(
+            "comments.list",
+            lambda youtube: youtube.comments().list(
+                part="snippet", 
+                parentId=main_comment_id,
+                maxResults=min(max_results_per_page, 100),
+                pageToken=next_page_token,
+                textFormat="plainText"
+            ),
+            priority=priority
+        )
+        
+        items = response.get("items", [])
+        if not items:
+            break
+        
+        for item in items:
+            writer.add_reply(_parse_reply(item, main_comment_id, video_id))
+            total_scraped += 1
+        
+        next_page_token = response.get("nextPageToken")
+        pages_processed += 1
+        if progress:
+            progress(pages_processed, max_pages)
+        
+        if not next_page_token:
+            break
+    
+    return total_scraped
+
+def _fetch_thread_replies(
+    scheduler,
+    writer,
+    video_id: str,
+    thread_ids: list,
+    max_reply_pages: int,
+    reply_workers: int,
+    priority: str = "normal"
+):
+    """Fetches the full reply list of many threads concurrently into one shared writer.
+
+    Returns (replies, failed threads). Only API errors count as a failed thread;
+    quota, pool and database errors propagate.
+    """
+    def fetch(main_comment_id):
+        return _harvest_replies(
+            scheduler, writer, main_comment_id, video_id, max_reply_pages, 100, priority
+        )
+
+    total_replies = 0
+    failed_threads = 0
+    with ThreadPoolExecutor(max_workers=max(1, reply_workers)) as executor:
+        for future in as_completed([executor.submit(fetch, thread_id) for thread_id in thread_ids]):
+            try:
+                total_replies += future.result()
+            except HttpError:
+                # A deleted thread must not lose the replies of the others
+                failed_threads += 1
+    return total_replies, failed_threads
+
+def _get_comment_watermark(db_config: dict, video_id: str):
+    """Publish time up to which this video's comments are known to be complete."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT newest_comment_published_at FROM comment_sync_state WHERE video_id = %s",
+            (video_id,)
+        )
+        res = cursor.fetchone()
+        if not res:
+            # No sync yet: fall back to the newest comment a full scrape stored.
+            # The cast reads the naive timestamp back in the session time zone it was written in
+            cursor.execute(
+                "SELECT MAX(comment_published_at)::timestamptz FROM comments WHERE video_id = %s",
+                (video_id,)
+            )
+            res = cursor.fetchone()
+        cursor.close()
+    return res[0] if res else None
+
+def _save_comment_watermark(db_config: dict, video_id: str, watermark: datetime):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO comment_sync_state (video_id, newest_comment_published_at, last_synced_at)
+            VALUES (%s, %s, NOW())
+            ON CONFLICT (video_id)
+            DO UPDATE SET
+                newest_comment_published_at = COALESCE(EXCLUDED.newest_comment_published_at, comment_sync_state.newest_comment_published_at),
+                last_synced_at = NOW()
+            """,
+            (video_id, watermark)
+        )
+        conn.commit()
+        cursor.close()
+
+def _sync_video_comments(
+    scheduler,
+    db_config: dict,
+    video_id: str,
+    max_pages: int,
+    max_results_per_page: int,
+    batch_size: int,
+    commit_interval: float,
+    incremental: bool = False,
+    deadline: float = None,
+    priority: str = "normal",
+    include_replies: bool = False,
+    max_reply_pages: int = 10,
+    reply_workers: int = 4,
+    progress=None
+):
+    """Harvests one video's comments (and optionally replies) and advances its sync watermark."""
+    since = _get_comment_watermark(db_config, video_id) if incremental else None
+    
+    # Rows are buffered and written in batches instead of one statement per comment.
+    # The reply workers share this writer, so a video never needs more than one
+    # connection at a time, and each flush writes parent comments before replies.
+    with CommentWriter.CommentBulkWriter(db_config, batch_size, commit_interval) as writer:
+        harvest = _harvest_comments(
+            scheduler, writer, video_id, max_pages, max_results_per_page,
+            deadline=deadline, priority=priority, since=since, include_replies=include_replies,
+            progress=progress
+        )
+        
+        result = {"comments": harvest["comments"], "replies": harvest["replies"], "failed_threads": 0}
+        if include_replies and harvest["pending"]:
+            fetched, failed = _fetch_thread_replies(
+                scheduler, writer, video_id, harvest["pending"], max_reply_pages, reply_workers, priority
+            )
+            result["replies"] += fetched
+            result["failed_threads"] = failed
+    
+    # A walk cut short by max_pages or the deadline leaves a gap below what it
+    # fetched, so the watermark only moves once everything newer is stored
+    if harvest["complete"]:
+        watermark = max(filter(None, [since, harvest["newest"]]), default=None)
+        _save_comment_watermark(db_config, video_id, watermark)
+    
+    return result
+
 def scrape_comments(
     *,
     api_key: str,
     db_config: dict,
     video_id: str,
     max_pages: int = 1,
-    max_results_per_page: int = 20
+    max_results_per_page: int = 20,
+    incremental: bool = False,
+    batch_size: int = CommentWriter.BATCH_SIZE,
+    commit_interval: float = CommentWriter.COMMIT_INTERVAL,
+    progress=None
 ):
-    """Scrapes comments for a YouTube video and saves to database."""
+    """Scrapes comments for a YouTube video and saves to database.
+
+    With incremental=True only comments newer than the video's sync watermark
+    are fetched, so re-syncing costs as many pages as there are new comments.
+    progress, if given, is called with (pages done, max_pages).
+    """
     try:
         # 1. Initialize YouTube API
-        youtube = build("youtube", "v3", developerKey=api_key)
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
         
         # 2. Fetch Comments
-        next_page_token = None
-        pages_processed = 0
-        total_scraped = 0
-        
-        while pages_processed < max_pages:
-            request = youtube.commentThreads().list(
-                part="snippet", 
-                videoId=video_id,
-                maxResults=min(max_results_per_page, 100),
-                pageToken=next_page_token,
-                textFormat="plainText"
-            )
-            response = request.execute()
-            
-            items = response.get("items", [])
-            if not items:
-                break
-                
-            # Connect to database
-            conn = psycopg2.connect(**db_config)
-            cursor = conn.cursor()
-            
-            for item in items:
-                snippet = item["snippet"]["topLevelComment"]["snippet"]
-                comment_id = item["id"]
-                user_id = snippet.get("authorChannelId", {}).get("value", "")
-                user_name = snippet.get("authorDisplayName", "Unknown")
-                comment_text = snippet.get("textDisplay", "")
-                like_count = int(snippet.get("likeCount", 0))
-                reply_count = int(item["snippet"].get("totalReplyCount", 0))
-                published_at_str = snippet.get("publishedAt")
-                published_at = datetime.fromisoformat(published_at_str.replace("Z", "+00:00"))
-                
-                # Insert or Update Comment
-                cursor.execute(
-                    """
-                    INSERT INTO comments (
-                        comment_id, video_id, user_id, user_name, 
-                        comment_text, like_count, reply_count, 
-                        comment_published_at, scraped_at
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                    ON CONFLICT (comment_id)
-                    DO UPDATE SET
-                        user_id = EXCLUDED.user_id,
-                        user_name = EXCLUDED.user_name,
-                        comment_text = EXCLUDED.comment_text,
-                        like_count = EXCLUDED.like_count,
-                        reply_count = EXCLUDED.reply_count,
-                        comment_published_at = EXCLUDED.comment_published_at,
-                        scraped_at = NOW()
-                    """,
-                    (comment_id, video_id, user_id, user_name, comment_text, like_count, reply_count, published_at)
-                )
-                total_scraped += 1
-                
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            next_page_token = response.get("nextPageToken")
-            pages_processed += 1
-            
-            if not next_page_token:
-                break
-                
-        return total_scraped
+        result = _sync_video_comments(
+            scheduler, db_config, video_id, max_pages, max_results_per_page,
+            batch_size, commit_interval, incremental=incremental, progress=progress
+        )
+        return result["comments"]
         
     except HttpError as e:
         raise CommentScraperError(f"YouTube API Error: {e.reason}")
     except Exception as e:
         raise CommentScraperError(f"Failed to scrape comments: {str(e)}")
 
+def scrape_comment_threads(
+    *,
+    api_key: str,
+    db_config: dict,
+    video_id: str,
+    max_pages: int = 1,
+    max_results_per_page: int = 100,
+    incremental: bool = False,
+    max_reply_pages: int = 10,
+    reply_workers: int = 4,
+    batch_size: int = CommentWriter.BATCH_SIZE,
+    commit_interval: float = CommentWriter.COMMIT_INTERVAL,
+    progress=None
+):
+    """Captures a video's comment threads with their replies in one operation.
+
+    Replies that commentThreads returns inline are stored straight away; only
+    threads with more replies than that get comments.list calls, which run
+    concurrently on reply_workers threads. Returns comment and reply counts.
+    """
+    try:
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
+        
+        return _sync_video_comments(
+            scheduler, db_config, video_id, max_pages, max_results_per_page,
+            batch_size, commit_interval, incremental=incremental, include_replies=True,
+            max_reply_pages=max_reply_pages, reply_workers=reply_workers, progress=progress
+        )
+        
+    except HttpError as e:
+        raise CommentScraperError(f"YouTube API Error: {e.reason}")
+    except Exception as e:
+        raise CommentScraperError(f"Failed to scrape comment threads: {str(e)}")
+
+def get_channel_video_ids(db_config: dict, channel_id: str):
+    """Returns the stored video IDs of a channel, newest first."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT video_id FROM videos WHERE channel_id = %s ORDER BY published_at DESC",
+            (channel_id,)
+        )
+        video_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return video_ids
+
+def max_harvest_workers(db_config: dict):
+    """Most videos a channel harvest works on at once without starving the connection pool."""
+    return max(1, Database.get_pool(db_config).max_size - POOL_HEADROOM)
+
+def scrape_channel_comments(
+    *,
+    api_key: str,
+    db_config: dict,
+    channel_id: str = None,
+    video_ids: list = None,
+    max_pages_per_video: int = 1,
+    max_results_per_page: int = 100,
+    max_workers: int = 8,
+    deadline_seconds: float = None,
+    incremental: bool = False,
+    include_replies: bool = False,
+    batch_size: int = CommentWriter.BATCH_SIZE,
+    commit_interval: float = CommentWriter.COMMIT_INTERVAL
+):
+    """Scrapes comments for many videos at once with a bounded thread pool.
+
+    Takes explicit video_ids or every stored video of channel_id. Each video is
+    capped at max_pages_per_video pages, and no new page is requested once
+    deadline_seconds have passed; incremental works as in scrape_comments and
+    include_replies as in scrape_comment_threads. max_workers is capped by
+    max_harvest_workers. Returns per-video comment (and reply) counts, failures
+    and the videos skipped by the deadline.
+    """
+    if video_ids is None:
+        if not channel_id:
+            raise ValueError("Provide either channel_id or video_ids")
+        video_ids = get_channel_video_ids(db_config, channel_id)
+
+    try:
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
+    except Exception as e:
+        raise CommentScraperError(f"Failed to connect to YouTube API: {str(e)}")
+
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    result = {"scraped": {}, "replies": {}, "failed": {}, "skipped": []}
+
+    def harvest(video_id):
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        return _sync_video_comments(
+            scheduler, db_config, video_id, max_pages_per_video, max_results_per_page,
+            batch_size, commit_interval, incremental=incremental, deadline=deadline,
+            priority="low", include_replies=include_replies
+        )
+
+    max_workers = max(1, min(max_workers, max_harvest_workers(db_config)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(harvest, video_id): video_id for video_id in video_ids}
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                counts = future.result()
+            except HttpError as e:
+                # Disabled comments or removed videos should not stop the channel
+                result["failed"][video_id] = f"YouTube API Error: {e.reason}"
+                continue
+            except Exception as e:
+                result["failed"][video_id] = str(e)
+                continue
+
+            if counts is None:
+                result["skipped"].append(video_id)
+            else:
+                result["scraped"][video_id] = counts["comments"]
+                if include_replies:
+                    result["replies"][video_id] = counts["replies"]
+
+    return result
+
+@QueryCache.cached("comments", "videos")
 def get_comments(db_config: dict, video_id: str = None):
     """Retrieves comments from database for a specific video or all."""
-    conn = psycopg2.connect(**db_config)
-    
     query = """
         SELECT c.comment_id, c.video_id, v.video_title, c.user_id, c.user_name, 
                c.comment_text, c.like_count, c.reply_count, c.comment_published_at
@@ -112,104 +488,162 @@ def get_comments(db_config: dict, video_id: str = None):
         
     query += " ORDER BY c.comment_published_at DESC"
     
-    df = pd.read_sql(query, conn, params=params)
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+_COMMENT_LIST_QUERY = """
+    SELECT c.comment_id, c.video_id, v.video_title, c.user_id, c.user_name, 
+           c.comment_text, c.like_count, c.reply_count, c.comment_published_at
+    FROM comments c
+    LEFT JOIN videos v ON c.video_id = v.video_id
+"""
+
+def _comment_keyset_query(video_id: str = None, after=None, limit: int = None):
+    where, params = ("c.video_id = %s", [video_id]) if video_id else ("TRUE", [])
+    return Database.keyset_query(
+        _COMMENT_LIST_QUERY, "c.comment_published_at", "c.comment_id", after, where, params, limit
+    )
+
+def _next_cursor(df, ts_column: str, id_column: str, limit: int):
+    if len(df) < limit:
+        return None
+    last = df.iloc[-1]
+    return (None if pd.isna(last[ts_column]) else last[ts_column].to_pydatetime(), last[id_column])
+
+def get_comments_after(db_config: dict, video_id: str = None, after=None, limit: int = 1000):
+    """Returns (page, next_after): up to limit comments, newest first, after the (published_at, comment_id) cursor."""
+    query, params = _comment_keyset_query(video_id, after, limit)
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df, _next_cursor(df, "comment_published_at", "comment_id", limit)
+
+def iter_comments(db_config: dict, video_id: str = None, chunk_size: int = Database.STREAM_CHUNK_SIZE):
+    """Streams every comment (newest first) as DataFrame chunks through a server-side cursor."""
+    query, params = _comment_keyset_query(video_id)
+    for columns, rows in Database.stream(db_config, query, params, chunk_size):
+        yield pd.DataFrame(rows, columns=columns)
+
+@QueryCache.cached("comments")
+def count_comments(db_config: dict, video_id: str = None):
+    query = "SELECT COUNT(*) FROM comments c"
+    params = []
+    if video_id:
+        query += " WHERE c.video_id = %s"
+        params.append(video_id)
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+@QueryCache.cached("comments", "videos")
+def get_comments_page(
+    db_config: dict,
+    video_id: str = None,
+    sort_by: str = "comment_published_at",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Fetches one sorted page of comments; only the visible rows leave the database."""
+    query = """
+        SELECT c.comment_id, c.video_id, v.video_title, c.user_id, c.user_name, 
+               c.comment_text, c.like_count, c.reply_count, c.comment_published_at,
+               c.sentiment_score, c.sentiment_label
+        FROM comments c
+        LEFT JOIN videos v ON c.video_id = v.video_id
+    """
+    params = []
+    if video_id:
+        query += " WHERE c.video_id = %s"
+        params.append(video_id)
+
+    query += Database.page_clause(COMMENT_SORT_COLUMNS, sort_by, descending, "c.comment_id")
+    params += [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
     return df
 
+def delete_comment(comment_id: str, db_config: dict):
+    """Deletes a comment; its replies go with it (ON DELETE CASCADE)."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM comments WHERE comment_id = %s", (comment_id,))
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("comments", "comment_replies")
+
+@QueryCache.cached("comments", "videos")
+def get_videos_with_comments(db_config: dict):
+    """Maps the title of every video that has stored comments to its video_id."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT v.video_id, v.video_title FROM comments c JOIN videos v ON c.video_id = v.video_id")
+        rows = cursor.fetchall()
+        cursor.close()
+    return {title: vid for vid, title in rows}
+
 def scrape_replies(
     *,
     api_key: str,
     db_config: dict,
     main_comment_id: str,
     max_pages: int = 1,
-    max_results_per_page: int = 20
+    max_results_per_page: int = 20,
+    batch_size: int = CommentWriter.BATCH_SIZE,
+    commit_interval: float = CommentWriter.COMMIT_INTERVAL,
+    progress=None
 ):
-    """Scrapes replies for a specific YouTube comment and saves to database."""
+    """Scrapes replies for a specific YouTube comment and saves to database.
+
+    Returns the reply count and poll_error, the reason the poll tally could not
+    be refreshed (None when it was). The replies are committed either way, so a
+    tally failure never fails the scrape that already paid for them.
+    """
     try:
         # 1. Initialize YouTube API
-        youtube = build("youtube", "v3", developerKey=api_key)
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
         
         # Get video_id for this main_comment_id from DB
-        conn = psycopg2.connect(**db_config)
-        cursor = conn.cursor()
-        cursor.execute("SELECT video_id FROM comments WHERE comment_id = %s", (main_comment_id,))
-        res = cursor.fetchone()
-        if not res:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT video_id FROM comments WHERE comment_id = %s", (main_comment_id,))
+            res = cursor.fetchone()
             cursor.close()
-            conn.close()
+        if not res:
             raise CommentScraperError(f"Main comment {main_comment_id} not found in database. Scrape parents first.")
         
         video_id = res[0]
         
         # 2. Fetch Replies
-        next_page_token = None
-        pages_processed = 0
-        total_scraped = 0
-        
-        while pages_processed < max_pages:
-            request = youtube.comments().list(
-                part="snippet", 
-                parentId=main_comment_id,
-                maxResults=min(max_results_per_page, 100),
-                pageToken=next_page_token,
-                textFormat="plainText"
+        with CommentWriter.CommentBulkWriter(db_config, batch_size, commit_interval) as writer:
+            total_scraped = _harvest_replies(
+                scheduler, writer, main_comment_id, video_id, max_pages, max_results_per_page,
+                progress=progress
             )
-            response = request.execute()
-            
-            items = response.get("items", [])
-            if not items:
-                break
-                
-            for item in items:
-                snippet = item["snippet"]
-                reply_id = item["id"]
-                user_id = snippet.get("authorChannelId", {}).get("value", "")
-                user_name = snippet.get("authorDisplayName", "Unknown")
-                reply_text = snippet.get("textDisplay", "")
-                published_at_str = snippet.get("publishedAt")
-                published_at = datetime.fromisoformat(published_at_str.replace("Z", "+00:00"))
-                
-                # Insert or Update Reply
-                cursor.execute(
-                    """
-                    INSERT INTO comment_replies (
-                        reply_id, main_comment_id, video_id, user_id, user_name,
-                        reply_text, reply_published_at, scraped_at
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-                    ON CONFLICT (reply_id)
-                    DO UPDATE SET
-                        user_id = EXCLUDED.user_id,
-                        user_name = EXCLUDED.user_name,
-                        reply_text = EXCLUDED.reply_text,
-                        reply_published_at = EXCLUDED.reply_published_at,
-                        scraped_at = NOW()
-                    """,
-                    (reply_id, main_comment_id, video_id, user_id, user_name, reply_text, published_at)
-                )
-                total_scraped += 1
-                
-            conn.commit()
-            
-            next_page_token = response.get("nextPageToken")
-            pages_processed += 1
-            
-            if not next_page_token:
-                break
         
-        cursor.close()
-        conn.close()
-        return total_scraped
+        # 3. Fold the new replies into the poll tally; the next refresh catches up if this fails
+        poll_error = None
+        try:
+            PollTally.refresh_poll(db_config, main_comment_id)
+        except Exception as e:
+            poll_error = str(e)
+        
+        return {"replies": total_scraped, "poll_error": poll_error}
         
     except HttpError as e:
         raise CommentScraperError(f"YouTube API Error: {e.reason}")
     except Exception as e:
         raise CommentScraperError(f"Failed to scrape replies: {str(e)}")
 
+@QueryCache.cached("comment_replies", "comments", "videos")
 def get_replies(db_config: dict, main_comment_id: str = None):
     """Retrieves replies from database for a specific comment or all."""
-    conn = psycopg2.connect(**db_config)
-    
     query = """
         SELECT r.reply_id, r.main_comment_id, c.comment_text as parent_comment, 
                r.video_id, v.video_title, r.user_id, r.user_name,
@@ -226,6 +660,239 @@ def get_replies(db_config: dict, main_comment_id: str = None):
         
     query += " ORDER BY r.reply_published_at DESC"
     
-    df = pd.read_sql(query, conn, params=params)
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
     return df
+
+_REPLY_LIST_QUERY = """
+    SELECT r.reply_id, r.main_comment_id, c.comment_text as parent_comment, 
+           r.video_id, v.video_title, r.user_id, r.user_name,
+           r.reply_text, r.reply_published_at
+    FROM comment_replies r
+    LEFT JOIN comments c ON r.main_comment_id = c.comment_id
+    LEFT JOIN videos v ON r.video_id = v.video_id
+"""
+
+def _reply_keyset_query(main_comment_id: str = None, after=None, limit: int = None):
+    where, params = ("r.main_comment_id = %s", [main_comment_id]) if main_comment_id else ("TRUE", [])
+    return Database.keyset_query(
+        _REPLY_LIST_QUERY, "r.reply_published_at", "r.reply_id", after, where, params, limit
+    )
+
+def get_replies_after(db_config: dict, main_comment_id: str = None, after=None, limit: int = 1000):
+    """Returns (page, next_after): up to limit replies, newest first, after the (published_at, reply_id) cursor."""
+    query, params = _reply_keyset_query(main_comment_id, after, limit)
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df, _next_cursor(df, "reply_published_at", "reply_id", limit)
+
+def iter_replies(db_config: dict, main_comment_id: str = None, chunk_size: int = Database.STREAM_CHUNK_SIZE):
+    """Streams every reply (newest first) as DataFrame chunks through a server-side cursor."""
+    query, params = _reply_keyset_query(main_comment_id)
+    for columns, rows in Database.stream(db_config, query, params, chunk_size):
+        yield pd.DataFrame(rows, columns=columns)
+
+@QueryCache.cached("comment_replies")
+def count_replies(db_config: dict, main_comment_id: str = None):
+    query = "SELECT COUNT(*) FROM comment_replies r"
+    params = []
+    if main_comment_id:
+        query += " WHERE r.main_comment_id = %s"
+        params.append(main_comment_id)
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+@QueryCache.cached("comment_replies", "comments", "videos")
+def get_replies_page(
+    db_config: dict,
+    main_comment_id: str = None,
+    sort_by: str = "reply_published_at",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Fetches one sorted page of replies; only the visible rows leave the database."""
+    query = """
+        SELECT r.reply_id, r.main_comment_id, c.comment_text as parent_comment, 
+               r.video_id, v.video_title, r.user_id, r.user_name,
+               r.reply_text, r.reply_published_at, r.sentiment_score, r.sentiment_label
+        FROM comment_replies r
+        LEFT JOIN comments c ON r.main_comment_id = c.comment_id
+        LEFT JOIN videos v ON r.video_id = v.video_id
+    """
+    params = []
+    if main_comment_id:
+        query += " WHERE r.main_comment_id = %s"
+        params.append(main_comment_id)
+
+    query += Database.page_clause(REPLY_SORT_COLUMNS, sort_by, descending, "r.reply_id")
+    params += [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+def delete_reply(reply_id: str, db_config: dict):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM comment_replies WHERE reply_id = %s", (reply_id,))
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("comment_replies")
+
+@QueryCache.cached("comment_replies", "comments")
+def get_comments_with_replies(db_config: dict):
+    """Returns (comment_id, text preview) for every comment that has stored replies."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT c.comment_id, LEFT(c.comment_text, 50) || '...' 
+            FROM comment_replies r 
+            JOIN comments c ON r.main_comment_id = c.comment_id
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+def _search_filters(
+    alias: str,
+    tsv_column: str,
+    published_column: str,
+    search: str,
+    channel_id: str = None,
+    video_id: str = None,
+    published_from=None,
+    published_to=None
+):
+    """WHERE fragment and params shared by the comment and reply searches."""
+    where = [f"{alias}.{tsv_column} @@ websearch_to_tsquery('{SEARCH_CONFIG}', %s)"]
+    params = [search]
+    if channel_id:
+        where.append(f"{alias}.video_id IN (SELECT video_id FROM videos WHERE channel_id = %s)")
+        params.append(channel_id)
+    if video_id:
+        where.append(f"{alias}.video_id = %s")
+        params.append(video_id)
+    if published_from:
+        where.append(f"{alias}.{published_column} >= %s")
+        params.append(published_from)
+    if published_to:
+        # Dates are inclusive, so everything before the next midnight
+        where.append(f"{alias}.{published_column} < %s::date + 1")
+        params.append(published_to)
+    return " WHERE " + " AND ".join(where), params
+
+@QueryCache.cached("comments", "videos")
+def search_comments(
+    db_config: dict,
+    search: str,
+    channel_id: str = None,
+    video_id: str = None,
+    published_from=None,
+    published_to=None,
+    sort_by: str = "rank",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """One page of the comments matching a web-style search ("exact phrase", or, -word), best match first."""
+    where, params = _search_filters(
+        "c", "comment_tsv", "comment_published_at", search, channel_id, video_id, published_from, published_to
+    )
+    query = f"""
+        SELECT c.comment_id, c.video_id, v.video_title, c.user_id, c.user_name,
+               c.comment_text, c.like_count, c.reply_count, c.comment_published_at,
+               c.sentiment_score, c.sentiment_label,
+               ts_rank_cd(c.comment_tsv, websearch_to_tsquery('{SEARCH_CONFIG}', %s)) AS rank
+        FROM comments c
+        LEFT JOIN videos v ON c.video_id = v.video_id
+    """ + where
+    query += Database.page_clause(SEARCH_COMMENT_SORT_COLUMNS, sort_by, descending, "c.comment_id")
+    params = [search] + params + [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+@QueryCache.cached("comments", "videos")
+def count_search_comments(
+    db_config: dict,
+    search: str,
+    channel_id: str = None,
+    video_id: str = None,
+    published_from=None,
+    published_to=None
+):
+    """Number of matching comments, capped at SEARCH_COUNT_LIMIT."""
+    where, params = _search_filters(
+        "c", "comment_tsv", "comment_published_at", search, channel_id, video_id, published_from, published_to
+    )
+    query = f"SELECT COUNT(*) FROM (SELECT 1 FROM comments c{where} LIMIT %s) hits"
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params + [SEARCH_COUNT_LIMIT])
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+@QueryCache.cached("comment_replies", "comments", "videos")
+def search_replies(
+    db_config: dict,
+    search: str,
+    channel_id: str = None,
+    video_id: str = None,
+    published_from=None,
+    published_to=None,
+    sort_by: str = "rank",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """One page of the replies matching a web-style search, best match first."""
+    where, params = _search_filters(
+        "r", "reply_tsv", "reply_published_at", search, channel_id, video_id, published_from, published_to
+    )
+    query = f"""
+        SELECT r.reply_id, r.main_comment_id, c.comment_text as parent_comment,
+               r.video_id, v.video_title, r.user_id, r.user_name,
+               r.reply_text, r.reply_published_at, r.sentiment_score, r.sentiment_label,
+               ts_rank_cd(r.reply_tsv, websearch_to_tsquery('{SEARCH_CONFIG}', %s)) AS rank
+        FROM comment_replies r
+        LEFT JOIN comments c ON r.main_comment_id = c.comment_id
+        LEFT JOIN videos v ON r.video_id = v.video_id
+    """ + where
+    query += Database.page_clause(SEARCH_REPLY_SORT_COLUMNS, sort_by, descending, "r.reply_id")
+    params = [search] + params + [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+@QueryCache.cached("comment_replies", "videos")
+def count_search_replies(
+    db_config: dict,
+    search: str,
+    channel_id: str = None,
+    video_id: str = None,
+    published_from=None,
+    published_to=None
+):
+    """Number of matching replies, capped at SEARCH_COUNT_LIMIT."""
+    where, params = _search_filters(
+        "r", "reply_tsv", "reply_published_at", search, channel_id, video_id, published_from, published_to
+    )
+    query = f"SELECT COUNT(*) FROM (SELECT 1 FROM comment_replies r{where} LIMIT %s) hits"
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params + [SEARCH_COUNT_LIMIT])
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
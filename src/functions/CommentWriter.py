@@ -0,0 +1,191 @@
+import io
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from functions import Database
+from functions import QueryCache
+
+load_dotenv()
+
+# Rows buffered per table before a flush
+BATCH_SIZE = int(os.getenv("COMMENT_BATCH_SIZE", "1000"))
+# Seconds after which a partly filled batch is flushed anyway; 0 waits for a full batch
+COMMIT_INTERVAL = float(os.getenv("COMMENT_COMMIT_INTERVAL", "0"))
+# "values" for multi-row upserts, "copy" for COPY into a staging table + merge
+WRITE_MODE = os.getenv("COMMENT_WRITE_MODE", "values")
+
+COMMENT_COLUMNS = (
+    "comment_id", "video_id", "user_id", "user_name", "comment_text",
+    "like_count", "reply_count", "comment_published_at"
+)
+REPLY_COLUMNS = (
+    "reply_id", "main_comment_id", "video_id", "user_id", "user_name",
+    "reply_text", "reply_published_at"
+)
+
+# table -> (columns, primary key, columns refreshed on conflict)
+TABLES = {
+    "comments": (COMMENT_COLUMNS, "comment_id", COMMENT_COLUMNS[2:]),
+    "comment_replies": (REPLY_COLUMNS, "reply_id", ("user_id", "user_name", "reply_text", "reply_published_at")),
+}
+
+class CommentWriterError(Exception):
+    pass
+
+def _copy_field(value):
+    # Quoted fields are never NULL in CSV COPY, so only the bare marker means NULL
+    if value is None:
+        return "\\N"
+    return '"' + str(value).replace('"', '""') + '"'
+
+class CommentBulkWriter:
+    """Buffers comments and replies and writes them to Postgres in large batches.
+
+    A pooled connection is only borrowed while a batch is written and committed,
+    never while the caller is paging the API. Threads may share one writer.
+    Use it as a context manager so the rows still buffered at the end are flushed.
+    """
+
+    def __init__(
+        self,
+        db_config: dict,
+        batch_size: int = BATCH_SIZE,
+        commit_interval: float = COMMIT_INTERVAL,
+        mode: str = WRITE_MODE
+    ):
+        if mode not in ("values", "copy"):
+            raise ValueError("mode must be 'values' or 'copy'")
+
+        self.batch_size = max(1, batch_size)
+        self.commit_interval = commit_interval
+        self.mode = mode
+        self.rows_written = {table: 0 for table in TABLES}
+
+        self._db_config = db_config
+        self._buffers = {table: [] for table in TABLES}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_comment(self, row: dict):
+        self._add("comments", row)
+
+    def add_reply(self, row: dict):
+        self._add("comment_replies", row)
+
+    def _add(self, table, row):
+        columns = TABLES[table][0]
+        with self._lock:
+            self._buffers[table].append(tuple(row.get(column) for column in columns))
+            if len(self._buffers[table]) >= self.batch_size or (
+                self.commit_interval and time.monotonic() - self._last_flush >= self.commit_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        """Writes and commits every buffered row on a connection borrowed just for this."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not any(self._buffers.values()):
+            return
+        try:
+            with Database.get_connection(self._db_config) as conn:
+                cursor = conn.cursor()
+                # Parents first so replies never violate the comments foreign key
+                for table in TABLES:
+                    rows = self._buffers[table]
+                    if not rows:
+                        continue
+                    if self.mode == "copy":
+                        self._merge_via_copy(cursor, table, rows)
+                    else:
+                        self._upsert_values(cursor, table, rows)
+                conn.commit()
+                cursor.close()
+        except psycopg2.Error as e:
+            raise CommentWriterError(f"Database error: {str(e)}") from e
+
+        for table, rows in self._buffers.items():
+            self.rows_written[table] += len(rows)
+        self._buffers = {table: [] for table in TABLES}
+        QueryCache.invalidate("comments", "comment_replies")
+
+    def _upsert_values(self, cursor, table, rows):
+        columns, key, updates = TABLES[table]
+        # ON CONFLICT cannot touch the same row twice in one statement
+        rows = list({row[0]: row for row in rows}.values())
+        placeholders = ", ".join(["%s"] * len(columns))
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table} ({", ".join(columns)}, scraped_at)
+            VALUES %s
+            ON CONFLICT ({key})
+            DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in updates)},
+                scraped_at = NOW()
+            """,
+            rows,
+            template=f"({placeholders}, NOW())",
+            page_size=len(rows)
+        )
+
+    def _merge_via_copy(self, cursor, table, rows):
+        columns, key, updates = TABLES[table]
+        stage = f"{table}_stage"
+        column_list = ", ".join(columns)
+
+        # Pooled connections come and go between flushes, so make sure this one has the stage
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} AS "
+            f"SELECT {column_list} FROM {table} WITH NO DATA"
+        )
+
+        data = io.StringIO()
+        for row in rows:
+            data.write(",".join(_copy_field(value) for value in row))
+            data.write("\n")
+        data.seek(0)
+
+        cursor.copy_expert(
+            f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            data
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({column_list}, scraped_at)
+            SELECT DISTINCT ON ({key}) {column_list}, NOW()
+            FROM {stage}
+            ORDER BY {key}
+            ON CONFLICT ({key})
+            DO UPDATE SET
+                {", ".join(f"{c} = EXCLUDED.{c}" for c in updates)},
+                scraped_at = NOW()
+            """
+        )
+        cursor.execute(f"TRUNCATE {stage}")
+
+    def close(self):
+        """Flushes and commits whatever is still buffered."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return False
+        # Keep rows from pages fetched before the failure, like the per-page commits did,
+        # without masking the original error
+        try:
+            self.close()
+        except Exception:
+            pass
+        return False
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool sizing can be tuned per deployment (UI vs. bulk scrape workers)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Seconds a caller waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Idle connections older than this are pinged before being handed out
+HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+# Rows fetched per round trip from a server-side cursor
+STREAM_CHUNK_SIZE = 5000
+
+class DatabaseError(Exception):
+    pass
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool that blocks when exhausted and health-checks idle connections."""
+
+    def __init__(
+        self,
+        db_config: dict,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = ThreadedConnectionPool(min_size, max_size, **db_config)
+        # ThreadedConnectionPool raises instead of waiting, so gate it with a semaphore
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        with self._lock:
+            last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise DatabaseError(f"No database connection available after {self.timeout}s")
+
+        try:
+            # Replace dead connections (server restart, idle timeout) transparently
+            for _ in range(self.max_size + 1):
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+            raise DatabaseError("Could not obtain a healthy database connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                # The pool rolls back any transaction the caller left open
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def closeall(self):
+        self._pool.closeall()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def config_key(db_config: dict):
+    """Hashable identity of a db_config, used to key per-database caches."""
+    return tuple(sorted((k, str(v)) for k, v in db_config.items()))
+
+def get_pool(db_config: dict):
+    """Returns the process-wide pool for this db_config, creating it on first use."""
+    key = config_key(db_config)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                try:
+                    pool = ConnectionPool(db_config)
+                except psycopg2.Error as e:
+                    raise DatabaseError(f"Failed to create connection pool: {str(e)}") from e
+                _pools[key] = pool
+    return pool
+
+@contextmanager
+def get_connection(db_config: dict):
+    """Borrows a pooled connection; uncommitted work is rolled back when it is returned."""
+    with get_pool(db_config).connection() as conn:
+        yield conn
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
+def page_clause(sort_columns: dict, sort_by: str, descending: bool, tiebreak: str):
+    """ORDER BY / LIMIT / OFFSET for a whitelisted sort key; the tiebreak column keeps pages stable.
+
+    Returns the SQL fragment; bind the limit and offset after the query's other parameters.
+    """
+    if sort_by not in sort_columns:
+        raise ValueError(f"sort_by must be one of {tuple(sort_columns)}")
+    direction = "DESC" if descending else "ASC"
+    return f" ORDER BY {sort_columns[sort_by]} {direction} NULLS LAST, {tiebreak} {direction} LIMIT %s OFFSET %s"
+
+def keyset_query(
+    select: str,
+    ts_column: str,
+    id_column: str,
+    after=None,
+    where: str = "TRUE",
+    where_params: list = (),
+    limit: int = None
+):
+    """Query for the rows after cursor (timestamp, id), newest first with NULL timestamps last.
+
+    Every branch is a plain btree condition on the (ts DESC NULLS LAST, id DESC)
+    keyset index, so a page starts at the cursor instead of filtering its way
+    there. After a dated cursor the dated rows and the NULL-timestamp rows that
+    sort after them are read by two separately limited branches of a UNION ALL.
+    ts_column and id_column must appear unaliased in select; returns (sql, params).
+    """
+    order = f" ORDER BY {ts_column} DESC NULLS LAST, {id_column} DESC"
+    limit_sql, limit_params = (" LIMIT %s", [limit]) if limit is not None else ("", [])
+
+    if after is None:
+        return f"{select} WHERE {where}{order}{limit_sql}", [*where_params, *limit_params]
+    ts, last_id = after
+    if ts is None:
+        query = f"{select} WHERE {ts_column} IS NULL AND {id_column} < %s AND {where}{order}{limit_sql}"
+        return query, [last_id, *where_params, *limit_params]
+
+    dated = f"{select} WHERE ({ts_column}, {id_column}) < (%s, %s) AND {where}{order}{limit_sql}"
+    undated = f"{select} WHERE {ts_column} IS NULL AND {where}{order}{limit_sql}"
+    # The UNION's ORDER BY sees output column names, not table-qualified ones
+    outer_order = f" ORDER BY {ts_column.split('.')[-1]} DESC NULLS LAST, {id_column.split('.')[-1]} DESC"
+    return (
+        f"({dated}) UNION ALL ({undated}){outer_order}{limit_sql}",
+        [ts, last_id, *where_params, *limit_params, *where_params, *limit_params, *limit_params]
+    )
+
+def stream(db_config: dict, query: str, params=None, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yields (columns, rows) chunks read through a named (server-side) cursor.
+
+    Only one chunk is held in memory at a time. The pooled connection stays
+    checked out until the generator is exhausted or closed.
+    """
+    with get_connection(db_config) as conn:
+        cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [column[0] for column in cursor.description], rows
+        finally:
+            cursor.close()
@@ -0,0 +1,190 @@
+import gzip
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+from dotenv import load_dotenv
+from functions import Database
+
+load_dotenv()
+
+# Where UI exports are written before they are offered for download
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+# Rows per Parquet row group (and per server-side cursor fetch)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+# The UI only offers files up to this size for download (the browser download is served from memory)
+DOWNLOAD_MAX_MB = int(os.getenv("EXPORT_DOWNLOAD_MAX_MB", "200"))
+
+FORMATS = ("csv", "parquet")
+CSV_COMPRESSIONS = (None, "gzip")
+PARQUET_COMPRESSIONS = (None, "snappy", "zstd", "gzip")
+
+# dataset -> (FROM clause, publish-date column, video id column, [(column, SQL expression, Arrow type)])
+DATASETS = {
+    "videos": (
+        "videos v LEFT JOIN video_stats vs ON vs.video_id = v.video_id",
+        "v.published_at",
+        "v.video_id",
+        [
+            ("video_id", "v.video_id", "string"),
+            ("channel_id", "v.channel_id", "string"),
+            ("video_title", "v.video_title", "string"),
+            ("published_at", "v.published_at", "timestamp"),
+            ("video_category", "v.video_category::text", "string"),
+            ("format_type", "v.format_type::text", "string"),
+            ("duration", "v.duration", "int64"),
+            ("view_count", "vs.view_count", "int64"),
+            ("like_count", "vs.like_count", "int64"),
+            ("comment_count", "vs.comment_count", "int64"),
+            ("description", "vs.description", "string"),
+            ("last_scraped_at", "vs.last_scraped_at", "timestamp"),
+        ],
+    ),
+    "comments": (
+        "comments c",
+        "c.comment_published_at",
+        "c.video_id",
+        [
+            ("comment_id", "c.comment_id", "string"),
+            ("video_id", "c.video_id", "string"),
+            ("user_id", "c.user_id", "string"),
+            ("user_name", "c.user_name", "string"),
+            ("comment_text", "c.comment_text", "string"),
+            ("like_count", "c.like_count", "int64"),
+            ("reply_count", "c.reply_count", "int64"),
+            ("comment_published_at", "c.comment_published_at", "timestamp"),
+            ("sentiment_score", "c.sentiment_score", "float64"),
+            ("sentiment_label", "c.sentiment_label", "string"),
+            ("scraped_at", "c.scraped_at", "timestamp"),
+        ],
+    ),
+    "replies": (
+        "comment_replies r",
+        "r.reply_published_at",
+        "r.video_id",
+        [
+            ("reply_id", "r.reply_id", "string"),
+            ("main_comment_id", "r.main_comment_id", "string"),
+            ("video_id", "r.video_id", "string"),
+            ("user_id", "r.user_id", "string"),
+            ("user_name", "r.user_name", "string"),
+            ("reply_text", "r.reply_text", "string"),
+            ("reply_published_at", "r.reply_published_at", "timestamp"),
+            ("sentiment_score", "r.sentiment_score", "float64"),
+            ("sentiment_label", "r.sentiment_label", "string"),
+            ("scraped_at", "r.scraped_at", "timestamp"),
+        ],
+    ),
+}
+
+class ExporterError(Exception):
+    pass
+
+def _export_query(dataset: str, channel_id: str = None, video_id: str = None, date_from=None, date_to=None):
+    """SELECT for a dataset with the given filters; returns (sql, params)."""
+    if dataset not in DATASETS:
+        raise ExporterError(f"dataset must be one of {tuple(DATASETS)}")
+    source, date_column, video_column, columns = DATASETS[dataset]
+
+    where, params = [], []
+    if channel_id:
+        where.append(f"{video_column} IN (SELECT video_id FROM videos WHERE channel_id = %s)")
+        params.append(channel_id)
+    if video_id:
+        where.append(f"{video_column} = %s")
+        params.append(video_id)
+    if date_from:
+        where.append(f"{date_column} >= %s")
+        params.append(date_from)
+    if date_to:
+        # Dates are inclusive, so everything before the next midnight
+        where.append(f"{date_column} < %s::date + 1")
+        params.append(date_to)
+
+    query = f"SELECT {', '.join(f'{expr} AS {name}' for name, expr, _ in columns)} FROM {source}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    return query, params
+
+def _open_output(path: str, compression: str = None):
+    if path == "-":
+        # Closing the gzip stream writes its trailer and leaves stdout open
+        return gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") if compression == "gzip" else sys.stdout.buffer
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    return open(path, "wb")
+
+def export_csv(db_config: dict, dataset: str, path: str, compression: str = None, **filters):
+    """Writes a dataset as CSV through COPY ... TO STDOUT; returns the row count.
+
+    Postgres streams the rows straight into the (optionally gzipped) file, so
+    memory use does not grow with the table. path "-" writes to stdout
+    (gzipped too if compression is set).
+    """
+    if compression not in CSV_COMPRESSIONS:
+        raise ExporterError(f"CSV compression must be one of {CSV_COMPRESSIONS}")
+    query, params = _export_query(dataset, **filters)
+
+    out = _open_output(path, compression)
+    try:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            # COPY takes no bind parameters; mogrify quotes them safely
+            copy = f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            cursor.copy_expert(copy, out)
+            rows = cursor.rowcount
+            cursor.close()
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return rows
+
+def export_parquet(
+    db_config: dict,
+    dataset: str,
+    path: str,
+    compression: str = "snappy",
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    **filters
+):
+    """Writes a dataset as Parquet, one row group per server-side cursor chunk; returns the row count."""
+    if compression not in PARQUET_COMPRESSIONS:
+        raise ExporterError(f"Parquet compression must be one of {PARQUET_COMPRESSIONS}")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExporterError("Parquet export needs pyarrow (pip install pyarrow)") from e
+
+    query, params = _export_query(dataset, **filters)
+    arrow_types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "timestamp": pa.timestamp("us")}
+    # A fixed schema keeps every row group alike, even when a chunk has only NULLs in a column
+    schema = pa.schema([(name, arrow_types[kind]) for name, _, kind in DATASETS[dataset][3]])
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression or "none") as writer:
+        for columns, chunk in Database.stream(db_config, query, params, chunk_size):
+            table = pa.Table.from_pandas(pd.DataFrame(chunk, columns=columns), schema=schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    return rows
+
+def export(db_config: dict, dataset: str, path: str, fmt: str = "csv", compression: str = None, **filters):
+    """Exports a dataset to path in the given format; filters are channel_id, video_id, date_from, date_to."""
+    if fmt == "csv":
+        return export_csv(db_config, dataset, path, compression, **filters)
+    if fmt == "parquet":
+        return export_parquet(db_config, dataset, path, compression, **filters)
+    raise ExporterError(f"format must be one of {FORMATS}")
+
+def default_path(dataset: str, fmt: str = "csv", compression: str = None, directory: str = EXPORT_DIR):
+    """exports/<dataset>_<timestamp>.<ext> (.csv.gz for gzipped CSV)."""
+    extension = "csv.gz" if fmt == "csv" and compression == "gzip" else fmt
+    return os.path.join(directory, f"{dataset}_{datetime.now():%Y%m%d_%H%M%S}.{extension}")
@@ -0,0 +1,311 @@
+import os
+import socket
+import threading
+
+import pandas as pd
+from psycopg2.extras import Json, RealDictCursor
+from dotenv import load_dotenv
+from functions import Database
+from functions import ChannelScraper
+from functions import VideoScraper
+from functions import CommentScraper
+
+load_dotenv()
+
+# Attempts before a failing job is cancelled with its last error
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds before the first retry; doubles with every further attempt
+RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+# A running job whose heartbeat is older than this is assumed orphaned and requeued
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "300"))
+HEARTBEAT_INTERVAL = 30
+# Seconds an idle worker waits before polling again
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+# job kind -> (tracking.track_type, param holding the target id)
+JOB_KINDS = {
+    "scrape_channel": ("channel", "channel_id"),
+    "scrape_channel_videos": ("video", "channel_id"),
+    "scrape_comments": ("comment", "video_id"),
+    "scrape_replies": ("reply", "main_comment_id"),
+}
+
+class JobQueueError(Exception):
+    pass
+
+class JobCancelled(Exception):
+    pass
+
+def enqueue(db_config: dict, kind: str, params: dict, name: str = None, max_attempts: int = MAX_ATTEMPTS):
+    """Queues a scrape job as a 'todo' tracking row; returns its track_id."""
+    if kind not in JOB_KINDS:
+        raise JobQueueError(f"Unknown job kind: {kind}")
+    track_type, target_param = JOB_KINDS[kind]
+    target_id = params.get(target_param) or params.get("username")
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO tracking (track_type, target_id, name, status, job_kind, params, max_attempts, run_after)
+            VALUES (%s, %s, %s, 'todo', %s, %s, %s, NOW())
+            RETURNING track_id
+            """,
+            (track_type, target_id, name or f"{kind} {target_id}", kind, Json(params), max_attempts)
+        )
+        track_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+    return track_id
+
+def get_jobs(db_config: dict, statuses: list = None, limit: int = 100):
+    """Latest queued jobs, newest first (not cached, the Jobs page polls it)."""
+    query = """
+        SELECT track_id, job_kind, name, target_id, status, progress_done, progress_total,
+               attempts, max_attempts, last_error, worker_id, created_at, start_date,
+               actual_end_date, run_after, cancel_requested, result
+        FROM tracking
+        WHERE job_kind IS NOT NULL
+    """
+    params = []
+    if statuses:
+        query += " AND status = ANY(%s::track_status_enum[])"
+        params.append(list(statuses))
+    query += " ORDER BY track_id DESC LIMIT %s"
+    params.append(limit)
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+def cancel(db_config: dict, track_id: int):
+    """Cancels a queued job at once; a running one stops at its next progress report."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE tracking
+            SET cancel_requested = TRUE,
+                status = CASE WHEN status = 'todo' THEN 'cancel'::track_status_enum ELSE status END,
+                actual_end_date = CASE WHEN status = 'todo' THEN NOW() ELSE actual_end_date END
+            WHERE track_id = %s AND job_kind IS NOT NULL AND status IN ('todo', 'process')
+            """,
+            (track_id,)
+        )
+        conn.commit()
+        cursor.close()
+
+def retry(db_config: dict, track_id: int):
+    """Puts a cancelled or failed job back in the queue with fresh attempts."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE tracking
+            SET status = 'todo', attempts = 0, cancel_requested = FALSE, run_after = NOW(),
+                progress_done = 0, progress_total = NULL, actual_end_date = NULL
+            WHERE track_id = %s AND job_kind IS NOT NULL AND status = 'cancel'
+            """,
+            (track_id,)
+        )
+        conn.commit()
+        cursor.close()
+
+def requeue_stale(db_config: dict, stale_after: float = STALE_AFTER):
+    """Returns jobs whose worker stopped heartbeating to the queue (or cancels them if out of attempts)."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE tracking
+            SET status = CASE WHEN attempts >= max_attempts OR cancel_requested
+                              THEN 'cancel'::track_status_enum ELSE 'todo'::track_status_enum END,
+                actual_end_date = CASE WHEN attempts >= max_attempts OR cancel_requested
+                                       THEN NOW() ELSE NULL END,
+                last_error = 'Worker ' || COALESCE(worker_id, '?') || ' stopped responding',
+                worker_id = NULL,
+                run_after = NOW()
+            WHERE status = 'process' AND job_kind IS NOT NULL
+              AND heartbeat_at < NOW() - make_interval(secs => %s)
+            """,
+            (stale_after,)
+        )
+        requeued = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    return requeued
+
+def claim(db_config: dict, worker_id: str):
+    """Atomically takes the next due job; concurrent workers skip rows another worker has locked."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(
+            """
+            UPDATE tracking t
+            SET status = 'process',
+                attempts = t.attempts + 1,
+                worker_id = %s,
+                heartbeat_at = NOW(),
+                start_date = COALESCE(t.start_date, NOW())
+            FROM (
+                SELECT track_id
+                FROM tracking
+                WHERE status = 'todo' AND job_kind IS NOT NULL
+                  AND run_after <= NOW() AND NOT cancel_requested
+                ORDER BY run_after, track_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ) next_job
+            WHERE t.track_id = next_job.track_id
+            RETURNING t.track_id, t.job_kind, t.params, t.name, t.attempts, t.max_attempts
+            """,
+            (worker_id,)
+        )
+        job = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    return job
+
+def _heartbeat(db_config: dict, track_id: int, stop: threading.Event):
+    # Long API calls report no progress, so liveness is signalled separately
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            with Database.get_connection(db_config) as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE tracking SET heartbeat_at = NOW() WHERE track_id = %s", (track_id,))
+                conn.commit()
+                cursor.close()
+        except Exception:
+            pass
+
+def _progress_reporter(db_config: dict, track_id: int):
+    def report(done: int, total: int):
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE tracking
+                SET progress_done = %s, progress_total = %s, heartbeat_at = NOW()
+                WHERE track_id = %s
+                RETURNING cancel_requested
+                """,
+                (done, total, track_id)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        if row and row[0]:
+            raise JobCancelled(f"Job {track_id} was cancelled")
+    return report
+
+def _run(api_key: str, db_config: dict, kind: str, params: dict, progress):
+    if kind == "scrape_channel":
+        return ChannelScraper.scrape_channel(
+            api_key=api_key,
+            db_config=db_config,
+            channel_id=params.get("channel_id"),
+            username=params.get("username"),
+            category=params.get("category")
+        )
+    if kind == "scrape_channel_videos":
+        return VideoScraper.scrape_channel_videos(
+            api_key=api_key,
+            db_config=db_config,
+            channel_id=params["channel_id"],
+            video_type=params.get("video_type"),
+            max_pages=params.get("max_pages", 1),
+            max_videos_per_page=params.get("max_videos_per_page", 50),
+            incremental=params.get("incremental", False),
+            progress=progress
+        )
+    if kind == "scrape_comments":
+        scrape = CommentScraper.scrape_comment_threads if params.get("include_replies") else CommentScraper.scrape_comments
+        return scrape(
+            api_key=api_key,
+            db_config=db_config,
+            video_id=params["video_id"],
+            max_pages=params.get("max_pages", 1),
+            max_results_per_page=params.get("max_results_per_page", 20),
+            incremental=params.get("incremental", False),
+            progress=progress
+        )
+    if kind == "scrape_replies":
+        return CommentScraper.scrape_replies(
+            api_key=api_key,
+            db_config=db_config,
+            main_comment_id=params["main_comment_id"],
+            max_pages=params.get("max_pages", 1),
+            max_results_per_page=params.get("max_results_per_page", 20),
+            progress=progress
+        )
+    raise JobQueueError(f"Unknown job kind: {kind}")
+
+def _finish(db_config: dict, track_id: int, result):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE tracking
+            SET status = 'done', result = %s, actual_end_date = NOW(), worker_id = NULL,
+                progress_done = COALESCE(progress_total, progress_done)
+            WHERE track_id = %s
+            """,
+            (Json(result if isinstance(result, dict) else {"count": result}), track_id)
+        )
+        conn.commit()
+        cursor.close()
+
+def _fail(db_config: dict, job: dict, error: Exception):
+    """Schedules a retry with exponential backoff, or cancels the job when cancelled or out of attempts."""
+    backoff = RETRY_BACKOFF * 2 ** max(job["attempts"] - 1, 0)
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE tracking
+            SET status = CASE WHEN cancel_requested OR attempts >= max_attempts
+                              THEN 'cancel'::track_status_enum ELSE 'todo'::track_status_enum END,
+                actual_end_date = CASE WHEN cancel_requested OR attempts >= max_attempts
+                                       THEN NOW() ELSE NULL END,
+                run_after = NOW() + make_interval(secs => %s),
+                last_error = CASE WHEN cancel_requested THEN 'Cancelled' ELSE %s END,
+                worker_id = NULL
+            WHERE track_id = %s
+            """,
+            (backoff, str(error), job["track_id"])
+        )
+        conn.commit()
+        cursor.close()
+
+def run_job(api_key: str, db_config: dict, job: dict):
+    """Executes one claimed job and records its outcome."""
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(db_config, job["track_id"], stop), daemon=True)
+    heartbeat.start()
+    try:
+        result = _run(api_key, db_config, job["job_kind"], job["params"], _progress_reporter(db_config, job["track_id"]))
+    except Exception as e:
+        _fail(db_config, job, e)
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+    _finish(db_config, job["track_id"], result)
+    return True
+
+def work(api_key: str, db_config: dict, worker_id: str = None, stop: threading.Event = None, once: bool = False):
+    """Worker loop: requeue orphaned jobs, claim the next one, run it; sleeps while the queue is empty."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+
+    while not stop.is_set():
+        requeue_stale(db_config)
+        job = claim(db_config, worker_id)
+        if job is None:
+            if once:
+                return
+            stop.wait(POLL_INTERVAL)
+            continue
+        run_job(api_key, db_config, job)
+        if once:
+            return
@@ -0,0 +1,193 @@
+import pandas as pd
+from dotenv import load_dotenv
+from functions import Database
+from functions import QueryCache
+
+load_dotenv()
+
+VOTE_RULES = ("first", "last")
+# Replies scraped this long before the watermark are re-tallied too, covering scrapes
+# whose transactions committed after a refresh read the watermark (re-tallying is idempotent)
+WATERMARK_OVERLAP = "10 minutes"
+
+class PollTallyError(Exception):
+    pass
+
+# Re-tallies the users with replies scraped since %(since)s (all users when NULL) and
+# moves the running totals by the difference between their old and new votes.
+_TALLY_QUERY = """
+    WITH changed_users AS (
+        SELECT DISTINCT user_id
+        FROM comment_replies
+        WHERE main_comment_id = %(poll)s
+          AND user_id IS NOT NULL AND user_id <> ''
+          AND (%(since)s::timestamp IS NULL OR scraped_at > %(since)s::timestamp - %(overlap)s::interval)
+    ),
+    ballots AS (
+        SELECT r.user_id, r.reply_id, r.reply_published_at,
+               COALESCE(a.option, poll_option(r.reply_text)) AS option
+        FROM comment_replies r
+        JOIN changed_users u ON u.user_id = r.user_id
+        LEFT JOIN poll_option_aliases a
+               ON a.main_comment_id = r.main_comment_id AND a.alias = poll_option(r.reply_text)
+        WHERE r.main_comment_id = %(poll)s
+    ),
+    ranked AS (
+        SELECT user_id, reply_id, reply_published_at, option,
+               row_number() OVER (
+                   PARTITION BY user_id
+                   ORDER BY CASE WHEN %(rule)s = 'first' THEN reply_published_at END ASC NULLS LAST,
+                            CASE WHEN %(rule)s = 'last' THEN reply_published_at END DESC NULLS LAST,
+                            reply_id
+               ) AS rank
+        FROM ballots
+        -- Replies with nothing left after normalising (only emoji, only a mention) are not votes
+        WHERE option <> ''
+    ),
+    previous AS (
+        SELECT v.user_id, v.option
+        FROM poll_votes v
+        JOIN changed_users u ON u.user_id = v.user_id
+        WHERE v.main_comment_id = %(poll)s
+    ),
+    upserted AS (
+        INSERT INTO poll_votes (main_comment_id, user_id, reply_id, option, voted_at)
+        SELECT %(poll)s, user_id, reply_id, option, reply_published_at
+        FROM ranked
+        WHERE rank = 1
+        ON CONFLICT (main_comment_id, user_id) DO UPDATE
+        SET reply_id = EXCLUDED.reply_id, option = EXCLUDED.option, voted_at = EXCLUDED.voted_at
+        WHERE poll_votes.reply_id IS DISTINCT FROM EXCLUDED.reply_id
+           OR poll_votes.option IS DISTINCT FROM EXCLUDED.option
+        RETURNING user_id, option
+    ),
+    delta AS (
+        SELECT option, SUM(change) AS change
+        FROM (
+            SELECT option, 1 AS change FROM upserted
+            UNION ALL
+            SELECT p.option, -1 FROM previous p JOIN upserted u ON u.user_id = p.user_id
+        ) changes
+        GROUP BY option
+    )
+    INSERT INTO poll_results (main_comment_id, option, votes, updated_at)
+    SELECT %(poll)s, option, change, NOW()
+    FROM delta
+    WHERE change <> 0
+    ON CONFLICT (main_comment_id, option) DO UPDATE
+    SET votes = poll_results.votes + EXCLUDED.votes, updated_at = NOW()
+"""
+
+def _tally(cursor, main_comment_id: str, rule: str, since):
+    cursor.execute(_TALLY_QUERY, {"poll": main_comment_id, "rule": rule, "since": since, "overlap": WATERMARK_OVERLAP})
+    cursor.execute("DELETE FROM poll_results WHERE main_comment_id = %s AND votes <= 0", (main_comment_id,))
+
+def refresh_poll(db_config: dict, main_comment_id: str, full: bool = False):
+    """Brings a poll's votes and totals up to date with its stored replies; returns the voter count.
+
+    Only users with replies scraped since the last refresh are re-tallied unless
+    full is set. The poll is registered on its first refresh.
+    """
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO polls (main_comment_id) VALUES (%s)
+            ON CONFLICT (main_comment_id) DO UPDATE SET main_comment_id = EXCLUDED.main_comment_id
+            RETURNING vote_rule, tallied_through
+            """,
+            (main_comment_id,)
+        )
+        # The upsert row-locks the poll until commit, so refreshes of one poll never interleave
+        rule, since = cursor.fetchone()
+        cursor.execute("SELECT MAX(scraped_at) FROM comment_replies WHERE main_comment_id = %s", (main_comment_id,))
+        through = cursor.fetchone()[0]
+
+        if full:
+            cursor.execute("DELETE FROM poll_votes WHERE main_comment_id = %s", (main_comment_id,))
+            cursor.execute("DELETE FROM poll_results WHERE main_comment_id = %s", (main_comment_id,))
+            since = None
+        _tally(cursor, main_comment_id, rule, since)
+
+        cursor.execute(
+            """
+            UPDATE polls SET tallied_through = COALESCE(%s, tallied_through), refreshed_at = NOW()
+            WHERE main_comment_id = %s
+            """,
+            (through, main_comment_id)
+        )
+        cursor.execute("SELECT COUNT(*) FROM poll_votes WHERE main_comment_id = %s", (main_comment_id,))
+        voters = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("poll_results")
+    return voters
+
+def set_vote_rule(db_config: dict, main_comment_id: str, rule: str):
+    """Switches between counting each user's first or last reply and recounts the poll."""
+    if rule not in VOTE_RULES:
+        raise PollTallyError(f"vote rule must be one of {VOTE_RULES}")
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO polls (main_comment_id, vote_rule) VALUES (%s, %s)
+            ON CONFLICT (main_comment_id) DO UPDATE SET vote_rule = EXCLUDED.vote_rule
+            """,
+            (main_comment_id, rule)
+        )
+        conn.commit()
+        cursor.close()
+    return refresh_poll(db_config, main_comment_id, full=True)
+
+def merge_option(db_config: dict, main_comment_id: str, alias: str, option: str):
+    """Counts votes for alias as votes for option from now on, and recounts the poll."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO polls (main_comment_id) VALUES (%s) ON CONFLICT DO NOTHING", (main_comment_id,))
+        # Stored normalised, so aliases match whatever spelling the replies use
+        cursor.execute(
+            """
+            INSERT INTO poll_option_aliases (main_comment_id, alias, option)
+            VALUES (%s, poll_option(%s), poll_option(%s))
+            ON CONFLICT (main_comment_id, alias) DO UPDATE SET option = EXCLUDED.option
+            """,
+            (main_comment_id, alias, option)
+        )
+        conn.commit()
+        cursor.close()
+    return refresh_poll(db_config, main_comment_id, full=True)
+
+@QueryCache.cached("poll_results")
+def get_poll_results(db_config: dict, main_comment_id: str):
+    """Votes per option with their share (percent) of all voters, most votes first."""
+    query = """
+        SELECT option, votes, 100.0 * votes / SUM(votes) OVER () AS share, updated_at
+        FROM poll_results
+        WHERE main_comment_id = %s
+        ORDER BY votes DESC, option
+    """
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=(main_comment_id,))
+    return df
+
+@QueryCache.cached("poll_results", "comment_replies")
+def get_poll(db_config: dict, main_comment_id: str):
+    """Settings and totals of a poll, or None if it was never tallied."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT p.vote_rule, p.refreshed_at,
+                   (SELECT COUNT(*) FROM poll_votes v WHERE v.main_comment_id = p.main_comment_id) AS voters,
+                   (SELECT COUNT(*) FROM comment_replies r WHERE r.main_comment_id = p.main_comment_id) AS replies
+            FROM polls p
+            WHERE p.main_comment_id = %s
+            """,
+            (main_comment_id,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    if not row:
+        return None
+    return {"vote_rule": row[0], "refreshed_at": row[1], "voters": row[2], "replies": row[3]}
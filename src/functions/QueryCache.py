@@ -0,0 +1,138 @@
+import functools
+import inspect
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+from functions import Database
+
+load_dotenv()
+
+# Seconds a cached result may live even without an invalidation (writes from outside the app)
+CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+# Postgres channel the data_changed triggers notify; the payload is the table name
+NOTIFY_CHANNEL = "yt_data_changed"
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+# Per-table data versions; a cached result is valid while every table it reads is unchanged
+_versions = defaultdict(int)
+_epoch = 0
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+def invalidate(*tables):
+    """Bumps the data version of the given tables, or of everything when none are given."""
+    global _epoch
+    with _lock:
+        if tables:
+            for table in tables:
+                _versions[table] += 1
+        else:
+            _epoch += 1
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+def _snapshot(tables):
+    return (_epoch,) + tuple(_versions[table] for table in tables)
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _copy(value):
+    # Callers may add columns to a cached DataFrame; hand out copies
+    return value.copy() if hasattr(value, "copy") else value
+
+def _listen(db_config: dict):
+    """Bumps table versions on every data_changed notification, reconnecting on failure."""
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**db_config)
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            # Anything may have changed while we were not listening
+            invalidate()
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                tables = {notify.payload for notify in conn.notifies}
+                conn.notifies.clear()
+                if tables:
+                    invalidate(*tables)
+        except Exception:
+            invalidate()
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+def _ensure_listener(db_config: dict):
+    key = Database.config_key(db_config)
+    if key in _listeners:
+        return
+    with _listeners_lock:
+        if key not in _listeners:
+            thread = threading.Thread(target=_listen, args=(db_config,), name="query-cache-listener", daemon=True)
+            thread.start()
+            _listeners[key] = thread
+
+def cached(*tables):
+    """Caches a read function's result per arguments until one of its tables changes.
+
+    The function must take a db_config argument; other arguments form the key.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            db_config = bound.arguments["db_config"]
+            _ensure_listener(db_config)
+
+            key = (
+                func.__module__,
+                func.__qualname__,
+                Database.config_key(db_config),
+                _freeze({k: v for k, v in bound.arguments.items() if k != "db_config"})
+            )
+
+            with _lock:
+                entry = _entries.get(key)
+                version = _snapshot(tables)
+                if entry and entry[0] == version and time.monotonic() - entry[1] < CACHE_TTL:
+                    _entries.move_to_end(key)
+                    return _copy(entry[2])
+
+            result = func(*args, **kwargs)
+
+            with _lock:
+                # Keep it only if nothing changed while the query ran
+                if _snapshot(tables) == version:
+                    _entries[key] = (version, time.monotonic(), result)
+                    _entries.move_to_end(key)
+                    while len(_entries) > CACHE_MAX_ENTRIES:
+                        _entries.popitem(last=False)
+            return _copy(result)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,302 @@
+import atexit
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from functions import Database
+from functions import YouTubeClient
+from functions import ResponseArchive
+
+load_dotenv()
+
+# Units charged per call (YouTube Data API v3 quota calculator)
+COSTS = {
+    "channels.list": 1,
+    "playlistItems.list": 1,
+    "videos.list": 1,
+    "commentThreads.list": 1,
+    "comments.list": 1,
+    "search.list": 100,
+}
+
+DAILY_QUOTA = int(os.getenv("YT_DAILY_QUOTA", "10000"))
+# Requests per second across all threads; 0 disables the rate limit
+RATE_PER_SECOND = float(os.getenv("YT_RATE_PER_SECOND", "10"))
+RATE_BURST = int(os.getenv("YT_RATE_BURST", "20"))
+# Units per key that low-priority (bulk/background) calls must leave untouched
+RESERVE_UNITS = int(os.getenv("YT_RESERVE_UNITS", "500"))
+# Seconds spend is accumulated in memory before one write to api_quota_usage; 0 writes every call
+USAGE_FLUSH_INTERVAL = float(os.getenv("YT_USAGE_FLUSH_INTERVAL", "5"))
+
+# Quota resets at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+PRIORITIES = ("high", "normal", "low")
+
+class QuotaExceededError(Exception):
+    pass
+
+def quota_day():
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+def key_id(api_key: str):
+    """Stable identifier for an API key that is safe to store and log."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def _is_quota_error(error: HttpError):
+    return error.resp.status == 403 and (
+        "quotaExceeded" in str(error) or "dailyLimitExceeded" in str(error)
+    )
+
+class TokenBucket:
+    """Blocking token bucket limiting request rate across threads; a rate of 0 means no limit."""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate < 0:
+            raise ValueError("rate must be >= 0")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        if self.rate == 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class QuotaScheduler:
+    """Routes every YouTube API call through per-key daily budgets and a shared rate limit.
+
+    Spend is kept per key per quota day; with a db_config it is also recorded in
+    api_quota_usage so several processes see the same totals. Those writes are
+    batched: at most one connection every usage_flush_interval seconds instead
+    of one per API call.
+    """
+
+    def __init__(
+        self,
+        api_keys: list,
+        db_config: dict = None,
+        daily_quota: int = DAILY_QUOTA,
+        rate_per_second: float = RATE_PER_SECOND,
+        burst: int = RATE_BURST,
+        reserve_units: int = RESERVE_UNITS,
+        usage_flush_interval: float = USAGE_FLUSH_INTERVAL
+    ):
+        if not api_keys:
+            raise QuotaExceededError("No YouTube API key configured")
+
+        self.api_keys = list(api_keys)
+        self.db_config = db_config
+        self.daily_quota = daily_quota
+        self.reserve_units = reserve_units
+        self.usage_flush_interval = usage_flush_interval
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._lock = threading.Lock()
+        self._day = None
+        self._spent = {}
+        self._exhausted = set()
+        self._next_key = 0
+        # (key id, quota day) -> units spent but not yet written to api_quota_usage
+        self._unflushed = {}
+        self._flush_timer = None
+        self._flush_lock = threading.Lock()
+
+    def _roll_day(self):
+        """Starts a new quota day once midnight Pacific has passed; call without self._lock held."""
+        day = quota_day()
+        if day == self._day:
+            return
+        # Read the stored spend before taking the lock so API threads never wait on the database
+        usage = self._load_usage(day) if self.db_config else {}
+        with self._lock:
+            if day != self._day:
+                self._day = day
+                self._spent = {key_id(key): 0 for key in self.api_keys}
+                self._spent.update(usage)
+                self._exhausted = set()
+
+    def _load_usage(self, day):
+        with Database.get_connection(self.db_config) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT key_id, units FROM api_quota_usage WHERE usage_date = %s AND key_id = ANY(%s)",
+                (day, [key_id(key) for key in self.api_keys])
+            )
+            usage = dict(cursor.fetchall())
+            cursor.close()
+        return usage
+
+    def _record(self, api_key: str, units: int):
+        kid = key_id(api_key)
+        with self._lock:
+            self._spent[kid] = self._spent.get(kid, 0) + units
+            if not self.db_config:
+                return
+            self._unflushed[(kid, self._day)] = self._unflushed.get((kid, self._day), 0) + units
+            if self.usage_flush_interval > 0:
+                self._schedule_flush()
+                return
+        self.flush_usage()
+
+    def _schedule_flush(self):
+        # Called with self._lock held
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.usage_flush_interval, self._flush_in_background)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._flush_timer = None
+        try:
+            self.flush_usage()
+        except Exception:
+            # The units stay queued and the next flush retries them
+            pass
+
+    def flush_usage(self):
+        """Writes the spend accumulated since the last flush to api_quota_usage in one statement."""
+        if not self.db_config:
+            return
+        with self._flush_lock:
+            with self._lock:
+                pending, self._unflushed = self._unflushed, {}
+            if not pending:
+                return
+            try:
+                with Database.get_connection(self.db_config) as conn:
+                    cursor = conn.cursor()
+                    totals = execute_values(
+                        cursor,
+                        """
+                        INSERT INTO api_quota_usage (key_id, usage_date, units)
+                        VALUES %s
+                        ON CONFLICT (key_id, usage_date)
+                        DO UPDATE SET units = api_quota_usage.units + EXCLUDED.units
+                        RETURNING key_id, usage_date, units
+                        """,
+                        [(kid, day, units) for (kid, day), units in pending.items()],
+                        fetch=True
+                    )
+                    conn.commit()
+                    cursor.close()
+            except Exception:
+                with self._lock:
+                    for usage_key, units in pending.items():
+                        self._unflushed[usage_key] = self._unflushed.get(usage_key, 0) + units
+                    if self.usage_flush_interval > 0:
+                        self._schedule_flush()
+                raise
+
+        # Other processes' spend shows up in the stored totals
+        with self._lock:
+            for kid, day, total in totals:
+                if day == self._day:
+                    self._spent[kid] = max(self._spent.get(kid, 0), total)
+
+    def _available(self, api_key: str, priority: str):
+        kid = key_id(api_key)
+        if kid in self._exhausted:
+            return 0
+        floor = self.reserve_units if priority == "low" else 0
+        return self.daily_quota - floor - self._spent.get(kid, 0)
+
+    def _pick_key(self, cost: int, priority: str):
+        self._roll_day()
+        with self._lock:
+            # Round-robin over keys that can still afford the call
+            for offset in range(len(self.api_keys)):
+                index = (self._next_key + offset) % len(self.api_keys)
+                api_key = self.api_keys[index]
+                if self._available(api_key, priority) >= cost:
+                    self._next_key = index + 1
+                    return api_key
+        raise QuotaExceededError("API quota exceeded on every configured key")
+
+    def remaining(self, priority: str = "normal"):
+        """Units still available today across all keys."""
+        self._roll_day()
+        with self._lock:
+            return sum(max(0, self._available(key, priority)) for key in self.api_keys)
+
+    def can_afford(self, units: int, priority: str = "normal"):
+        """Lets a job check its estimated cost before it starts."""
+        return self.remaining(priority) >= units
+
+    def usage(self):
+        """Units spent today per key id."""
+        self._roll_day()
+        with self._lock:
+            return dict(self._spent)
+
+    def execute(self, method: str, build_request, priority: str = "normal"):
+        """Runs one API call; build_request receives a client and returns the request to execute."""
+        if method not in COSTS:
+            raise ValueError(f"Unknown API method: {method}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+
+        cost = COSTS[method]
+        while True:
+            api_key = self._pick_key(cost, priority)
+            self._bucket.acquire()
+            request = build_request(YouTubeClient.get_client(api_key))
+            try:
+                response = request.execute()
+            except HttpError as e:
+                if _is_quota_error(e):
+                    # Google says this key is done for the day, move on to the next one
+                    with self._lock:
+                        self._exhausted.add(key_id(api_key))
+                    continue
+                # Failed calls are still charged
+                self._record(api_key, cost)
+                raise
+            self._record(api_key, cost)
+            try:
+                ResponseArchive.append(method, request.uri, response)
+            except OSError:
+                # A full or unwritable archive disk must not fail the scrape that paid for the page
+                pass
+            return response
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def configured_keys(api_key: str = None):
+    """The given key followed by any extra keys listed in YT_API_KEYS."""
+    keys = [api_key] if api_key else []
+    keys += [k.strip() for k in os.getenv("YT_API_KEYS", "").split(",") if k.strip()]
+    return list(dict.fromkeys(keys))
+
+def get_scheduler(api_key: str = None, db_config: dict = None):
+    """Returns the process-wide scheduler for this key set and database."""
+    keys = configured_keys(api_key)
+    cache_key = (tuple(keys), Database.config_key(db_config) if db_config else None)
+    scheduler = _schedulers.get(cache_key)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(cache_key)
+            if scheduler is None:
+                scheduler = QuotaScheduler(keys, db_config=db_config)
+                # Record the last few seconds of spend when the process exits
+                atexit.register(scheduler.flush_usage)
+                _schedulers[cache_key] = scheduler
+    return scheduler
@@ -0,0 +1,241 @@
+import math
+import os
+
+import pandas as pd
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from functions import Database
+from functions import QuotaScheduler
+from functions import VideoScraper
+from functions import ChannelScraper
+
+load_dotenv()
+
+# API units the scheduler may spend per quota day (one unit refreshes up to 50 items)
+DAILY_BUDGET = int(os.getenv("REFRESH_DAILY_BUDGET", "2000"))
+MIN_INTERVAL_HOURS = float(os.getenv("REFRESH_MIN_INTERVAL_HOURS", "1"))
+MAX_INTERVAL_HOURS = float(os.getenv("REFRESH_MAX_INTERVAL_HOURS", "168"))
+# Items without enough history yet
+DEFAULT_INTERVAL_HOURS = float(os.getenv("REFRESH_DEFAULT_INTERVAL_HOURS", "6"))
+# Relative growth expected between two refreshes (0.02 = refresh every ~2% change)
+TARGET_GROWTH = float(os.getenv("REFRESH_TARGET_GROWTH", "0.02"))
+# Snapshot history the growth rate is measured over
+WINDOW_HOURS = int(os.getenv("REFRESH_WINDOW_HOURS", "72"))
+# Videos younger than this are always refreshed at the minimum interval
+NEW_VIDEO_HOURS = 48
+
+# entity -> (rollup, id column, counters whose growth drives the cadence)
+ENTITIES = {
+    "video": ("video_stats_hourly", "video_id", ("view_count", "comment_count")),
+    "channel": ("channel_stats_hourly", "channel_id", ("subscribers_count", "total_view_count")),
+}
+
+def _budget_used(cursor):
+    cursor.execute("SELECT units FROM refresh_budget WHERE usage_date = %s", (QuotaScheduler.quota_day(),))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def _spend(db_config: dict, units: int):
+    if units <= 0:
+        return
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO refresh_budget (usage_date, units) VALUES (%s, %s)
+            ON CONFLICT (usage_date) DO UPDATE SET units = refresh_budget.units + EXCLUDED.units
+            """,
+            (QuotaScheduler.quota_day(), units)
+        )
+        conn.commit()
+        cursor.close()
+
+def sync_schedule(db_config: dict):
+    """Adds newly stored videos and channels to the schedule, due immediately."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO refresh_schedule (entity, item_id)
+            SELECT 'video', video_id FROM videos
+            UNION ALL
+            SELECT 'channel', channel_id FROM channels
+            ON CONFLICT (entity, item_id) DO NOTHING
+        """)
+        added = cursor.rowcount
+        # Items deleted since are dropped from the schedule
+        cursor.execute("""
+            DELETE FROM refresh_schedule s
+            WHERE (s.entity = 'video' AND NOT EXISTS (SELECT 1 FROM videos v WHERE v.video_id = s.item_id))
+               OR (s.entity = 'channel' AND NOT EXISTS (SELECT 1 FROM channels c WHERE c.channel_id = s.item_id))
+        """)
+        conn.commit()
+        cursor.close()
+    return added
+
+def due_items(db_config: dict, entity: str, limit: int):
+    """Item ids whose next refresh is due, most overdue first."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT item_id FROM refresh_schedule
+            WHERE entity = %s AND next_refresh_at <= NOW()
+            ORDER BY next_refresh_at
+            LIMIT %s
+            """,
+            (entity, limit)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return ids
+
+def _growth(db_config: dict, entity: str, item_ids: list):
+    """Relative growth per hour of each item over the window, from the hourly rollup."""
+    rollup, id_column, counters = ENTITIES[entity]
+    firsts = ", ".join(f"(array_agg({c} ORDER BY bucket ASC))[1] AS {c}_then" for c in counters)
+    lasts = ", ".join(f"(array_agg({c} ORDER BY bucket DESC))[1] AS {c}_now" for c in counters)
+    query = f"""
+        SELECT {id_column} AS item_id, {firsts}, {lasts},
+               EXTRACT(EPOCH FROM MAX(last_captured_at) - MIN(last_captured_at)) / 3600.0 AS hours
+        FROM {rollup}
+        WHERE {id_column} = ANY(%s) AND bucket >= NOW() - make_interval(hours => %s)
+        GROUP BY {id_column}
+    """
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=(item_ids, WINDOW_HOURS))
+
+    df = df.set_index("item_id").reindex(item_ids)
+    hours = df["hours"].astype(float).where(df["hours"] >= 1)
+    rates = [
+        (df[f"{c}_now"].astype(float) - df[f"{c}_then"].astype(float)).clip(lower=0)
+        / df[f"{c}_then"].astype(float).clip(lower=1) / hours
+        for c in counters
+    ]
+    # The fastest-moving counter sets the pace; NaN means not enough history yet
+    return pd.concat(rates, axis=1).max(axis=1, skipna=False)
+
+def _intervals(growth: pd.Series):
+    """Hours until the next refresh: time to grow by TARGET_GROWTH, clamped to the configured range."""
+    hours = (TARGET_GROWTH / growth.where(growth > 0)).fillna(MAX_INTERVAL_HOURS)
+    hours = hours.where(growth.notna(), DEFAULT_INTERVAL_HOURS)
+    return hours.clip(MIN_INTERVAL_HOURS, MAX_INTERVAL_HOURS)
+
+def _new_videos(db_config: dict, video_ids: list):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT video_id FROM videos
+            WHERE video_id = ANY(%s) AND published_at >= (NOW() AT TIME ZONE 'UTC') - make_interval(hours => %s)
+            """,
+            (video_ids, NEW_VIDEO_HOURS)
+        )
+        ids = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    return ids
+
+def reschedule(db_config: dict, entity: str, item_ids: list, failed: set = frozenset()):
+    """Sets each item's next refresh from its measured growth, in one UPDATE."""
+    if not item_ids:
+        return
+    growth = _growth(db_config, entity, item_ids)
+    hours = _intervals(growth)
+    if entity == "video":
+        new = _new_videos(db_config, item_ids)
+        hours[hours.index.isin(new)] = MIN_INTERVAL_HOURS
+    # Failed items back off instead of being retried on every run
+    hours[hours.index.isin(failed)] = DEFAULT_INTERVAL_HOURS
+
+    rows = [
+        (entity, item_id, int(hours[item_id] * 3600), None if pd.isna(growth[item_id]) else float(growth[item_id]))
+        for item_id in item_ids
+    ]
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        execute_values(
+            cursor,
+            """
+            UPDATE refresh_schedule AS s
+            SET interval_seconds = r.interval_seconds,
+                growth_per_hour = r.growth_per_hour,
+                last_refreshed_at = NOW(),
+                next_refresh_at = NOW() + make_interval(secs => r.interval_seconds)
+            FROM (VALUES %s) AS r (entity, item_id, interval_seconds, growth_per_hour)
+            WHERE s.entity = r.entity AND s.item_id = r.item_id
+            """,
+            rows,
+            template="(%s, %s, %s::int, %s::double precision)",
+            page_size=len(rows)
+        )
+        conn.commit()
+        cursor.close()
+
+def remaining_budget(db_config: dict, daily_budget: int = DAILY_BUDGET):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        used = _budget_used(cursor)
+        cursor.close()
+    return max(0, daily_budget - used)
+
+def run_due(api_key: str, db_config: dict, daily_budget: int = DAILY_BUDGET):
+    """Refreshes every due channel and video the remaining daily budget allows, in 50-item batches.
+
+    Channels go first (few, and they pace channel-level charts), videos take the rest.
+    """
+    sync_schedule(db_config)
+    budget = remaining_budget(db_config, daily_budget)
+    result = {"channels": 0, "videos": 0, "units": 0, "failed": 0, "budget_left": budget, "quota_exhausted": False}
+
+    # 1. Channels
+    channel_ids = due_items(db_config, "channel", budget * ChannelScraper.API_BATCH_SIZE) if budget else []
+    if channel_ids:
+        refreshed = ChannelScraper.refresh_channels(api_key, db_config, channel_ids, priority="low")
+        # Channels left over when the quota ran out stay due for the next run
+        unsent = {cid for cid, reason in refreshed["failed"].items() if reason == "API quota exceeded"}
+        sent = [cid for cid in channel_ids if cid not in unsent]
+        units = math.ceil(len(sent) / ChannelScraper.API_BATCH_SIZE)
+        _spend(db_config, units)
+        budget -= units
+        failed = set(refreshed["failed"]) - unsent
+        reschedule(db_config, "channel", sent, failed)
+        result["channels"] = len(refreshed["refreshed"])
+        result["failed"] += len(failed)
+        result["units"] += units
+        if unsent:
+            result["quota_exhausted"] = True
+            budget = 0
+
+    # 2. Videos
+    video_ids = due_items(db_config, "video", budget * VideoScraper.API_BATCH_SIZE) if budget > 0 else []
+    if video_ids:
+        refreshed = VideoScraper.refresh_video_stats(api_key, db_config, video_ids=video_ids, priority="low")
+        # The batch that hit the quota wall is counted as requested but was never sent
+        units = math.ceil(refreshed["requested"] / VideoScraper.API_BATCH_SIZE) - int(refreshed["quota_exhausted"])
+        _spend(db_config, units)
+        budget -= units
+        # Videos never sent stay due for the next run
+        sent = video_ids[:units * VideoScraper.API_BATCH_SIZE]
+        failed = set(refreshed["missing"]) | set(refreshed["failed"])
+        reschedule(db_config, "video", sent, failed)
+        result["videos"] = refreshed["updated"]
+        result["failed"] += len(failed)
+        result["units"] += units
+        result["quota_exhausted"] = refreshed["quota_exhausted"]
+
+    result["budget_left"] = max(0, budget)
+    return result
+
+def get_schedule_summary(db_config: dict):
+    """Per entity: tracked items, items due now, and the median refresh interval in hours."""
+    query = """
+        SELECT entity,
+               COUNT(*) AS items,
+               COUNT(*) FILTER (WHERE next_refresh_at <= NOW()) AS due,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY interval_seconds) / 3600.0 AS median_interval_hours
+        FROM refresh_schedule
+        GROUP BY entity
+        ORDER BY entity
+    """
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn)
+    return df
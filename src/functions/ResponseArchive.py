@@ -0,0 +1,76 @@
+import glob
+import gzip
+import json
+import os
+import socket
+import threading
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Root of the raw response archive; empty disables archiving
+ARCHIVE_DIR = os.getenv("YT_ARCHIVE_DIR", "archive")
+
+# Query parameters never written to the archive
+SECRET_PARAMS = {"key", "access_token"}
+
+_lock = threading.Lock()
+
+def partition_path(resource: str, day, archive_dir: str = ARCHIVE_DIR):
+    """<archive>/resource=<resource>/date=<YYYY-MM-DD>/, one file per writing process inside."""
+    return os.path.join(archive_dir, f"resource={resource}", f"date={day:%Y-%m-%d}")
+
+def _request_params(uri: str):
+    return {k: v for k, v in parse_qsl(urlsplit(uri).query) if k not in SECRET_PARAMS}
+
+def append(method: str, uri: str, response: dict, archive_dir: str = ARCHIVE_DIR):
+    """Appends one API response page to today's partition of its resource.
+
+    Every record is its own gzip member, so files are only ever appended to and
+    a crash can at worst truncate the last record. Each process writes its own
+    file; threads share it under a lock.
+    """
+    if not archive_dir:
+        return
+    fetched_at = datetime.now(timezone.utc)
+    record = {
+        "method": method,
+        "params": _request_params(uri),
+        "fetched_at": fetched_at.isoformat(),
+        "response": response,
+    }
+    data = gzip.compress((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+
+    directory = partition_path(method.split(".")[0], fetched_at, archive_dir)
+    path = os.path.join(directory, f"part-{socket.gethostname()}-{os.getpid()}.ndjson.gz")
+    with _lock:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(data)
+
+def list_files(resources: list = None, date_from=None, date_to=None, archive_dir: str = ARCHIVE_DIR):
+    """Archive files of the given resources (all by default) and date range, oldest partition first."""
+    files = []
+    for directory in glob.glob(os.path.join(archive_dir, "resource=*", "date=*")):
+        resource = os.path.basename(os.path.dirname(directory)).split("=", 1)[1]
+        day = datetime.strptime(os.path.basename(directory).split("=", 1)[1], "%Y-%m-%d").date()
+        if resources and resource not in resources:
+            continue
+        if (date_from and day < date_from) or (date_to and day > date_to):
+            continue
+        files += [(resource, day, path) for path in glob.glob(os.path.join(directory, "*.ndjson.gz"))]
+    return sorted(files, key=lambda f: (f[1], f[2]))
+
+def read_file(path: str):
+    """Yields the records of one archive file in write order; a truncated last record is skipped."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError):
+            # Interrupted write at the end of the file
+            return
@@ -0,0 +1,170 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httplib2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Empty path disables the cache
+CACHE_PATH = os.getenv("YT_CACHE_PATH", ".cache/youtube_responses.sqlite3")
+CACHE_MAX_MB = float(os.getenv("YT_CACHE_MAX_MB", "256"))
+
+# Top-level etag of a YouTube JSON payload, used when the ETag header is missing
+_BODY_ETAG = re.compile(rb'^\s*\{[^{]*?"etag"\s*:\s*"([^"]+)"')
+
+def cache_key(uri: str):
+    """Request identity without the API key, so every key shares the same entries."""
+    parts = urlsplit(uri)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != "key")
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+class ResponseCache:
+    """Disk-backed (SQLite) store of API responses keyed by request, with LRU eviction."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024)):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                content_type TEXT,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_saved": 0}
+
+    def get(self, key: str):
+        """Returns (etag, content_type, content) or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, content_type, content FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        return row
+
+    def put(self, key: str, etag: str, content_type: str, content: bytes):
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, content_type, content, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, content_type, content, size, time.time())
+            )
+            self._size += size - (old[0] if old else 0)
+            self._stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until back under 90% of the limit
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if self._size <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self._stats["evictions"] += 1
+
+    def record(self, stat: str, amount: int = 1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        stats["size_bytes"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._size = 0
+
+class CachingHttp:
+    """Wraps an httplib2.Http so GETs revalidate with If-None-Match and 304s are served from disk."""
+
+    def __init__(self, http, cache: ResponseCache):
+        self.http = http
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if method != "GET":
+            return self.http.request(uri, method, body=body, headers=headers, **kwargs)
+
+        key = cache_key(uri)
+        cached = self.cache.get(key)
+        headers = dict(headers or {})
+        if cached:
+            headers["if-none-match"] = cached[0]
+
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+
+        if resp.status == 304 and cached:
+            etag, content_type, cached_content = cached
+            self.cache.record("hits")
+            self.cache.record("bytes_saved", len(cached_content))
+            revalidated = httplib2.Response({
+                "status": "200",
+                "content-type": content_type or "application/json; charset=UTF-8",
+                "etag": etag,
+                "x-cache": "revalidated",
+            })
+            return revalidated, cached_content
+
+        self.cache.record("misses")
+        if resp.status == 200:
+            etag = resp.get("etag")
+            if not etag:
+                match = _BODY_ETAG.match(content[:512])
+                etag = f'"{match.group(1).decode()}"' if match else None
+            if etag:
+                self.cache.put(key, etag, resp.get("content-type"), content)
+        return resp, content
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the process-wide response cache, or None when YT_CACHE_PATH is empty."""
+    global _cache
+    if not CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,212 @@
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from functions import Database
+from functions import QueryCache
+
+load_dotenv()
+
+# "token<TAB>valence" file (VADER lexicon format, extra columns ignored); defaults to the bundled one
+LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_lexicon.tsv")
+# Rows read, scored and written back per batch
+BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "20000"))
+# Scoring processes; 0 uses every core
+WORKERS = int(os.getenv("SENTIMENT_WORKERS", "0"))
+
+# Compound score bounds for the labels (VADER conventions)
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+NEGATIONS = {
+    "not", "no", "never", "nothing", "nobody", "none", "neither", "nor", "without", "hardly",
+    "isn't", "isnt", "aren't", "arent", "wasn't", "wasnt", "weren't", "werent", "don't", "dont",
+    "doesn't", "doesnt", "didn't", "didnt", "can't", "cant", "cannot", "couldn't", "couldnt",
+    "won't", "wont", "wouldn't", "wouldnt", "shouldn't", "shouldnt", "ain't", "aint",
+}
+BOOSTERS = {
+    "very", "really", "so", "extremely", "absolutely", "totally", "completely", "incredibly",
+    "highly", "truly", "most", "too", "soo", "sooo", "damn",
+}
+NEGATION_FACTOR = -0.74
+BOOSTER_INCREMENT = 0.293
+EXCLAMATION_INCREMENT = 0.292
+NORMALIZATION_ALPHA = 15
+
+TOKEN_PATTERN = r"[a-z0-9']+|:-?[()d]|<3|[^\w\s]"
+# Stored comment text is YouTube's textDisplay, which carries HTML
+TAG_PATTERN = r"</?[a-z][^>]*>"
+ENTITIES = {"&#39;": "'", "&quot;": '"', "&amp;": "&", "&lt;": "<", "&gt;": ">"}
+
+# table -> (primary key, text column)
+TABLES = {
+    "comments": ("comment_id", "comment_text"),
+    "comment_replies": ("reply_id", "reply_text"),
+}
+
+class SentimentAnalyzerError(Exception):
+    pass
+
+@functools.lru_cache(maxsize=4)
+def load_lexicon(path: str = LEXICON_PATH):
+    """Reads a token -> valence Series; loaded once per process."""
+    try:
+        lexicon = pd.read_csv(
+            path, sep="\t", comment="#", header=None, usecols=[0, 1],
+            names=["token", "valence"], quoting=3, keep_default_na=False, encoding="utf-8"
+        )
+    except (OSError, ValueError) as e:
+        raise SentimentAnalyzerError(f"Cannot read sentiment lexicon {path}: {e}") from e
+    lexicon["token"] = lexicon["token"].str.lower()
+    return lexicon.drop_duplicates("token", keep="last").set_index("token")["valence"].astype(float)
+
+def score_texts(texts, lexicon_path: str = LEXICON_PATH):
+    """Scores many texts at once; returns compound scores in [-1, 1] (NaN-free, 0 for no opinion).
+
+    Tokens are exploded into one long Series so lexicon lookup, negation and
+    boosting run as column operations rather than a Python loop per comment.
+    """
+    lexicon = load_lexicon(lexicon_path)
+    text = pd.Series(texts, dtype="object").fillna("").astype(str).str.lower()
+    text = text.str.replace(TAG_PATTERN, " ", regex=True)
+    for entity, char in ENTITIES.items():
+        text = text.str.replace(entity, char, regex=False)
+    text = text.reset_index(drop=True)
+
+    tokens = text.str.findall(TOKEN_PATTERN).explode().dropna()
+    if tokens.empty:
+        return np.zeros(len(text))
+    frame = tokens.rename("token").to_frame()
+    frame["row"] = frame.index
+    frame["valence"] = frame["token"].map(lexicon).fillna(0.0)
+
+    previous = frame.groupby("row")["token"]
+    prev1, prev2, prev3 = previous.shift(1), previous.shift(2), previous.shift(3)
+
+    # "very good" -> stronger in the direction of the word
+    boosted = prev1.isin(BOOSTERS) & (frame["valence"] != 0)
+    frame["valence"] += np.sign(frame["valence"]) * BOOSTER_INCREMENT * boosted
+    # "not good", "don't really like" -> flipped and damped
+    negated = prev1.isin(NEGATIONS) | prev2.isin(NEGATIONS) | prev3.isin(NEGATIONS)
+    frame["valence"] = frame["valence"].where(~negated, frame["valence"] * NEGATION_FACTOR)
+
+    sums = frame.groupby("row")["valence"].sum().reindex(text.index, fill_value=0.0)
+    exclamations = text.str.count("!").clip(upper=4) * EXCLAMATION_INCREMENT
+    sums = sums + np.sign(sums) * exclamations
+    return (sums / np.sqrt(sums * sums + NORMALIZATION_ALPHA)).to_numpy()
+
+def label(scores):
+    scores = np.asarray(scores)
+    return np.where(scores >= POSITIVE_THRESHOLD, "positive", np.where(scores <= NEGATIVE_THRESHOLD, "negative", "neutral"))
+
+def _score_batch(ids: list, texts: list, lexicon_path: str):
+    # Runs in a worker process; returns rows ready for the bulk update
+    scores = score_texts(texts, lexicon_path)
+    return list(zip(ids, scores.round(4).tolist(), label(scores).tolist()))
+
+def _save_scores(db_config: dict, table: str, rows: list):
+    key = TABLES[table][0]
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        execute_values(
+            cursor,
+            f"""
+            UPDATE {table} AS t
+            SET sentiment_score = s.score, sentiment_label = s.label, sentiment_scored_at = NOW()
+            FROM (VALUES %s) AS s ({key}, score, label)
+            WHERE t.{key} = s.{key}
+            """,
+            rows,
+            template="(%s, %s::real, %s)",
+            page_size=len(rows)
+        )
+        conn.commit()
+        cursor.close()
+
+def score_table(
+    db_config: dict,
+    table: str,
+    rescore: bool = False,
+    workers: int = WORKERS,
+    batch_size: int = BATCH_SIZE,
+    lexicon_path: str = LEXICON_PATH,
+    progress=None
+):
+    """Scores every not-yet-scored row of a table (all rows with rescore); returns the row count.
+
+    Rows stream through a server-side cursor, batches are scored in a process
+    pool and each result is written back with one bulk UPDATE.
+    """
+    if table not in TABLES:
+        raise SentimentAnalyzerError(f"Unknown table: {table}")
+    key, text_column = TABLES[table]
+    query = f"SELECT {key}, {text_column} FROM {table}"
+    if not rescore:
+        query += " WHERE sentiment_scored_at IS NULL"
+
+    # Fail on a bad lexicon before any process starts
+    load_lexicon(lexicon_path)
+    workers = workers or os.cpu_count() or 1
+    batches = (
+        ([row[0] for row in rows], [row[1] for row in rows])
+        for _, rows in Database.stream(db_config, query, chunk_size=batch_size)
+    )
+
+    scored = 0
+    def save(rows):
+        nonlocal scored
+        _save_scores(db_config, table, rows)
+        scored += len(rows)
+        if progress:
+            progress(scored, None)
+
+    if workers == 1:
+        for ids, texts in batches:
+            save(_score_batch(ids, texts, lexicon_path))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Bounded look-ahead keeps memory flat while every worker stays busy
+            pending = []
+            for ids, texts in batches:
+                pending.append(pool.submit(_score_batch, ids, texts, lexicon_path))
+                if len(pending) >= workers * 2:
+                    save(pending.pop(0).result())
+            for future in pending:
+                save(future.result())
+
+    if scored:
+        QueryCache.invalidate(table)
+    return scored
+
+def score_all(db_config: dict, rescore: bool = False, workers: int = WORKERS, batch_size: int = BATCH_SIZE, progress=None):
+    """Scores comments, then replies; returns {table: rows scored}."""
+    return {
+        table: score_table(db_config, table, rescore=rescore, workers=workers, batch_size=batch_size, progress=progress)
+        for table in TABLES
+    }
+
+@QueryCache.cached("comments", "comment_replies")
+def get_sentiment_summary(db_config: dict, video_id: str = None):
+    """Counts and mean score per sentiment label for comments and replies (of one video, if set)."""
+    where = "WHERE sentiment_label IS NOT NULL"
+    params = []
+    if video_id:
+        where += " AND video_id = %s"
+        params = [video_id, video_id]
+    query = f"""
+        SELECT 'comments' AS source, sentiment_label, COUNT(*) AS count, AVG(sentiment_score) AS avg_score
+        FROM comments {where}
+        GROUP BY sentiment_label
+        UNION ALL
+        SELECT 'replies' AS source, sentiment_label, COUNT(*) AS count, AVG(sentiment_score) AS avg_score
+        FROM comment_replies {where}
+        GROUP BY sentiment_label
+        ORDER BY source, sentiment_label
+    """
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
@@ -0,0 +1,155 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+from psycopg2.extras import execute_values
+from functions import Database
+from functions import QueryCache
+
+# entity -> (snapshot table, id column, counter columns)
+ENTITIES = {
+    "video": ("video_stats_snapshots", "video_id", ("view_count", "like_count", "comment_count")),
+    "channel": ("channel_stats_snapshots", "channel_id", ("subscribers_count", "total_video_count", "total_view_count")),
+}
+GRANULARITIES = ("hourly", "daily")
+
+def _month_start(moment: datetime):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_month(moment: datetime):
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1)
+    return moment.replace(month=moment.month + 1)
+
+def _bucket(moment: datetime, granularity: str):
+    if granularity == "hourly":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def ensure_partition(cursor, table: str, moment: datetime):
+    """Creates the monthly partition of a snapshot table that holds this moment.
+
+    Runs in the caller's transaction so a rollback cannot leave a batch without
+    its partition; IF NOT EXISTS returns before touching the parent table.
+    """
+    start = _month_start(moment)
+    name = f"{table}_p{start:%Y%m}"
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        (start, _next_month(start))
+    )
+
+def _record(cursor, entity: str, rows: list, captured_at: datetime = None):
+    table, id_column, counters = ENTITIES[entity]
+    # One snapshot per item per batch; the rollups' ON CONFLICT needs unique keys
+    rows = list({row[id_column]: row for row in rows}.values())
+    if not rows:
+        return
+
+    captured_at = captured_at or datetime.now(timezone.utc)
+    ensure_partition(cursor, table, captured_at)
+
+    values = [
+        (row[id_column], captured_at) + tuple(row.get(column) for column in counters)
+        for row in rows
+    ]
+    column_list = ", ".join(counters)
+    execute_values(
+        cursor,
+        f"INSERT INTO {table} ({id_column}, captured_at, {column_list}) VALUES %s",
+        values,
+        page_size=len(values)
+    )
+
+    # Rollups keep the latest reading per bucket and are updated in place,
+    # so charts never have to scan the raw snapshots
+    for granularity in GRANULARITIES:
+        rollup = f"{entity}_stats_{granularity}"
+        bucket = _bucket(captured_at, granularity)
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {rollup} ({id_column}, bucket, {column_list}, samples, last_captured_at)
+            VALUES %s
+            ON CONFLICT ({id_column}, bucket)
+            DO UPDATE SET
+                {", ".join(
+                    f"{c} = CASE WHEN EXCLUDED.last_captured_at >= {rollup}.last_captured_at "
+                    f"THEN EXCLUDED.{c} ELSE {rollup}.{c} END"
+                    for c in counters
+                )},
+                samples = {rollup}.samples + 1,
+                last_captured_at = GREATEST({rollup}.last_captured_at, EXCLUDED.last_captured_at)
+            """,
+            [(v[0], bucket) + v[2:] + (1, captured_at) for v in values],
+            page_size=len(values)
+        )
+
+def record_video_snapshots(cursor, rows: list, captured_at: datetime = None):
+    """Appends a snapshot per video (dicts with video_id and counters) inside the caller's transaction.
+
+    captured_at defaults to now; archive replays pass the original fetch time.
+    """
+    _record(cursor, "video", rows, captured_at)
+
+def record_channel_snapshots(cursor, rows: list, captured_at: datetime = None):
+    """Appends a snapshot per channel (dicts with channel_id and counters) inside the caller's transaction."""
+    _record(cursor, "channel", rows, captured_at)
+
+# Rollups are written in the same transactions as the stats tables
+@QueryCache.cached("video_stats", "channel_stats")
+def get_growth(db_config: dict, entity: str, item_id: str, granularity: str = "daily", days: int = None):
+    """Reads an item's counter history from the hourly or daily rollup."""
+    if entity not in ENTITIES:
+        raise ValueError(f"entity must be one of {tuple(ENTITIES)}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+
+    _, id_column, counters = ENTITIES[entity]
+    query = f"""
+        SELECT bucket, {", ".join(counters)}
+        FROM {entity}_stats_{granularity}
+        WHERE {id_column} = %s
+    """
+    params = [item_id]
+    if days:
+        query += " AND bucket >= NOW() - make_interval(days => %s)"
+        params.append(days)
+    query += " ORDER BY bucket ASC"
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+def drop_snapshots_before(db_config: dict, cutoff: datetime):
+    """Drops whole monthly snapshot partitions that end on or before cutoff; returns their names.
+
+    A naive cutoff is taken as UTC, like the partition bounds.
+    """
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    dropped = []
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        for table, _, _ in ENTITIES.values():
+            cursor.execute(
+                """
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = %s
+                """,
+                (table,)
+            )
+            for (name,) in cursor.fetchall():
+                try:
+                    start = datetime.strptime(name.rsplit("_p", 1)[1], "%Y%m").replace(tzinfo=timezone.utc)
+                except (IndexError, ValueError):
+                    continue
+                if _next_month(start) <= cutoff:
+                    cursor.execute(f"DROP TABLE IF EXISTS {name}")
+                    dropped.append(name)
+        conn.commit()
+        cursor.close()
+    return dropped
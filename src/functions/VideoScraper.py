@@ -1,9 +1,27 @@
-import psycopg2
-from googleapiclient.discovery import build
+from psycopg2.extras import RealDictCursor, execute_values
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import pandas as pd
 import re
+from functions import Database
+from functions import QuotaScheduler
+from functions import StatsSnapshots
+from functions import QueryCache
+
+# Max IDs accepted by one videos.list call
+API_BATCH_SIZE = 50
+# Stored video_ids read (and written back) per round trip during bulk refreshes
+REFRESH_CHUNK_SIZE = 1000
+# Sort keys of the paginated Videos table
+VIDEO_SORT_COLUMNS = {
+    "published_at": "v.published_at",
+    "video_title": "v.video_title",
+    "channel_name": "c.channel_name",
+    "duration": "v.duration",
+    "view_count": "vs.view_count",
+    "like_count": "vs.like_count",
+    "comment_count": "vs.comment_count",
+}
 
 class VideoScraperError(Exception):
     pass
@@ -23,30 +41,30 @@ def parse_duration(duration_str):
     
     return days * 86400 + hours * 3600 + minutes * 60 + seconds
 
+@QueryCache.cached("channels")
 def select_video_category(channel_id: str, db_config: dict):
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor()
-    cursor.execute("SELECT category FROM channels WHERE channel_id = %s", (channel_id,))
-    category = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT category FROM channels WHERE channel_id = %s", (channel_id,))
+        category = cursor.fetchone()
+        cursor.close()
     if category:
         return category[0]
     return None
 
+@QueryCache.cached("channels")
 def select_channel_name(db_config: dict):
-    conn = psycopg2.connect(**db_config)
-    cursor = conn.cursor()
-    cursor.execute("SELECT channel_id, channel_name FROM channels")
-    channel_names = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT channel_id, channel_name FROM channels")
+        channel_names = cursor.fetchall()
+        cursor.close()
     if not channel_names:
         return {}
     return {name: cid for cid, name in channel_names}
 
+@QueryCache.cached("videos", "video_stats", "channels")
 def get_videos(db_config: dict, channel_id=None):
-    conn = psycopg2.connect(**db_config)
     query = """
         SELECT v.video_id,
                v.video_title,
@@ -68,54 +86,338 @@ def get_videos(db_config: dict, channel_id=None):
     if channel_id and channel_id != "All":
         query += f" WHERE v.channel_id = '{channel_id}' order by v.published_at desc"
 
-    df = pd.read_sql(query, conn)
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn)
     return df
 
-def get_publication_stats(db_config: dict, channel_id: str, days: int):
-    """Retrieves video publication counts grouped by date."""
-    conn = psycopg2.connect(**db_config)
-    
+_VIDEO_LIST_QUERY = """
+    SELECT v.video_id,
+           v.video_title,
+           v.published_at,
+           c.channel_name,
+           v.video_category,
+           v.format_type,
+           v.duration,
+           vs.view_count,
+           vs.like_count,
+           vs.comment_count
+    FROM videos v
+    LEFT JOIN video_stats vs
+    ON v.video_id = vs.video_id
+    LEFT JOIN channels c
+    ON v.channel_id = c.channel_id
+"""
+
+def _video_keyset_query(channel_id=None, after=None, limit: int = None):
+    where, params = "TRUE", []
+    if channel_id and channel_id != "All":
+        where, params = "v.channel_id = %s", [channel_id]
+    return Database.keyset_query(_VIDEO_LIST_QUERY, "v.published_at", "v.video_id", after, where, params, limit)
+
+def get_videos_after(db_config: dict, channel_id=None, after=None, limit: int = 1000):
+    """Returns (page, next_after): up to limit videos, newest first, after the (published_at, video_id) cursor."""
+    query, params = _video_keyset_query(channel_id, after, limit)
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+
+    if len(df) < limit:
+        return df, None
+    last = df.iloc[-1]
+    return df, (None if pd.isna(last["published_at"]) else last["published_at"].to_pydatetime(), last["video_id"])
+
+def iter_videos(db_config: dict, channel_id=None, chunk_size: int = Database.STREAM_CHUNK_SIZE):
+    """Streams every video (newest first) as DataFrame chunks through a server-side cursor."""
+    query, params = _video_keyset_query(channel_id)
+    for columns, rows in Database.stream(db_config, query, params, chunk_size):
+        yield pd.DataFrame(rows, columns=columns)
+
+@QueryCache.cached("videos")
+def count_videos(db_config: dict, channel_id=None):
+    query = "SELECT COUNT(*) FROM videos v"
+    params = []
+    if channel_id and channel_id != "All":
+        query += " WHERE v.channel_id = %s"
+        params.append(channel_id)
+
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+@QueryCache.cached("videos", "video_stats", "channels")
+def get_videos_page(
+    db_config: dict,
+    channel_id=None,
+    sort_by: str = "published_at",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Fetches one sorted page of videos; only the visible rows leave the database."""
+    query = """
+        SELECT v.video_id,
+               v.video_title,
+               v.published_at,
+               c.channel_name,
+               v.video_category,
+               v.format_type,
+               v.duration,
+               vs.view_count,
+               vs.like_count,
+               vs.comment_count
+        FROM videos v
+        LEFT JOIN video_stats vs
+        ON v.video_id = vs.video_id
+        LEFT JOIN channels c
+        ON v.channel_id = c.channel_id
+    """
+    params = []
+    if channel_id and channel_id != "All":
+        query += " WHERE v.channel_id = %s"
+        params.append(channel_id)
+
+    query += Database.page_clause(VIDEO_SORT_COLUMNS, sort_by, descending, "v.video_id")
+    params += [limit, offset]
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
+    return df
+
+@QueryCache.cached("videos", "video_stats", "channels")
+def get_video_details(video_id: str, db_config: dict):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT v.*, vs.*, c.channel_name 
+            FROM videos v 
+            JOIN video_stats vs ON v.video_id = vs.video_id 
+            JOIN channels c ON v.channel_id = c.channel_id
+            WHERE v.video_id = %s
+        """, (video_id,))
+        details = cursor.fetchone()
+        cursor.close()
+    return details
+
+def delete_video(video_id: str, db_config: dict):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("DELETE FROM videos WHERE video_id = %s", (video_id,))
+
+        conn.commit()
+        cursor.close()
+    # Cascades reach stats, comments and replies
+    QueryCache.invalidate()
+
+def _publication_filter(channel_id, days, column: str, params: list):
+    """WHERE fragment over a publication rollup; None channel_id means every channel, None days all time."""
+    conditions = ["video_count > 0"]
+    if channel_id and channel_id != "All":
+        conditions.append("channel_id = %s")
+        params.append(channel_id)
+    if days:
+        conditions.append(f"{column} >= CURRENT_DATE - make_interval(days => %s)")
+        params.append(days)
+    return " AND ".join(conditions)
+
+@QueryCache.cached("videos")
+def get_publication_stats(db_config: dict, channel_id: str = None, days: int = None):
+    """Retrieves video publication counts grouped by date, from the daily rollup."""
+    params = []
+    where = _publication_filter(channel_id, days, "pub_date", params)
     # We use a date series to ensure we have entries for every day even if 0 videos
     query = f"""
-        WITH date_range AS (
+        WITH counts AS (
+            SELECT pub_date, SUM(video_count) AS video_count
+            FROM channel_publication_daily
+            WHERE {where}
+            GROUP BY pub_date
+        ),
+        date_range AS (
             SELECT generate_series(
-                CURRENT_DATE - INTERVAL '{days} days',
+                COALESCE(
+                    (CURRENT_DATE - make_interval(days => %s))::date,
+                    (SELECT MIN(pub_date) FROM counts),
+                    CURRENT_DATE
+                ),
                 CURRENT_DATE,
                 '1 day'::interval
             )::date AS d
         )
         SELECT 
             dr.d as pub_date,
-            COUNT(v.video_id) as video_count
+            COALESCE(c.video_count, 0) as video_count
         FROM date_range dr
-        LEFT JOIN videos v ON dr.d = DATE(v.published_at) AND v.channel_id = %s
-        GROUP BY dr.d
+        LEFT JOIN counts c ON c.pub_date = dr.d
         ORDER BY dr.d ASC
     """
-    
-    df = pd.read_sql(query, conn, params=(channel_id,))
-    conn.close()
+    params.append(days)
+
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
     return df
 
-def get_publication_time_data(db_config: dict, channel_id: str, days: int):
-    """Retrieves video publication dates and times (fractional hours) for scatter plot."""
-    conn = psycopg2.connect(**db_config)
-    
+@QueryCache.cached("videos")
+def get_publication_time_data(db_config: dict, channel_id: str = None, days: int = None):
+    """Retrieves publication dates and hours of day with video counts for scatter plot, from the hourly rollup."""
+    params = []
+    where = _publication_filter(channel_id, days, "bucket", params)
     query = f"""
         SELECT 
-            DATE(published_at) as pub_date,
-            EXTRACT(HOUR FROM published_at) + (EXTRACT(MINUTE FROM published_at) / 60.0) as pub_time
-        FROM videos
-        WHERE channel_id = %s
-          AND published_at >= CURRENT_DATE - INTERVAL '{days} days'
-        ORDER BY published_at ASC
+            bucket::date as pub_date,
+            EXTRACT(HOUR FROM bucket) as pub_time,
+            SUM(video_count) as video_count
+        FROM channel_publication_hourly
+        WHERE {where}
+        GROUP BY bucket
+        ORDER BY bucket ASC
     """
     
-    df = pd.read_sql(query, conn, params=(channel_id,))
-    conn.close()
+    with Database.get_connection(db_config) as conn:
+        df = pd.read_sql(query, conn, params=params)
     return df
 
+def rebuild_publication_rollups(db_config: dict):
+    """Recomputes both publication rollups from videos, e.g. after a bulk load with triggers disabled."""
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        # Block concurrent video writes so the rebuilt counts stay exact
+        cursor.execute("LOCK TABLE videos IN SHARE MODE")
+        cursor.execute("TRUNCATE channel_publication_daily, channel_publication_hourly")
+        cursor.execute("""
+            INSERT INTO channel_publication_daily (channel_id, pub_date, video_count)
+            SELECT channel_id, published_at::date, COUNT(*)
+            FROM videos
+            WHERE channel_id IS NOT NULL AND published_at IS NOT NULL
+            GROUP BY 1, 2
+        """)
+        cursor.execute("""
+            INSERT INTO channel_publication_hourly (channel_id, bucket, video_count)
+            SELECT channel_id, date_trunc('hour', published_at), COUNT(*)
+            FROM videos
+            WHERE channel_id IS NOT NULL AND published_at IS NOT NULL
+            GROUP BY 1, 2
+        """)
+        conn.commit()
+        cursor.close()
+    QueryCache.invalidate("videos")
+
+def _parse_video(video_data: dict, category: str):
+    """Turns a videos().list item into the row written to videos and video_stats."""
+    snippet = video_data["snippet"]
+    stats = video_data.get("statistics", {})
+    content_details = video_data.get("contentDetails", {})
+
+    published_at_str = snippet["publishedAt"]
+    description = snippet.get("description", "")
+
+    # Process Duration and Type
+    duration_seconds = parse_duration(content_details.get("duration", "PT0S"))
+
+    # Requirement: less than 60sec in shorts, greater than 60 in videos
+    format_type = "shorts" if duration_seconds <= 60 else "video"
+
+    return {
+        "video_id": video_data["id"],
+        "channel_id": snippet["channelId"],
+        "video_title": snippet["title"],
+        "published_at": datetime.fromisoformat(published_at_str.replace("Z", "+00:00")),
+        "video_category": category,
+        "format_type": format_type,
+        "duration": duration_seconds,
+        "view_count": int(stats.get("viewCount", 0)),
+        "like_count": int(stats.get("likeCount", 0)),
+        "comment_count": int(stats.get("commentCount", 0)),
+        "description": description,
+        "tags": snippet.get("tags", []),
+        # Extract Hashtags from description
+        "hashtags": re.findall(r'#(\w+)', description),
+    }
+
+def _upsert_videos(cursor, rows: list, captured_at: datetime = None):
+    """Upserts a batch of parsed videos into videos and video_stats with one statement per table.
+
+    captured_at (replays) stamps last_scraped_at with the original fetch time,
+    and videos scraped more recently than that keep their current details and stats.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement
+    rows = list({row["video_id"]: row for row in rows}.values())
+    if not rows:
+        return
+    scraped_at = cursor.mogrify("%s::timestamptz", (captured_at,)).decode() if captured_at else "NOW()"
+
+    execute_values(
+        cursor,
+        f"""
+        INSERT INTO videos (
+            video_id, channel_id, video_title, published_at,
+            video_category, format_type, duration
+        )
+        VALUES %s
+        ON CONFLICT (video_id)
+        DO UPDATE SET
+            video_title = EXCLUDED.video_title,
+            video_category = EXCLUDED.video_category,
+            format_type = EXCLUDED.format_type,
+            duration = EXCLUDED.duration
+        WHERE NOT EXISTS (
+            SELECT 1 FROM video_stats vs
+            WHERE vs.video_id = videos.video_id AND vs.last_scraped_at > {scraped_at}
+        )
+        """,
+        [
+            (r["video_id"], r["channel_id"], r["video_title"], r["published_at"],
+             r["video_category"], r["format_type"], r["duration"])
+            for r in rows
+        ]
+    )
+
+    execute_values(
+        cursor,
+        """
+        INSERT INTO video_stats (
+            video_id, view_count, comment_count, like_count,
+            description, tags, hashtags, last_scraped_at
+        )
+        VALUES %s
+        ON CONFLICT (video_id)
+        DO UPDATE SET
+            view_count = EXCLUDED.view_count,
+            comment_count = EXCLUDED.comment_count,
+            like_count = EXCLUDED.like_count,
+            description = EXCLUDED.description,
+            tags = EXCLUDED.tags,
+            hashtags = EXCLUDED.hashtags,
+            last_scraped_at = EXCLUDED.last_scraped_at
+        WHERE video_stats.last_scraped_at IS NULL
+           OR video_stats.last_scraped_at <= EXCLUDED.last_scraped_at
+        """,
+        [
+            (r["video_id"], r["view_count"], r["comment_count"], r["like_count"],
+             r["description"], r["tags"], r["hashtags"])
+            for r in rows
+        ],
+        template=f"(%s, %s, %s, %s, %s, %s, %s, {scraped_at})"
+    )
+
+    # Keep the history that the video_stats upsert overwrites (or, replaying, skips)
+    StatsSnapshots.record_video_snapshots(cursor, rows, captured_at)
+
+def _save_videos(db_config: dict, rows: list):
+    """Writes a batch of parsed videos in a single transaction."""
+    try:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            _upsert_videos(cursor, rows)
+            conn.commit()
+            cursor.close()
+        QueryCache.invalidate("videos", "video_stats")
+    except Exception as db_error:
+        raise VideoScraperError(f"Database error: {str(db_error)}")
+
 def scrape_video_by_id(
     *,
     video_id: str,
@@ -127,14 +429,16 @@ def scrape_video_by_id(
     
     try:
         # 1. Initialize YouTube API
-        youtube = build("youtube", "v3", developerKey=api_key)
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
         
         # 2. Call YouTube API
-        request = youtube.videos().list(
-            part="snippet,statistics,contentDetails",
-            id=video_id
+        response = scheduler.execute(
+            "videos.list",
+            lambda youtube: youtube.videos().list(
+                part="snippet,statistics,contentDetails",
+                id=video_id
+            )
         )
-        response = request.execute()
         
     except HttpError as e:
         raise VideoScraperError(f"YouTube API Error: {e.reason}")
@@ -144,118 +448,225 @@ def scrape_video_by_id(
     if not response.get("items"):
         raise VideoScraperError(f"Video not found: {video_id}")
 
-    video_data = response["items"][0]
-    snippet = video_data["snippet"]
-    stats = video_data["statistics"]
-    content_details = video_data["contentDetails"]
+    row = _parse_video(response["items"][0], category)
 
-    # Extract fields
-    video_title = snippet["title"]
-    channel_id = snippet["channelId"]
-    published_at_str = snippet["publishedAt"]
-    published_at = datetime.fromisoformat(published_at_str.replace("Z", "+00:00"))
+    # 3. Save to Database
+    _save_videos(db_config, [row])
 
-    description = snippet.get("description", "")
-    tags = snippet.get("tags", [])
-    
-    # Process Duration and Type
-    duration_str = content_details.get("duration", "PT0S")
-    duration_seconds = parse_duration(duration_str)
-    
-    # Requirement: less than 60sec in shorts, greater than 60 in videos
-    format_type = "shorts" if duration_seconds <= 60 else "video"
+    return {
+        "video_id": row["video_id"],
+        "title": row["video_title"],
+        "channel_id": row["channel_id"],
+        "duration": row["duration"],
+        "format": row["format_type"]
+    }
 
-    view_count = int(stats.get("viewCount", 0))
-    like_count = int(stats.get("likeCount", 0))
-    comment_count = int(stats.get("commentCount", 0))
+def _stream_video_ids(db_config: dict, channel_id: str = None, chunk_size: int = REFRESH_CHUNK_SIZE):
+    """Yields chunks of stored video_ids in key order.
 
-    # Extract Hashtags from description
-    hashtags = re.findall(r'#(\w+)', description)
+    Keyset reads on short transactions rather than one long-lived cursor, so a
+    refresh that spends hours waiting on the API never holds a snapshot open.
+    """
+    last_id = ""
+    while True:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            query = "SELECT video_id FROM videos WHERE video_id > %s"
+            params = [last_id]
+            if channel_id:
+                query += " AND channel_id = %s"
+                params.append(channel_id)
+            query += " ORDER BY video_id LIMIT %s"
+            params.append(chunk_size)
+            cursor.execute(query, params)
+            chunk = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            cursor.close()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
 
-    # 3. Save to Database
-    try:
-        conn = psycopg2.connect(**db_config)
-        cursor = conn.cursor()
+def _save_video_stats(db_config: dict, rows: list, captured_at: datetime = None):
+    """Writes refreshed counters back to video_stats with one UPDATE for the whole chunk.
 
-        # Check if video exists
-        cursor.execute("SELECT video_id FROM videos WHERE video_id = %s", (video_id,))
-        exists = cursor.fetchone()
-
-        if not exists:
-            # Insert into videos
-            cursor.execute(
-                """
-                INSERT INTO videos (
-                    video_id, channel_id, video_title, published_at, 
-                    video_category, format_type, duration
+    Returns the number of rows updated; videos without a video_stats row are skipped.
+    captured_at (replays) stamps last_scraped_at with the original fetch time,
+    and videos scraped more recently than that keep their counters.
+    """
+    rows = list({row["video_id"]: row for row in rows}.values())
+    if not rows:
+        return 0
+    try:
+        with Database.get_connection(db_config) as conn:
+            cursor = conn.cursor()
+            scraped_at = cursor.mogrify("%s::timestamptz", (captured_at,)).decode() if captured_at else "NOW()"
+            # The outer SELECT still sees video_stats as it was before the UPDATE
+            known = execute_values(
+                cursor,
+                f"""
+                WITH v (video_id, view_count, like_count, comment_count) AS (VALUES %s),
+                updated AS (
+                    UPDATE video_stats AS vs
+                    SET view_count = v.view_count,
+                        like_count = v.like_count,
+                        comment_count = v.comment_count,
+                        last_scraped_at = {scraped_at}
+                    FROM v
+                    WHERE vs.video_id = v.video_id
+                      AND (vs.last_scraped_at IS NULL OR vs.last_scraped_at <= {scraped_at})
+                    RETURNING vs.video_id
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                SELECT vs.video_id, u.video_id IS NOT NULL
+                FROM video_stats vs
+                JOIN v ON v.video_id = vs.video_id
+                LEFT JOIN updated u ON u.video_id = vs.video_id
                 """,
-                (video_id, channel_id, video_title, published_at, category, format_type, duration_seconds)
-            )
-        else:
-            # Update videos (in case category or title changed)
-            cursor.execute(
-                """
-                UPDATE videos SET
-                    video_title = %s,
-                    video_category = %s,
-                    format_type = %s,
-                    duration = %s
-                WHERE video_id = %s
-                """,
-                (video_title, category, format_type, duration_seconds, video_id)
+                [(r["video_id"], r["view_count"], r["like_count"], r["comment_count"]) for r in rows],
+                template="(%s, %s::bigint, %s::bigint, %s::bigint)",
+                page_size=len(rows),
+                fetch=True
             )
+            known = dict(known)
+            updated = [video_id for video_id, changed in known.items() if changed]
+            StatsSnapshots.record_video_snapshots(cursor, [r for r in rows if r["video_id"] in known], captured_at)
+            conn.commit()
+            cursor.close()
+        QueryCache.invalidate("video_stats")
+    except Exception as db_error:
+        raise VideoScraperError(f"Database error: {str(db_error)}")
+    return len(updated)
+
+def refresh_video_stats(
+    api_key: str,
+    db_config: dict,
+    video_ids: list = None,
+    channel_id: str = None,
+    priority: str = "low"
+):
+    """Refreshes view/like/comment counts of stored videos, 50 IDs per videos.list call.
+
+    Refreshes the given video_ids, or every stored video (of channel_id, if set).
+    Videos the API no longer returns (deleted or private) are reported as missing,
+    and every video of a batch the API rejected is listed under failed.
+    """
+    if video_ids is not None:
+        chunks = (video_ids[i:i + REFRESH_CHUNK_SIZE] for i in range(0, len(video_ids), REFRESH_CHUNK_SIZE))
+    else:
+        chunks = _stream_video_ids(db_config, channel_id)
 
-        # Upsert video_stats
+    scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
+    result = {"requested": 0, "updated": 0, "missing": [], "failed": {}, "quota_exhausted": False}
+
+    for chunk in chunks:
+        rows = []
+        for i in range(0, len(chunk), API_BATCH_SIZE):
+            batch = chunk[i:i + API_BATCH_SIZE]
+            result["requested"] += len(batch)
+
+            # 1. One call for the whole batch; statistics costs the same as a single ID
+            try:
+                response = scheduler.execute(
+                    "videos.list",
+                    lambda youtube: youtube.videos().list(
+                        part="statistics",
+                        id=",".join(batch)
+                    ),
+                    priority=priority
+                )
+            except QuotaScheduler.QuotaExceededError:
+                result["quota_exhausted"] = True
+                break
+            except HttpError as e:
+                for video_id in batch:
+                    result["failed"][video_id] = f"YouTube API Error: {e.reason}"
+                continue
+
+            # 2. Parse counters
+            returned = set()
+            for item in response.get("items", []):
+                stats = item.get("statistics", {})
+                returned.add(item["id"])
+                rows.append({
+                    "video_id": item["id"],
+                    "view_count": int(stats.get("viewCount", 0)),
+                    "like_count": int(stats.get("likeCount", 0)),
+                    "comment_count": int(stats.get("commentCount", 0)),
+                })
+            result["missing"].extend(v for v in batch if v not in returned)
+
+        # 3. Bulk write-back for the chunk
+        result["updated"] += _save_video_stats(db_config, rows)
+
+        if result["quota_exhausted"]:
+            break
+
+    return result
+
+def _get_channel_sync_state(db_config: dict, channel_id: str, video_type: str = None):
+    # Each video type keeps its own cursor; None (both types) is stored as ''
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
         cursor.execute(
             """
-            INSERT INTO video_stats (
-                video_id, view_count, comment_count, like_count, 
-                description, tags, hashtags, last_scraped_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-            ON CONFLICT (video_id)
-            DO UPDATE SET
-                view_count = EXCLUDED.view_count,
-                comment_count = EXCLUDED.comment_count,
-                like_count = EXCLUDED.like_count,
-                description = EXCLUDED.description,
-                tags = EXCLUDED.tags,
-                hashtags = EXCLUDED.hashtags,
-                last_scraped_at = NOW()
+            SELECT uploads_playlist_id, newest_video_id FROM channel_sync_state
+            WHERE channel_id = %s AND video_type = %s
             """,
-            (video_id, view_count, comment_count, like_count, description, tags, hashtags)
+            (channel_id, video_type or "")
         )
+        res = cursor.fetchone()
+        cursor.close()
+    return res or (None, None)
 
+def _save_channel_sync_state(
+    db_config: dict,
+    channel_id: str,
+    video_type: str,
+    uploads_playlist_id: str,
+    newest_video_id: str
+):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO channel_sync_state (channel_id, video_type, uploads_playlist_id, newest_video_id, last_synced_at)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON CONFLICT (channel_id, video_type)
+            DO UPDATE SET
+                uploads_playlist_id = EXCLUDED.uploads_playlist_id,
+                newest_video_id = COALESCE(EXCLUDED.newest_video_id, channel_sync_state.newest_video_id),
+                last_synced_at = NOW()
+            """,
+            (channel_id, video_type or "", uploads_playlist_id, newest_video_id)
+        )
         conn.commit()
-    except Exception as db_error:
-        if conn:
-            conn.rollback()
-        raise VideoScraperError(f"Database error: {str(db_error)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        cursor.close()
 
-    return {
-        "video_id": video_id,
-        "title": video_title,
-        "channel_id": channel_id,
-        "duration": duration_seconds,
-        "format": format_type
-    }
+def _known_video_ids(db_config: dict, video_ids: list):
+    with Database.get_connection(db_config) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT video_id FROM videos WHERE video_id = ANY(%s)", (video_ids,))
+        known = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+    return known
 
 def scrape_channel_videos(
     api_key: str,
     db_config: dict,
     channel_id: str,
-    video_type: str, # "video" or "shorts"
+    video_type: str, # "video" or "shorts"; None keeps both
     max_pages: int,
-    max_videos_per_page: int
+    max_videos_per_page: int,
+    incremental: bool = False,
+    progress=None
 ):
-    """Scrapes multiple videos from a channel with pagination and type validation."""
+    """Scrapes multiple videos from a channel with pagination and type validation.
+
+    With incremental=True only uploads newer than what is already stored are
+    fetched: paging stops at the first page made up of known videos or at the
+    sync cursor of the channel and video_type, and known videos are not re-requested.
+    progress, if given, is called with (pages done, max_pages).
+    """
     
     # 1. First, get the Channel's category from our DB to assign to all its videos
     category = select_video_category(channel_id, db_config)
@@ -264,83 +675,140 @@ def scrape_channel_videos(
         category = "Other"
 
     try:
-        youtube = build("youtube", "v3", developerKey=api_key)
+        scheduler = QuotaScheduler.get_scheduler(api_key, db_config)
         
-        # 2. Get the 'Uploads' playlist ID for this channel
-        ch_response = youtube.channels().list(
-            part="contentDetails",
-            id=channel_id
-        ).execute()
+        uploads_playlist_id, cursor_video_id = (None, None)
+        if incremental:
+            uploads_playlist_id, cursor_video_id = _get_channel_sync_state(db_config, channel_id, video_type)
         
-        if not ch_response.get("items"):
-            raise VideoScraperError(f"Channel not found: {channel_id}")
+        # 2. Get the 'Uploads' playlist ID for this channel (cached in the sync cursor)
+        if not uploads_playlist_id:
+            ch_response = scheduler.execute(
+                "channels.list",
+                lambda youtube: youtube.channels().list(
+                    part="contentDetails",
+                    id=channel_id
+                )
+            )
             
-        uploads_playlist_id = ch_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+            if not ch_response.get("items"):
+                raise VideoScraperError(f"Channel not found: {channel_id}")
+                
+            uploads_playlist_id = ch_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
         
         # 3. Pagination Logic
         next_page_token = None
         total_scraped = 0
         pages_processed = 0
+        newest_video_id = None
+        complete = False
         
         # Limit maxResults to 50 (YouTube API limit)
         max_results = min(max_videos_per_page, 50)
         
         while pages_processed < max_pages:
             # Fetch video IDs from playlist
-            pl_request = youtube.playlistItems().list(
-                part="contentDetails",
-                playlistId=uploads_playlist_id,
-                maxResults=max_results,
-                pageToken=next_page_token
+            pl_response = scheduler.execute(
+                "playlistItems.list",
+                lambda youtube: youtube.playlistItems().list(
+                    part="contentDetails",
+                    playlistId=uploads_playlist_id,
+                    maxResults=max_results,
+                    pageToken=next_page_token
+                )
             )
-            pl_response = pl_request.execute()
             
             video_ids = [item["contentDetails"]["videoId"] for item in pl_response.get("items", [])]
             
             if not video_ids:
+                complete = True
                 break
-                
-            # Fetch full details for these videos to check duration
-            v_request = youtube.videos().list(
-                part="snippet,statistics,contentDetails",
-                id=",".join(video_ids)
-            )
-            v_response = v_request.execute()
             
-            for video_data in v_response.get("items", []):
-                v_id = video_data["id"]
-                content_details = video_data["contentDetails"]
-                duration_str = content_details.get("duration", "PT0S")
-                duration_seconds = parse_duration(duration_str)
+            if newest_video_id is None:
+                # The uploads playlist is newest first
+                newest_video_id = video_ids[0]
+            
+            reached_known = False
+            if incremental:
+                if cursor_video_id in video_ids:
+                    # Everything from the cursor on was seen by an earlier sync
+                    video_ids = video_ids[:video_ids.index(cursor_video_id)]
+                    reached_known = True
+                known = _known_video_ids(db_config, video_ids) if video_ids else set()
+                if len(known) == len(video_ids):
+                    reached_known = True
+                video_ids = [v_id for v_id in video_ids if v_id not in known]
+            
+            if video_ids:
+                # Fetch full details for these videos to check duration
+                v_response = scheduler.execute(
+                    "videos.list",
+                    lambda youtube: youtube.videos().list(
+                        part="snippet,statistics,contentDetails",
+                        id=",".join(video_ids)
+                    )
+                )
                 
-                # Validation Logic:
-                # Video: > 60 seconds
-                # Shorts: <= 60 seconds
-                is_match = False
-                if video_type == "shorts" and duration_seconds <= 60:
-                    is_match = True
-                elif video_type == "video" and duration_seconds > 60:
-                    is_match = True
+                rows = []
+                for video_data in v_response.get("items", []):
+                    row = _parse_video(video_data, category)
+                    
+                    # Validation Logic:
+                    # Video: > 60 seconds
+                    # Shorts: <= 60 seconds
+                    if video_type is None or row["format_type"] == video_type:
+                        rows.append(row)
                 
-                if is_match:
-                    # Reuse the existing scrape logic for DB insertion
-                    # Note: We call it with already fetched data or just call the function by ID
-                    # To keep it simple, we just call our existing function
-                    scrape_video_by_id(
-                        video_id=v_id,
-                        api_key=api_key,
-                        db_config=db_config,
-                        category=category
-                    )
-                    total_scraped += 1
+                # The page is already fully fetched, so write it in one transaction
+                # instead of re-requesting every video through scrape_video_by_id
+                _save_videos(db_config, rows)
+                total_scraped += len(rows)
             
             next_page_token = pl_response.get("nextPageToken")
             pages_processed += 1
+            if progress:
+                progress(pages_processed, max_pages)
             
-            if not next_page_token:
+            if reached_known or not next_page_token:
+                complete = True
                 break
+        
+        # Only move the cursor once everything above the old one is stored,
+        # otherwise the next sync would stop short of the gap. A full rescan
+        # only touches the sync state once it has walked the whole playlist.
+        if incremental or complete:
+            _save_channel_sync_state(
+                db_config, channel_id, video_type, uploads_playlist_id, newest_video_id if complete else None
+            )
                 
         return total_scraped
 
     except Exception as e:
-        raise VideoScraperError(f"Channel Scrape Failed: {str(e)}")
\ No newline at end of file
+        raise VideoScraperError(f"Channel Scrape Failed: {str(e)}")
+
+def sync_channels_videos(
+    api_key: str,
+    db_config: dict,
+    channel_ids: list = None,
+    video_type: str = None,
+    max_pages: int = 20
+):
+    """Fetches only new uploads for many channels (all stored channels by default)."""
+    if channel_ids is None:
+        channel_ids = list(select_channel_name(db_config).values())
+
+    result = {"scraped": {}, "failed": {}}
+    for channel_id in channel_ids:
+        try:
+            result["scraped"][channel_id] = scrape_channel_videos(
+                api_key=api_key,
+                db_config=db_config,
+                channel_id=channel_id,
+                video_type=video_type,
+                max_pages=max_pages,
+                max_videos_per_page=50,
+                incremental=True
+            )
+        except VideoScraperError as e:
+            result["failed"][channel_id] = str(e)
+    return result
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+from functions import ResponseCache
+
+class YouTubeClientError(Exception):
+    pass
+
+# Seconds before an API request is abandoned
+HTTP_TIMEOUT = 60
+# Parsed payloads kept in memory so revalidated responses skip JSON decoding
+PARSED_CACHE_SIZE = 256
+
+_clients = {}
+_clients_lock = threading.Lock()
+_discovery_doc = None
+_local = threading.local()
+_parsed = OrderedDict()
+_parsed_lock = threading.Lock()
+
+def _load_discovery_doc():
+    """Returns the YouTube v3 discovery document bundled with google-api-python-client."""
+    global _discovery_doc
+    if _discovery_doc is None:
+        doc = get_static_doc("youtube", "v3")
+        if doc is None:
+            raise YouTubeClientError("Bundled YouTube discovery document not found")
+        _discovery_doc = doc
+    return _discovery_doc
+
+def _thread_http():
+    """One keep-alive transport per thread, since httplib2.Http is not thread-safe."""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = httplib2.Http(timeout=HTTP_TIMEOUT)
+        cache = ResponseCache.get_cache()
+        if cache is not None:
+            http = ResponseCache.CachingHttp(http, cache)
+        _local.http = http
+    return http
+
+def _reuse_parsed(postproc, uri):
+    """Wraps a response postproc so unchanged (revalidated) payloads are decoded only once."""
+    def postproc_cached(resp, content):
+        etag = resp.get("etag")
+        if not etag:
+            return postproc(resp, content)
+
+        key = (ResponseCache.cache_key(uri), etag)
+        if resp.get("x-cache") == "revalidated":
+            with _parsed_lock:
+                if key in _parsed:
+                    _parsed.move_to_end(key)
+                    return _parsed[key]
+
+        result = postproc(resp, content)
+        with _parsed_lock:
+            _parsed[key] = result
+            if len(_parsed) > PARSED_CACHE_SIZE:
+                _parsed.popitem(last=False)
+        return result
+    return postproc_cached
+
+def _build_request(http, postproc, uri, *args, **kwargs):
+    # Ignore the transport bound at build time and use the calling thread's own
+    return HttpRequest(_thread_http(), _reuse_parsed(postproc, uri), uri, *args, **kwargs)
+
+def get_client(api_key: str):
+    """Returns the process-wide YouTube client for this API key, building it once."""
+    if not api_key:
+        raise YouTubeClientError("YouTube API key is missing")
+
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = build_from_document(
+                    _load_discovery_doc(),
+                    developerKey=api_key,
+                    http=_thread_http(),
+                    requestBuilder=_build_request
+                )
+                _clients[api_key] = client
+    return client
+
+def cache_stats():
+    """Hit/miss statistics of the ETag response cache, or None when it is disabled."""
+    cache = ResponseCache.get_cache()
+    return cache.stats() if cache is not None else None